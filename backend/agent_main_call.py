@@ -5,7 +5,7 @@ import os
 import pathlib
 import sys
 import argparse
-from typing import List
+from typing import List, Optional
 from crewai import Crew, Task
 
 # Setup path resolution
@@ -16,24 +16,32 @@ sys.path.insert(0, str(BASE_DIR))
 # Import agents and tools
 from backend.agents.DC_Agent import ResearchAgent
 from backend.agents.data_processor_agent import DataProcessorAgent
-from backend.agents.llm_recommendation_generator_and_rag import LLMRecommendationAgent
+from backend.agents.llm_recommendation_generator_and_rag import LLMRecommendationAgent, RecommendationList
+from backend.utils.scheduler import Stage, StageScheduler
+from backend.utils import artifact_cache, llm_cache, profiling, replay, tracing
 from backend.utils.agent_tools import (
     collect, preprocess, show_ticker,
     generate_sector_map, compute_statistics,
-    forecast_prices
+    forecast_prices,
+    run_collect, run_preprocess, run_show_ticker,
+    run_sector_map, run_statistics, run_forecast, run_company_info, run_history_db
 )
 
+OUTPUT_DIR = "../backend/outputs"
+
 
 def create_crew(tickers: List[str], usr_pov: str) -> Crew:
     research_agent = ResearchAgent()
     processor_agent = DataProcessorAgent()
+    # separate instance: the forecast task runs concurrently with process_task
+    forecaster_agent = DataProcessorAgent()
     recommendor = LLMRecommendationAgent()
 
     collect_task = Task(
         description="Fetch monthly stock data of all tickers.",
         agent=research_agent,
-        expected_output="Collect the data out of raw data and return it in the specified output in CSV format. "
-                        "Return no code or explanations, just raw data, don't fake data.",
+        expected_output="The dataset handle and summary returned by the tool (path, row count, date range, key stats). "
+                        "Return no code or explanations and don't copy rows, don't fake data.",
         output_key="collect_output",
         tools=[collect]
     )
@@ -41,8 +49,8 @@ def create_crew(tickers: List[str], usr_pov: str) -> Crew:
     research_task = Task(
         description="Preprocess monthly stock data.",
         agent=research_agent,
-        expected_output="List of dictionaries representing preprocessed monthly stock data. "
-                        "Return no code or explanations, just raw data, don't fake data.",
+        expected_output="The handle and summary of the preprocessed stock data returned by the tool. "
+                        "Return no code or explanations and don't copy rows, don't fake data.",
         output_key="research_output",
         context=[collect_task],
         tools=[preprocess]
@@ -51,8 +59,9 @@ def create_crew(tickers: List[str], usr_pov: str) -> Crew:
     fetching_task = Task(
         description=f"Fetch monthly stock data of {tickers}.",
         agent=research_agent,
-        expected_output=f"List of dictionaries representing preprocessed monthly stock data for {tickers}. "
-                        "Return no code or explanations, just raw data, don't fake data.",
+        expected_output=f"Per-ticker summary (rows, date range, last close, period return) of the preprocessed data for {tickers}. "
+                        "Only request pages of rows if they are really needed. "
+                        "Return no code or explanations, don't fake data.",
         output_key="filtering_output",
         tools=[show_ticker]
     )
@@ -64,17 +73,21 @@ def create_crew(tickers: List[str], usr_pov: str) -> Crew:
                         "Return no code or explanations, just raw data, don't fake data.",
         output_key="process_output",
         context=[fetching_task],
-        tools=[generate_sector_map, compute_statistics]
+        tools=[generate_sector_map, compute_statistics],
+        async_execution=True
     )
 
+    # Forecasting only needs the cleaned dataset, not the sector statistics,
+    # so it runs alongside process_task; recommend_task waits for both.
     forecast_task = Task(
         description=f"Generate forecasting for {tickers}.",
-        agent=processor_agent,
+        agent=forecaster_agent,
         expected_output=f"Forecasting prices for each given ticker {tickers}. "
                         "Return no code or explanations, just raw data, don't fake data.",
         output_key="forecast_output",
-        context=[process_task],
-        tools=[forecast_prices]
+        context=[fetching_task],
+        tools=[forecast_prices],
+        async_execution=True
     )
 
     recommend_task = Task(
@@ -86,11 +99,17 @@ def create_crew(tickers: List[str], usr_pov: str) -> Crew:
                         "object should have model names (e.g., 'LSTM', 'MLP') as keys and their respective forecast "
                         "data (object with metrics like 'target_date', 'actual_price', 'predicted_price', 'performance') as values.",
         output_key="final_output",
-        context=[forecast_task]
+        output_pydantic=RecommendationList,
+        context=[process_task, forecast_task]
     )
 
+    agents = [research_agent, processor_agent, forecaster_agent, recommendor]
+    for agent in agents:
+        # cache outermost: a hit never reaches the network or the cassette
+        llm_cache.wrap_llm(replay.wrap_llm(agent.llm))
+
     return Crew(
-        agents=[research_agent, processor_agent, recommendor],
+        agents=agents,
         tasks=[
             collect_task, research_task, fetching_task,
             process_task, forecast_task, recommend_task
@@ -102,48 +121,143 @@ def create_crew(tickers: List[str], usr_pov: str) -> Crew:
 def run_crew(tickers: List[str], usr_pov: str):
     print("🚀 Running Crew pipeline...")
     crew = create_crew(tickers, usr_pov)
-    result = crew.kickoff(inputs={"tickers": tickers, "user_pov": usr_pov})
+    tracing.instrument_crewai()
+    with tracing.span("crew.kickoff", tickers=",".join(tickers)), profiling.profile_block("crew", all_threads=True):
+        result = crew.kickoff(inputs={"tickers": tickers, "user_pov": usr_pov})
     print("✅ Crew execution finished.")
 
     # Save result
-    output_dir = "../backend/outputs"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, "crew_result.json")
 
-    try:
-        result_str = str(result)
-        json_start = result_str.find("```json") + 7
-        json_end = result_str.rfind("```")
-        json_content = result_str[json_start:json_end].strip()
-        result_dict = json.loads(json_content)
-
+    structured = getattr(result, "pydantic", None)
+    if isinstance(structured, RecommendationList):
         with open(output_file, "w") as f:
-            json.dump(result_dict, f, indent=2)
-
+            json.dump([item.model_dump() for item in structured.recommendations], f, indent=2)
         print(f"📁 Crew result saved to {output_file}")
-    except Exception as e:
-        print("❌ Failed to save crew result:", str(e))
+    else:
+        print("❌ Recommendation task did not return the RecommendationList schema; saving raw output")
         with open(output_file, "w") as f:
             f.write(str(result))  # Fallback to raw string
 
     return result
 
 
+def direct_stages(tickers: List[str]) -> List[Stage]:
+    """
+    The data stages of `create_crew` with their real dependencies: once the
+    cleaned dataset exists, the universe-wide sector/statistics branch and the
+    per-ticker forecast branch run side by side.
+    """
+    return [
+        Stage("collect", run_collect),
+        Stage("preprocess", run_preprocess, deps=["collect"]),
+        Stage("show_ticker", run_show_ticker, deps=["preprocess"], args=(tickers,)),
+        Stage("sector_map", run_sector_map, deps=["preprocess"]),
+        Stage("statistics", run_statistics, deps=["sector_map"]),
+        Stage("forecast", run_forecast, deps=["preprocess"], kind="process", args=(tickers,)),
+        Stage("history_db", run_history_db, deps=["preprocess"]),
+        # network-bound and independent of the data stages
+        Stage("company_info", run_company_info, args=(tickers,)),
+    ]
+
+
+def run_direct(tickers: List[str], usr_pov: str, rag_question: Optional[str] = None):
+    """
+    Same stages as `create_crew`, executed as a plain Python DAG. Only the
+    recommendation step talks to the LLM: fact sheets are packed into
+    batched prompts (up to RECOMMENDATION_MAX_BATCH tickers each) that
+    reply with JSON arrays, and the result is written to crew_result.json in the same shape the crew's
+    recommendation task produces. A `rag_question` that isn't purely about
+    price figures also pulls matching Chroma snippets into each fact sheet.
+    """
+    print("🚀 Running direct pipeline...")
+    scheduler = StageScheduler(profiling.profile_stages(direct_stages(tickers)))
+    stage_results = scheduler.run()
+    scheduler.print_report()
+    sector_map = stage_results["sector_map"]
+    forecast_data = stage_results["forecast"] or {}
+
+    with open(os.path.join(OUTPUT_DIR, "ticker_analysis.json")) as f:
+        analysis_data = json.load(f)
+
+    recommendor = LLMRecommendationAgent()
+    with tracing.span("recommend", tickers=",".join(tickers)), profiling.profile_block("recommend"):
+        recs = recommendor.generate_recommendations(
+            forecast_data={t: forecast_data[t] for t in tickers if t in forecast_data},
+            analysis_data={t: analysis_data[t] for t in tickers if t in analysis_data},
+            user_pov=usr_pov,
+            rag_question=rag_question,
+        )
+    result = [
+        {
+            "ticker": ticker,
+            "recommendation": rec.get("recommendation", rec.get("error", "N/A")),
+            "reasoning": rec.get("reasoning", ""),
+            "forecast": rec.get("forecast", {}),
+        }
+        for ticker, rec in recs.items()
+    ]
+    print(f"✅ Direct pipeline finished ({len(sector_map)} tickers mapped, {len(result)} recommendations).")
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_file = os.path.join(OUTPUT_DIR, "crew_result.json")
+    with open(output_file, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"📁 Direct result saved to {output_file}")
+    return result
+
+
+def run_pipeline(tickers: List[str], usr_pov: str, direct: bool = False, profile: bool = False,
+                 rag_question: Optional[str] = None):
+    """
+    Run either pipeline under one trace (backend/outputs/traces/trace_pipeline_*.json).
+    With `profile`, every stage (or the whole crew kickoff) is also profiled
+    into backend/outputs/profiles/pipeline_<timestamp>/.
+    """
+    if profile:
+        profiling.start_session("pipeline")
+    with tracing.trace_run("pipeline"):
+        result = run_direct(tickers, usr_pov, rag_question) if direct else run_crew(tickers, usr_pov)
+    if profile:
+        paths = profiling.summarize()
+        profiling.print_hot_functions()
+        print(f"🔬 Profiles written to {paths['dir']} (summary.txt, all.folded for flame graphs)")
+    return result
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--symbols", type=str, required=True)
     parser.add_argument("--user_pov", type=str, required=True)
+    parser.add_argument("--direct", action="store_true",
+                        help="Run the data stages as plain Python and use the LLM only for recommendations.")
+    parser.add_argument("--rag_question", type=str, default=None,
+                        help="Question for the retriever in --direct mode, e.g. 'recent earnings news'. "
+                             "Anything beyond price figures also searches Chroma.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every stage even if its inputs are unchanged.")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Always call the LLM instead of reusing cached responses.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each stage: .prof, folded stacks and a top-N hot function summary.")
+    parser.add_argument("--replay", choices=replay.MODES, default=None,
+                        help="Record LLM/network responses, or replay recorded ones offline.")
+    parser.add_argument("--cassette", type=str, default=None,
+                        help="Recorded responses file (default backend/outputs/replay/cassette.json).")
     args = parser.parse_args()
 
+    if args.no_cache:
+        os.environ["ARTIFACT_CACHE"] = "0"
+        artifact_cache.ENABLED = False
+    if args.no_llm_cache:
+        os.environ["LLM_CACHE"] = "0"
+        llm_cache.ENABLED = False
+    if args.replay or args.cassette:
+        replay.configure(args.replay or replay.MODE, args.cassette)
+
     tickers = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
-    research, analysis, recs = run_crew(tickers, args.user_pov)
-    out = {
-        "research":        research,
-        "analysis":        analysis,
-        "recommendations": recs,
-    }
-    out_path = pathlib.Path("backend/outputs/crew_result.json")
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(out, indent=2))
+    run_pipeline(tickers, args.user_pov, direct=args.direct, profile=args.profile, rag_question=args.rag_question)
 
 
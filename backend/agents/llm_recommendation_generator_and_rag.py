@@ -1,27 +1,176 @@
 import os
-import yfinance as yf
-import google.generativeai as genai
+import json
 from crewai import LLM, Agent
 from dotenv import load_dotenv
-from langchain_community.embeddings import HuggingFaceEmbeddings
-import duckdb
 import pandas as pd
-from typing import Optional, Dict, Any
-from pydantic import ConfigDict
+from typing import Optional, Dict, Any, List, Tuple
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+from backend.utils import company_info, history_db, llm_dispatcher, retriever
+from backend.utils.tracing import span
 
 # Load API key from environment
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
-duckdb_file = "../backend/input/stock_data.db"
-
 gemini_pro = "gemini/gemini-1.5-pro"  # has 15 requests limit per day
 gemini_flash = "gemini/gemini-2.0-flash"  # has 1500 requests limit per day
 
+# Set to gemini_pro to prefer it; the dispatcher falls back to flash once pro's quota is spent.
+recommendation_model = os.getenv("RECOMMENDATION_MODEL", gemini_flash)
+
+# Tickers share one prompt up to this many input+output tokens (rough 4 chars/token).
+recommendation_token_budget = int(os.getenv("RECOMMENDATION_TOKEN_BUDGET", "8000"))
+recommendation_max_batch = int(os.getenv("RECOMMENDATION_MAX_BATCH", "10"))
+output_tokens_per_ticker = 200
+
+RECOMMENDATIONS = ("Buy", "Hold", "Sell")
+
+
+class RecommendationItem(BaseModel):
+    ticker: str
+    recommendation: str
+    reasoning: str
+
+    @field_validator("ticker")
+    @classmethod
+    def _ticker(cls, value: str) -> str:
+        return value.strip().upper()
+
+    @field_validator("recommendation")
+    @classmethod
+    def _recommendation(cls, value: str) -> str:
+        value = value.strip().strip("*").capitalize()
+        if value not in RECOMMENDATIONS:
+            raise ValueError(f"recommendation must be one of {RECOMMENDATIONS}")
+        return value
+
+    @field_validator("reasoning")
+    @classmethod
+    def _reasoning(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("reasoning is empty")
+        return value.strip()
+
+
+class CrewRecommendation(RecommendationItem):
+    forecast: Dict[str, Any] = {}
+
+
+class RecommendationList(BaseModel):
+    """Structured output of the crew's recommendation task."""
+    recommendations: List[CrewRecommendation]
+
+
+def forecast_summary(forecast: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-model forecast block in the shape the crew recommendation task returns."""
+    summary = {}
+    for model_name in ("LSTM", "MLP"):
+        model_data = forecast.get(model_name) or {}
+        if not model_data:
+            continue
+        summary[model_name] = {
+            "target_date": forecast.get("target_date"),
+            "actual_price": forecast.get("actual_price"),
+            "predicted_price": model_data.get("forecast"),
+            "performance": {"mse": model_data.get("mse"), "rmse": model_data.get("rmse")},
+        }
+    return summary
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _rounded(value, digits=2):
+    return round(float(value), digits) if isinstance(value, (int, float)) else None
+
+
+def fact_sheet(symbol: str, forecast: Dict[str, Any], analysis: Dict[str, Any],
+               info: Dict[str, Any], history: Dict[str, Any], context: Optional[str] = None) -> Dict[str, Any]:
+    """Everything the advisor prompt says about one ticker, as a compact dict."""
+    lstm = (forecast.get("LSTM") or {}).get("forecast")
+    mlp = (forecast.get("MLP") or {}).get("forecast")
+    both = [v for v in (lstm, mlp) if isinstance(v, (int, float))]
+    return {
+        "ticker": symbol,
+        "company": info.get("company_name"),
+        "sector": info.get("sector"),
+        "industry": info.get("industry"),
+        "market_cap": info.get("market_cap"),
+        "pe_ratio": info.get("pe_ratio"),
+        "52_week_range": [info.get("52_week_low"), info.get("52_week_high")],
+        "current_price": _rounded(forecast.get("actual_price")),
+        "forecast_range": [_rounded(min(both)), _rounded(max(both))] if len(both) == 2 else None,
+        "historical_high": analysis.get("highest_price"),
+        "historical_low": analysis.get("lowest_price"),
+        "growth_2020_percent": analysis.get("growth_2020_percent"),
+        "price_history": history or None,
+        "retrieved_context": context or None,
+    }
+
+
+def batch_prompt_header(user_pov: str) -> str:
+    return (
+        "You're a trusted financial advisor. The investor describes themselves as: "
+        f"{user_pov}\n"
+        "For each stock fact sheet below decide Buy, Hold or Sell, considering price trends, "
+        "valuation metrics, sector outlook and price history, and explain the decision in "
+        "2-4 sentences of simple, non-technical language.\n"
+        "Reply with a JSON array only, one object per fact sheet, in the same order: "
+        '[{"ticker": "...", "recommendation": "Buy|Hold|Sell", "reasoning": "..."}]\n'
+        "Fact sheets:\n"
+    )
+
+
+def batch_prompt(header: str, sheets: List[Dict[str, Any]]) -> str:
+    return header + "\n".join(json.dumps(sheet, default=str) for sheet in sheets)
+
+
+def plan_batches(header: str, sheets: List[Dict[str, Any]], token_budget: int,
+                 max_batch: int) -> List[List[Dict[str, Any]]]:
+    """
+    Pack fact sheets in order into prompts that fit `token_budget` (prompt
+    plus expected reply). A sheet that is too big on its own still gets a
+    prompt to itself.
+    """
+    batches, current, used = [], [], estimate_tokens(header)
+    for sheet in sheets:
+        cost = estimate_tokens(json.dumps(sheet, default=str)) + output_tokens_per_ticker
+        if current and (used + cost > token_budget or len(current) >= max_batch):
+            batches.append(current)
+            current, used = [], estimate_tokens(header)
+        current.append(sheet)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
 
-class LLMRecommendationAgent(Agent):
-    duckdb_con: Optional[duckdb.DuckDBPyConnection] = None
 
+def validate_batch_reply(text: str, tickers: List[str]) -> Tuple[Dict[str, RecommendationItem], List[str]]:
+    """
+    Parse a batch reply as a strict JSON array and keep the well-formed
+    items for tickers we asked about. Returns (valid items, tickers to re-ask).
+    """
+    valid: Dict[str, RecommendationItem] = {}
+    try:
+        items = json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        items = None
+    if isinstance(items, dict):
+        items = [items]
+    if isinstance(items, list):
+        for raw in items:
+            try:
+                item = RecommendationItem.model_validate(raw)
+            except ValidationError:
+                continue
+            if item.ticker in tickers and item.ticker not in valid:
+                valid[item.ticker] = item
+    return valid, [t for t in tickers if t not in valid]
+
+
+class LLMRecommendationAgent(Agent):
     # Pydantic V2 model config
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
@@ -38,97 +187,63 @@ class LLMRecommendationAgent(Agent):
             ),
             llm=LLM(model=gemini_flash, api_key=api_key),
         )
-        self._initialize_duckdb()
-
-    def _initialize_duckdb(self):
-        """Connect to the DuckDB database."""
-        try:
-            self.duckdb_con = duckdb.connect(database=duckdb_file, read_only=True)
-            print(f"[DuckDB Init] Successfully connected to '{duckdb_file}'.")
-        except Exception as e:
-            print(f"[DuckDB Init Error] {e}")
 
-    def _get_duckdb_context(self, symbol: str, sector: str) -> str:
-        if not self.duckdb_con:
-            return ""
+    def _get_duckdb_context(self, symbol: str, sector: str = "N/A") -> Dict[str, Any]:
+        return self._get_duckdb_contexts([symbol]).get(symbol.upper(), {})
 
-        table_name = f"{symbol.lower()}_historical"
+    def _get_duckdb_contexts(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Price-history context for all `symbols` in one query. The history
+        database is opened read-only for the query only (backend/utils/history_db.py).
+        """
         try:
-            # Construct a query to get relevant information. You might need to adjust this
-            # based on what kind of "RAG" context you want to extract from the historical data.
-            # This example fetches the latest 5 closing prices and the average volume.
-            query = f"""
-                SELECT Close FROM {table_name} ORDER BY Date DESC LIMIT 5;
-                SELECT AVG(Volume) FROM {table_name};
-            """
-            results = self.duckdb_con.execute(query).fetchall()
-
-            if results:
-                latest_closes = ", ".join(str(r[0]) for r in results[0])
-                avg_volume = results[1][0] if results[1] else "N/A"
-                context = (
-                    f"\nHistorical Stock Data (from DuckDB):\n"
-                    f"- Latest 5 Closing Prices: {latest_closes}\n"
-                    f"- Average Volume: {avg_volume:.2f}\n"
-                    f"- Note: This is a basic example. You can create more sophisticated "
-                    f"queries to extract more meaningful context."
-                )
-                return context
-            else:
-                return f"\nNo historical data found in DuckDB for '{symbol}'."
-
+            # the pipeline's history_db stage has already refreshed the table
+            return history_db.context_for(symbols, refresh_first=False)
         except Exception as e:
             print(f"[DuckDB Retrieval Error] {e}")
-            return ""
+            return {}
 
-    def _get_yfinance_info(self, symbol: str) -> Dict[str, Any]:
+    def _get_retrieved_contexts(self, symbols: List[str], question: Optional[str] = None) -> Dict[str, str]:
+        """Range statistics (plus Chroma snippets for non-numeric questions) per ticker."""
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            return {
-                "company_name": info.get("longName", "N/A"),
-                "sector": info.get("sector", "N/A"),
-                "industry": info.get("industry", "N/A"),
-                "current_price": info.get("currentPrice", info.get("regularMarketPrice", "N/A")),
-                "market_cap": info.get("marketCap", "N/A"),
-                "pe_ratio": info.get("trailingPE", "N/A"),
-                "dividend_yield": info.get("dividendYield", "N/A"),
-                "52_week_high": info.get("fiftyTwoWeekHigh", "N/A"),
-                "52_week_low": info.get("fiftyTwoWeekLow", "N/A"),
-                "beta": info.get("beta", "N/A")
-            }
+            return retriever.get_retriever().retrieve(symbols, question)
         except Exception as e:
-            print(f"[yfinance Error] {e}")
+            print(f"[Retriever Error] {e}")
             return {}
 
-    def generate_recommendations(self,user_pov: str = "moderate investor") -> dict:
-        output = {}
-        with open("../backend/outputs/forecast_results.json") as f1, open("../backend/outputs/ticker_analysis.json") as f2:
-            forecast_data_u = json.load(f1)
-            forecast_data_u = json.load(f2)
-
-            # Filter data for our target tickers
-        forecast_data = {k: v for k, v in forecast_data_u.items() if k in tickers}
-        analysis_data = {k: v for k, v in forecast_data_u.items() if k in tickers}
+    def _get_yfinance_info(self, symbol: str) -> Dict[str, Any]:
+        """Stored fundamentals for `symbol` (see backend/utils/company_info.py); no network call."""
+        return company_info.get_provider().get(symbol)
 
+    def generate_recommendations(self, forecast_data: Dict[str, Any], analysis_data: Dict[str, Any],
+                                 user_pov: str = "moderate investor", rag_question: Optional[str] = None) -> dict:
+        """
+        Pack the tickers' fact sheets into as few prompts as the token budget
+        allows, dispatch them concurrently and validate the JSON arrays that
+        come back; tickers missing from a reply are re-asked one by one.
+        `forecast_data` / `analysis_data` are the forecast_results.json /
+        ticker_analysis.json entries for the tickers to cover; `rag_question`
+        adds Chroma snippets to the retrieved context (see utils/retriever.py).
+        """
+        output = {}
+        sheets = []
+        with span("recommend.company_info", tickers=len(forecast_data)):
+            fundamentals = company_info.get_provider().get_many(forecast_data)
+        with span("recommend.duckdb_context", tickers=len(forecast_data)):
+            contexts = self._get_duckdb_contexts(list(forecast_data))
+        with span("recommend.retrieve", tickers=len(forecast_data)):
+            retrieved = self._get_retrieved_contexts(list(forecast_data), rag_question)
         for symbol, forecast in forecast_data.items():
             analysis = analysis_data.get(symbol)
             if not analysis:
                 output[symbol] = {"error": "Missing analysis data"}
                 continue
 
-            yfinance_info = self._get_yfinance_info(symbol)
-            sector = yfinance_info.get("sector", "N/A")
-            duckdb_context = self._get_duckdb_context(symbol, sector)
+            yfinance_info = fundamentals[symbol.upper()]
+            duckdb_context = contexts.get(symbol.upper(), {})
 
-            actual_price = forecast.get("actual_price", "N/A")
-            target_date = forecast.get("target_date", "N/A")
             lstm_data = forecast.get("LSTM", {})
             mlp_data = forecast.get("MLP", {})
-
-            lstm_forecast = lstm_data.get("forecast", "N/A")
-            mlp_forecast = mlp_data.get("forecast", "N/A")
-
             try:
                 lstm_rmse = lstm_data.get("rmse", float('inf'))
                 mlp_rmse = mlp_data.get("rmse", float('inf'))
@@ -136,58 +251,74 @@ class LLMRecommendationAgent(Agent):
             except:
                 best_model = "N/A"
 
-            high = analysis.get("highest_price", "N/A")
-            low = analysis.get("lowest_price", "N/A")
-            growth = analysis.get("growth_2020_percent", "N/A")
-
-            prompt = f'''
-                You're a trusted financial advisor helping an investor decide what to do with their {symbol} stock.
-
-                **Stock Information (from yfinance)**:
-                - Company: {yfinance_info.get('company_name')}
-                - Sector: {sector}
-                - Industry: {yfinance_info.get('industry')}
-                - Current Price: {round(float(actual_price), 2) if actual_price != 'N/A' else 'N/A'}
-                - Market Cap: {yfinance_info.get('market_cap')}
-                - P/E Ratio: {yfinance_info.get('pe_ratio')}
-                - 52-Week Range: {yfinance_info.get('52_week_low')} - {yfinance_info.get('52_week_high')}
-
-                **Technical Analysis**:
-                - Current price: {round(float(actual_price), 2) if actual_price != 'N/A' else 'N/A'}
-                - Forecasted range: {round(min(lstm_forecast, mlp_forecast), 2) if isinstance(lstm_forecast, (int, float)) and isinstance(mlp_forecast, (int, float)) else 'N/A'} to {round(max(lstm_forecast, mlp_forecast), 2) if isinstance(lstm_forecast, (int, float)) and isinstance(mlp_forecast, (int, float)) else 'N/A'}
-                - Historical High: {high}
-                - Historical Low: {low}
-                - Growth during 2020: {growth}%
-
-                {duckdb_context}
-
-                **Instructions**:
-                1. Provide clear recommendation: **Buy**, **Hold**, or **Sell**
-                2. Explain reasoning in 2-4 sentences
-                3. Consider: price trends, valuation metrics, sector outlook, and historical data from DuckDB.
-                4. Use simple, non-technical language.
-            '''
-
-            try:
-                model = genai.GenerativeModel(gemini_flash)
-                response = model.generate_content(prompt)
-                llm_text = response.text.strip() if response.text else "No response"
-            except Exception as e:
-                llm_text = f"Gemini API error: {e}"
-
+            sheets.append(fact_sheet(symbol, forecast, analysis, yfinance_info, duckdb_context,
+                                     retrieved.get(symbol.upper())))
             output[symbol] = {
-                "recommendation": llm_text,
+                "forecast": forecast_summary(forecast),
                 "yfinance_info": yfinance_info,
                 "technical_analysis": {
                     "best_model": best_model,
-                    "current_price": actual_price,
-                    "lstm_forecast": lstm_forecast,
-                    "mlp_forecast": mlp_forecast,
-                    "historical_high": high,
-                    "historical_low": low,
-                    "growth_2020": growth
+                    "current_price": forecast.get("actual_price", "N/A"),
+                    "lstm_forecast": lstm_data.get("forecast", "N/A"),
+                    "mlp_forecast": mlp_data.get("forecast", "N/A"),
+                    "historical_high": analysis.get("highest_price", "N/A"),
+                    "historical_low": analysis.get("lowest_price", "N/A"),
+                    "growth_2020": analysis.get("growth_2020_percent", "N/A")
                 },
                 "duckdb_used": bool(duckdb_context)
             }
 
+        header = batch_prompt_header(user_pov)
+        batches = plan_batches(header, sheets, recommendation_token_budget, recommendation_max_batch)
+        results, errors = self._ask(header, batches)
+
+        retry = [sheet for sheet in sheets if sheet["ticker"] not in results]
+        if retry:
+            print(f"🔁 Re-asking {len(retry)} ticker(s) individually: {', '.join(s['ticker'] for s in retry)}")
+            retried, retry_errors = self._ask(header, [[sheet] for sheet in retry], read_cache=False)
+            results.update(retried)
+            errors.update(retry_errors)
+
+        for sheet in sheets:
+            symbol = sheet["ticker"]
+            if symbol in results:
+                item, model = results[symbol]
+                output[symbol] = {
+                    "recommendation": item.recommendation,
+                    "reasoning": item.reasoning,
+                    "llm_model": model,
+                    **output[symbol],
+                }
+            else:
+                output[symbol] = {
+                    "recommendation": errors.get(symbol, "No valid recommendation returned"),
+                    "reasoning": "",
+                    "llm_model": None,
+                    **output[symbol],
+                }
+
         return output
+
+    def _ask(self, header: str, batches: List[List[Dict[str, Any]]], read_cache: bool = True):
+        """
+        One prompt per batch; returns ({ticker: (item, model)}, {ticker: error text}).
+        Only replies that cover every ticker of their batch are cached, so a
+        malformed reply is asked again rather than served from the cache.
+        """
+        results, errors = {}, {}
+        if not batches:
+            return results, errors
+        tickers = [[sheet["ticker"] for sheet in batch] for batch in batches]
+        replies = llm_dispatcher.generate_many(
+            [batch_prompt(header, batch) for batch in batches], recommendation_model,
+            labels=[",".join(t) for t in tickers], json_mode=True,
+            validators=[lambda text, t=t: not validate_batch_reply(text, t)[1] for t in tickers],
+            read_cache=read_cache,
+        )
+        for batch_tickers, reply in zip(tickers, replies):
+            if isinstance(reply, BaseException):
+                errors.update({t: f"Gemini API error: {reply}" for t in batch_tickers})
+                continue
+            valid, _ = validate_batch_reply(reply["text"], batch_tickers)
+            results.update({t: (item, reply["model"]) for t, item in valid.items()})
+        return results, errors
@@ -0,0 +1,173 @@
+"""
+Concurrent login benchmark for the auth database.
+
+    python backend/benchmarks/auth_login_bench.py --users 200 --threads 16 --logins 200
+    python backend/benchmarks/auth_login_bench.py --http --threads 32 --logins 100
+
+Direct mode runs `verify_user` (a read plus an activity-log insert) from many
+threads against a fresh database, once with the old access pattern (new
+connection per call, rollback journal) and once with the pooled AuthDB.
+--http drives POST /auth/token on an in-process server instead and probes
+GET / meanwhile, to check logins no longer stall the event loop.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import pathlib
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.database.auth_db import AuthDB
+
+
+class LegacyAuthDB:
+    """The previous access pattern: a new connection per call, default journal."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def verify_user(self, username: str, password: str) -> Optional[int]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT user_id, password_hashed FROM users WHERE username = ?",
+                               (username,)).fetchone()
+            if row and row[1] == hashlib.sha256(password.encode()).hexdigest():
+                conn.execute("INSERT INTO activity_logs (user_id, action) VALUES (?, ?)", (row[0], "user_login"))
+                conn.commit()
+                return row[0]
+            return None
+        finally:
+            conn.close()
+
+
+def seeded_db(path: str, users: int, wal: bool) -> AuthDB:
+    db = AuthDB(path)
+    db.migrate()
+    if not wal:
+        db._conn().execute("PRAGMA journal_mode=DELETE")
+    for i in range(users):
+        db.register_user(f"user{i}", f"Password{i}!")
+    db.close()
+    return db
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def run_direct(db, users: int, threads: int, logins: int) -> dict:
+    errors, latencies, lock = [], [], threading.Lock()
+
+    def worker(n):
+        mine = []
+        for j in range(logins):
+            i = (n * logins + j) % users
+            t0 = time.perf_counter()
+            try:
+                if db.verify_user(f"user{i}", f"Password{i}!") is None:
+                    raise RuntimeError("login rejected")
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    wall = time.perf_counter() - t0
+    p50, p99 = percentiles(latencies)
+    return {"logins/s": len(latencies) / wall, "p50_ms": p50, "p99_ms": p99, "errors": len(errors)}
+
+
+async def run_http(base_url: str, users: int, concurrency: int, logins: int) -> dict:
+    import httpx
+
+    latencies, probes, errors = [], [], 0
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def login(n):
+            nonlocal errors
+            for j in range(logins):
+                i = (n * logins + j) % users
+                t0 = time.perf_counter()
+                r = await client.post("/auth/token", data={"username": f"user{i}", "password": f"Password{i}!"})
+                latencies.append(time.perf_counter() - t0)
+                errors += r.status_code != 200
+
+        async def probe():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/")
+                probes.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(login(n) for n in range(concurrency)))
+        wall = time.perf_counter() - t0
+        done.set()
+        await prober
+
+    p50, p99 = percentiles(latencies)
+    probe_p50, probe_p99 = percentiles(probes)
+    return {"logins/s": len(latencies) / wall, "p50_ms": p50, "p99_ms": p99, "errors": errors,
+            "probe_p50_ms": probe_p50, "probe_p99_ms": probe_p99}
+
+
+def serve_app(port: int, db_path: str):
+    import uvicorn
+    from backend.routes import auth
+    from main import app
+
+    auth.auth_db = AuthDB(db_path)  # never touch the real auth.db
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def show(name: str, result: dict):
+    print(f"{name:>8} " + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--logins", type=int, default=200, help="Logins per client")
+    parser.add_argument("--http", action="store_true", help="Go through POST /auth/token")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{args.threads} clients x {args.logins} logins over {args.users} users")
+        if args.http:
+            db_path = os.path.join(tmp, "auth.db")
+            seeded_db(db_path, args.users, wal=True)
+            server = serve_app(args.port, db_path)
+            show("http", asyncio.run(run_http(f"http://127.0.0.1:{args.port}", args.users,
+                                              args.threads, args.logins)))
+            server.should_exit = True
+        else:
+            legacy_path, pooled_path = os.path.join(tmp, "legacy.db"), os.path.join(tmp, "pooled.db")
+            seeded_db(legacy_path, args.users, wal=False)
+            show("legacy", run_direct(LegacyAuthDB(legacy_path), args.users, args.threads, args.logins))
+            db = seeded_db(pooled_path, args.users, wal=True)
+            show("pooled", run_direct(db, args.users, args.threads, args.logins))
@@ -0,0 +1,194 @@
+"""
+Chroma HNSW benchmark on a synthetic multi-ticker corpus.
+
+    python backend/benchmarks/chroma_hnsw_bench.py --tickers 1000 --m 8,16,32 --ef-search 10,50,100
+
+Generates random-walk prices for N synthetic tickers, builds the same
+documents ingestion would (--granularity), embeds them, and for each HNSW
+setting reports build time, p50/p99 query latency, recall@k against
+brute-force search and index size on disk. --embedder hash replaces the
+sentence-transformers model with hashed bag-of-words vectors so the harness
+runs offline; latency and recall are then indicative, not final.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pathlib
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+import chromadb
+from backend.utils import chromaDB, embeddings
+
+HASH_DIM = 384
+
+
+def synthetic_prices(n_tickers: int, days: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-01-31", periods=days, tz="UTC")
+    data = {}
+    for i in range(n_tickers):
+        close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0, 0.015 + 0.02 * rng.random(), days)))
+        spread = close * rng.uniform(0.002, 0.02, days)
+        data[f"SYN{i:04d}"] = pd.DataFrame({
+            "Open": close + rng.normal(0, 0.5, days) * spread,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.lognormal(15, 0.6, days).round(),
+        }, index=dates)
+    return data
+
+
+def build_corpus(data: dict, granularity: str):
+    ids, documents = [], []
+    for ticker, df in data.items():
+        if granularity == "day":
+            t_ids, t_docs, _ = chromaDB.build_documents(ticker, df)
+        else:
+            t_ids, t_docs, _ = chromaDB.build_window_documents(ticker, df, granularity)
+        ids += t_ids
+        documents += t_docs
+    return ids, documents
+
+
+_token_vectors = {}
+
+
+def hash_embed(texts) -> np.ndarray:
+    """Normalized sum of per-token random vectors: shared tokens mean nearby vectors."""
+    out = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in re.findall(r"[A-Za-z]+|\d+", text):
+            vector = _token_vectors.get(token)
+            if vector is None:
+                seed = int(hashlib.sha256(token.encode()).hexdigest()[:16], 16)
+                vector = _token_vectors[token] = np.random.default_rng(seed).standard_normal(HASH_DIM).astype(np.float32)
+            out[row] += vector
+    return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+
+def query_texts(data: dict, granularity: str, n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    tickers = list(data)
+    texts = []
+    for _ in range(n):
+        ticker = tickers[rng.integers(len(tickers))]
+        day = data[ticker].index[rng.integers(len(data[ticker]))]
+        texts.append(f"{ticker} {granularity} {day:%Y-%m-%d} return volatility volume trend")
+    return texts
+
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    if space == "l2":
+        scores = -(np.sum(vectors ** 2, axis=1)[None, :] - 2 * queries @ vectors.T)
+    elif space == "cosine":
+        norms = np.linalg.norm(vectors, axis=1)
+        scores = (queries @ vectors.T) / np.maximum(norms[None, :], 1e-12)
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def dir_size(path: str) -> int:
+    return sum(f.stat().st_size for f in pathlib.Path(path).rglob("*") if f.is_file())
+
+
+def run_setting(ids, vectors, queries, truth, k, hnsw):
+    """
+    Build one index and time queries against it. Each setting gets a fresh
+    index: an ef_search change on a loaded collection only applies once the
+    index is reloaded by a new process.
+    """
+    with tempfile.TemporaryDirectory(prefix="hnsw-bench-") as path:
+        client = chromadb.PersistentClient(path=path)
+        collection = chromaDB.create_chroma_collection(client, "hnsw_bench", hnsw)
+        batch = client.get_max_batch_size()
+        t0 = time.perf_counter()
+        for start in range(0, len(ids), batch):
+            collection.add(ids=ids[start:start + batch], embeddings=vectors[start:start + batch])
+        build_s = time.perf_counter() - t0
+        # a first query loads the segment; keep it out of the timings
+        collection.query(query_embeddings=queries[:1], n_results=k, include=[])
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+
+        latencies, hits = [], 0
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            found = collection.query(query_embeddings=[q], n_results=k, include=[])["ids"][0]
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += len({positions[i] for i in found} & set(expected.tolist()))
+        size = dir_size(path)
+        del collection, client
+    return {
+        **hnsw,
+        "build_s": round(build_s, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "index_mb": round(size / 1e6, 2),
+    }
+
+
+def parse_ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--days", type=int, default=252)
+    parser.add_argument("--granularity", choices=list(chromaDB.GRANULARITIES), default="week")
+    parser.add_argument("--embedder", choices=["model", "hash"], default="model")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", type=str, default=chromaDB.HNSW_SPACE, help="Comma-separated: cosine,l2,ip")
+    parser.add_argument("--m", type=str, default=str(chromaDB.HNSW_M))
+    parser.add_argument("--ef-construction", type=str, default=str(chromaDB.HNSW_EF_CONSTRUCTION))
+    parser.add_argument("--ef-search", type=str, default="10,50,100,200")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results here")
+    args = parser.parse_args()
+
+    data = synthetic_prices(args.tickers, args.days)
+    ids, documents = build_corpus(data, args.granularity)
+    questions = query_texts(data, args.granularity, args.queries)
+    embed = hash_embed if args.embedder == "hash" else embeddings.embed
+    t0 = time.perf_counter()
+    vectors = np.asarray(embed(documents), dtype=np.float32)
+    queries = np.asarray(embed(questions), dtype=np.float32)
+    print(f"{len(ids)} {args.granularity} documents for {args.tickers} tickers, "
+          f"dim {vectors.shape[1]}, embedded in {time.perf_counter() - t0:.1f}s ({args.embedder})")
+
+    results, vector_list, query_list = [], vectors.tolist(), queries.tolist()
+    for space in args.space.split(","):
+        truth = brute_force(vectors, queries, args.k, space)
+        t0 = time.perf_counter()
+        for q in queries:
+            brute_force(vectors, q[None, :], args.k, space)
+        brute_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"[{space}] numpy brute force {brute_ms:.3f} ms/query")
+        grid = itertools.product(parse_ints(args.m), parse_ints(args.ef_construction), parse_ints(args.ef_search))
+        for m, ef_construction, ef_search in grid:
+            hnsw = chromaDB.hnsw_configuration(space, m, ef_construction, ef_search)
+            results.append(run_setting(ids, vector_list, query_list, truth, args.k, hnsw))
+
+    columns = list(results[0])
+    print(" ".join(f"{c:>15}" for c in columns))
+    for row in results:
+        print(" ".join(f"{row[c]!s:>15}" for c in columns))
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,86 @@
+"""
+Chart downsampling benchmark: full daily series vs LTTB / min-max.
+
+    python backend/benchmarks/downsample_bench.py --tickers 5 --years 40 --max-points 1000
+
+For each method reports downsampling time, Agg render time of the report's
+line chart, the size of the plotly figure JSON the dashboard ships to the
+browser (raw x/y JSON if plotly isn't installed), and how far the
+downsampled line strays from the full one (mean |error| as % of range).
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.utils import downsample
+from backend.utils.report_generation import charts
+
+
+def synthetic_frame(tickers: int, years: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-01-31", periods=years * 252)
+    frames = []
+    for i in range(tickers):
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        frames.append(pd.DataFrame({"Date": dates, "Ticker": f"T{i}", "Close": close}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def payload_bytes(df: pd.DataFrame) -> tuple:
+    try:
+        import plotly.express as px
+    except ImportError:
+        columns = {c: df[c].astype(str).tolist() if c == "Date" else df[c].tolist() for c in ("Date", "Ticker", "Close")}
+        return len(json.dumps(columns)), "x/y json"
+    fig = px.line(df, x="Date", y="Close", color="Ticker")
+    return len(fig.to_json()), "plotly json"
+
+
+def line_error(full: pd.DataFrame, sampled: pd.DataFrame) -> float:
+    """Mean |full - interpolated sample| as a percent of each ticker's price range."""
+    errors = []
+    for ticker, part in full.groupby("Ticker"):
+        s = sampled[sampled["Ticker"] == ticker]
+        x, xs = part["Date"].astype("int64").to_numpy(), s["Date"].astype("int64").to_numpy()
+        approx = np.interp(x, xs, s["Close"].to_numpy())
+        span = part["Close"].max() - part["Close"].min()
+        errors.append(np.mean(np.abs(part["Close"].to_numpy() - approx)) / span * 100)
+    return float(np.mean(errors))
+
+
+def render_seconds(df: pd.DataFrame) -> float:
+    series = {t: (p["Date"].to_numpy(), p["Close"].to_numpy()) for t, p in df.groupby("Ticker")}
+    t0 = time.perf_counter()
+    charts.render_line_chart(series, "Raw Price Data", "Date", "Close Price")
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=5)
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--max-points", type=int, default=downsample.MAX_POINTS)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.tickers, args.years)
+    render_seconds(df.head(10))  # load fonts etc. outside the timings
+    print(f"{args.tickers} tickers x {args.years} years = {len(df):,} points, max {args.max_points} per series")
+    print(f"{'method':>8} {'points':>9} {'downsample':>11} {'render':>8} {'payload':>12} {'error':>7}")
+    for method in ("none", "lttb", "minmax"):
+        t0 = time.perf_counter()
+        sampled = downsample.downsample_frame(df, "Date", "Close", group="Ticker",
+                                              max_points=args.max_points, method=method)
+        ds_s = time.perf_counter() - t0
+        size, kind = payload_bytes(sampled)
+        print(f"{method:>8} {len(sampled):>9,} {ds_s * 1000:>9.1f}ms {render_seconds(sampled):>7.2f}s "
+              f"{size / 1e6:>9.2f} MB {line_error(df, sampled):>6.2f}%")
+    print(f"(payload = {kind})")
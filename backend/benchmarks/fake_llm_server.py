@@ -0,0 +1,91 @@
+"""
+Local stand-in for the Gemini `generateContent` REST endpoint, for
+exercising `backend.utils.llm_dispatcher` without network or quota.
+
+    python backend/benchmarks/fake_llm_server.py --port 8765 --latency 1.0 --pro-quota 3
+    GEMINI_API_BASE=http://127.0.0.1:8765 python backend/agent_main_call.py --direct ...
+
+It answers after `latency` seconds with a fixed recommendation — a JSON
+array with one item per fact sheet for batched prompts, of which
+`drop_rate` are left out — returns 503s at `error_rate`, and daily-quota
+429s for a model once it has served its `quota` requests.
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+DEFAULT_REPLY = {"recommendation": "Hold", "reasoning": "Fake LLM server reply."}
+
+
+def create_app(latency: float = 0.5, error_rate: float = 0.0, quotas: Optional[Dict[str, int]] = None,
+               reply: Optional[dict] = None, drop_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    app.state.served = {}
+    app.state.requests = 0
+    quotas = quotas or {}
+    reply = reply or DEFAULT_REPLY
+
+    def answer(prompt: str) -> str:
+        tickers = re.findall(r'"ticker": "([^"]+)"', prompt)
+        if not tickers:
+            return json.dumps(reply)
+        return json.dumps([dict(reply, ticker=t) for t in tickers if random.random() >= drop_rate])
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        body = await request.json()
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        app.state.requests += 1
+        if quotas.get(model) is not None and app.state.served.get(model, 0) >= quotas[model]:
+            return JSONResponse(status_code=429, content={"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED",
+                "message": f"Quota exceeded for {model}",
+                "details": [{"violations": [{"quotaId": "GenerateRequestsPerDayPerProjectPerModel-FreeTier"}]}],
+            }})
+        app.state.served[model] = app.state.served.get(model, 0) + 1
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            app.state.served[model] -= 1
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "message": "overloaded"}})
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": answer(prompt)}]}}]}
+
+    return app
+
+
+def serve_in_thread(app: FastAPI, port: int = 8765) -> uvicorn.Server:
+    """Start the app on 127.0.0.1:`port` in a daemon thread; call `.should_exit = True` to stop."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Share of batch items left out of replies (exercises re-asking).")
+    parser.add_argument("--pro-quota", type=int, default=None,
+                        help="Requests gemini-1.5-pro serves before answering with daily-quota 429s.")
+    args = parser.parse_args()
+
+    quotas = {"gemini-1.5-pro": args.pro_quota} if args.pro_quota is not None else {}
+    uvicorn.run(create_app(args.latency, args.error_rate, quotas, drop_rate=args.drop_rate), host="127.0.0.1", port=args.port)
@@ -0,0 +1,124 @@
+"""
+Validation and memory benchmark for the float32 data path.
+
+    python ../backend/benchmarks/float32_check.py --validate --tickers AAPL,MSFT
+    python ../backend/benchmarks/float32_check.py --memory
+
+Run from `backend/` or `frontend/` like the rest of the pipeline, after
+`collect` + `preprocess` have produced the cleaned dataset.
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.utils import market_store
+from backend.utils.sequence_generator import generate_sequences
+
+FEATURES = ["close", "sma_5", "sma_10", "sma_21", "std_5"]
+
+
+def _max_rel_diff(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    denom = np.maximum(np.abs(b), 1e-12)
+    diff = np.abs(a - b) / denom
+    return float(np.nanmax(diff)) if diff.size else 0.0
+
+
+def validate(tickers, rtol=1e-5, atol=1e-4):
+    """
+    Compare the float32 path against float64 for the stored columns, the
+    rolling features and the scaled training windows. Returns True when every
+    check is within tolerance.
+    """
+    ok = True
+    f32 = market_store.load_table(market_store.CLEANED_CSV_PATH, tickers=tickers, float_dtype="float32")
+    f64 = market_store.load_table(market_store.CLEANED_CSV_PATH, tickers=tickers, float_dtype="float64")
+
+    print("Stored columns (max relative diff):")
+    for col in [c for c in f64.columns if market_store.normalize_column(c) in market_store.NUMERIC_COLUMNS]:
+        rel = _max_rel_diff(f32[col], f64[col])
+        flag = "ok" if rel <= rtol else "FAIL"
+        ok &= rel <= rtol
+        print(f"   {col:<10} {rel:.2e}  {flag}")
+
+    print("Rolling features recomputed from close (max relative diff):")
+    for window in (5, 10, 21):
+        r32 = f32.groupby("ticker", observed=True)["close"].transform(lambda x: x.rolling(window).mean())
+        r64 = f64.groupby("ticker", observed=True)["close"].transform(lambda x: x.rolling(window).mean())
+        rel = _max_rel_diff(r32.dropna(), r64.dropna())
+        flag = "ok" if rel <= rtol else "FAIL"
+        ok &= rel <= rtol
+        print(f"   sma_{window:<6} {rel:.2e}  {flag}")
+
+    print("Scaled training windows (max absolute diff, standardised units):")
+    for ticker in tickers:
+        for model_type in ("lstm", "mlp"):
+            X32, _, y32, _, s32 = generate_sequences(ticker, model_type, float_dtype="float32")
+            X64, _, y64, _, s64 = generate_sequences(ticker, model_type, float_dtype="float64")
+            if X64.size == 0:
+                print(f"   {ticker} {model_type}: no windows, skipped")
+                continue
+            dx = float(np.max(np.abs(X32.astype(np.float64) - X64)))
+            dy = float(np.max(np.abs(y32.astype(np.float64) - y64)))
+            dmean = _max_rel_diff(s32.mean_, s64.mean_)
+            passed = dx <= atol and dy <= atol and dmean <= rtol
+            ok &= passed
+            print(f"   {ticker:<6} {model_type:<4} X={dx:.2e} y={dy:.2e} mean={dmean:.2e} "
+                  f"dtype={X32.dtype}  {'ok' if passed else 'FAIL'}")
+
+    print("✅ float32 path matches float64" if ok else "❌ float32 path outside tolerance")
+    return ok
+
+
+def memory_benchmark(tickers=None):
+    """Report resident size and load time of each table, plus training windows, per dtype."""
+    rows = []
+    for dtype in ("float64", "float32"):
+        for name, path in (("raw", market_store.RAW_CSV_PATH), ("cleaned", market_store.CLEANED_CSV_PATH)):
+            market_store.load_table(path, float_dtype=dtype)  # make sure the store exists
+            t0 = time.perf_counter()
+            df = market_store.load_table(path, float_dtype=dtype)
+            elapsed = time.perf_counter() - t0
+            rows.append({
+                "dtype": dtype,
+                "table": name,
+                "rows": len(df),
+                "memory_mb": df.memory_usage(deep=True).sum() / 1e6,
+                "load_s": elapsed,
+            })
+
+        if tickers:
+            window_bytes = 0
+            for ticker in tickers:
+                X, _, y, _, _ = generate_sequences(ticker, "lstm", float_dtype=dtype)
+                window_bytes += X.nbytes + y.nbytes
+            rows.append({"dtype": dtype, "table": "windows", "rows": len(tickers),
+                         "memory_mb": window_bytes / 1e6, "load_s": float("nan")})
+
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--validate", action="store_true")
+    parser.add_argument("--memory", action="store_true")
+    parser.add_argument("--tickers", type=str, default="AAPL,MSFT")
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    if not (args.validate or args.memory):
+        args.validate = args.memory = True
+    if args.memory:
+        memory_benchmark(tickers)
+    if args.validate and not validate(tickers):
+        sys.exit(1)
@@ -0,0 +1,69 @@
+"""
+Recommendation-dispatch benchmark against the fake Gemini server.
+
+    python backend/benchmarks/llm_dispatch_bench.py --tickers 20 --latency 1.0
+
+Compares one-at-a-time dispatch with the concurrent dispatcher, then checks
+retries (--error-rate) and pro -> flash fallback (--pro-quota).
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.benchmarks.fake_llm_server import create_app, serve_in_thread
+from backend.utils import llm_cache, llm_dispatcher
+
+PRO = "gemini/gemini-1.5-pro"
+FLASH = "gemini/gemini-2.0-flash"
+
+
+def timed(prompts, model, base_url, **kwargs):
+    t0 = time.perf_counter()
+    # fake-server calls must not count against the real daily quotas
+    results = llm_dispatcher.generate_many(prompts, model, base_url=base_url, api_key="fake",
+                                           persist_quota=False, **kwargs)
+    return time.perf_counter() - t0, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--pro-quota", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    # every scenario must reach the server, not replay the previous one's answers
+    llm_cache.ENABLED = False
+
+    # generous limits so the benchmark measures dispatch, not the free tier
+    limits = {PRO: {"rpm": 600, "rpd": 10_000}, FLASH: {"rpm": 600, "rpd": 10_000}}
+    prompts = [f"Recommend ticker T{i:02d}" for i in range(args.tickers)]
+    labels = [f"T{i:02d}" for i in range(args.tickers)]
+
+    server = serve_in_thread(create_app(latency=args.latency), args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    serial_s, _ = timed(prompts, FLASH, base_url, max_concurrency=1, limits=limits)
+    concurrent_s, results = timed(prompts, FLASH, base_url, limits=limits)
+    server.should_exit = True
+    ok = sum(isinstance(r, dict) for r in results)
+    print(f"serial     {serial_s:6.2f}s")
+    print(f"concurrent {concurrent_s:6.2f}s ({ok}/{len(prompts)} ok, one call ~{args.latency:.2f}s)")
+
+    server = serve_in_thread(create_app(latency=0.05, error_rate=args.error_rate), args.port + 1)
+    _, results = timed(prompts, FLASH, f"http://127.0.0.1:{args.port + 1}", limits=limits, max_retries=6)
+    server.should_exit = True
+    print(f"retries    {sum(isinstance(r, dict) for r in results)}/{len(prompts)} ok at error rate {args.error_rate}")
+
+    server = serve_in_thread(create_app(latency=0.05, quotas={"gemini-1.5-pro": args.pro_quota}), args.port + 2)
+    _, results = timed(prompts, PRO, f"http://127.0.0.1:{args.port + 2}", limits=limits)
+    server.should_exit = True
+    models = [r["model"] for r in results if isinstance(r, dict)]
+    print(f"fallback   {models.count(PRO)} answered by pro, {models.count(FLASH)} by flash "
+          f"(pro quota {args.pro_quota})")
@@ -1,44 +1,82 @@
 import sqlite3
 import hashlib
 import os
+import threading
 from datetime import datetime
 from typing import Optional
 
 
+# Every request used to open its own connection on a rollback-journal
+# database, so concurrent logins serialised on the file lock. Connections are
+# now reused per thread, in WAL mode (readers never wait for the writer),
+# with a busy timeout instead of immediate "database is locked" errors.
+DB_PATH = os.getenv("AUTH_DB_PATH", os.path.join(os.path.dirname(__file__), "auth.db"))
+BUSY_TIMEOUT_MS = int(os.getenv("AUTH_DB_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL is durable in WAL mode up to the last checkpointed commit; use FULL
+# if losing the last few activity log rows on power loss is unacceptable.
+SYNCHRONOUS = os.getenv("AUTH_DB_SYNCHRONOUS", "NORMAL")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hashed TEXT NOT NULL,
+    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS activity_logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    action TEXT NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (user_id)
+);
+CREATE INDEX IF NOT EXISTS activity_logs_user ON activity_logs (user_id, timestamp);
+"""
+
+
 class AuthDB:
-    def __init__(self, db_path: str = os.path.join(os.path.dirname(__file__), "auth.db")):
-        """Initialize the database connection"""
+    def __init__(self, db_path: str = DB_PATH, busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+                 synchronous: str = SYNCHRONOUS):
+        """Set up the access layer; connections are opened lazily, one per thread"""
         self.db_path = db_path
-        self._create_tables()
-
-    def _create_tables(self):
-        """Create necessary tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hashed TEXT NOT NULL,
-            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-
-        # Create activity_logs table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activity_logs (
-            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            action TEXT NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        ''')
-
-        conn.commit()
-        conn.close()
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+
+    def migrate(self):
+        """Create tables and indexes if they don't exist (call once at startup)"""
+        with self._migrate_lock:
+            if self._migrated:
+                return
+            conn = self._open()
+            conn.execute("PRAGMA journal_mode=WAL")  # persistent: stored in the database file
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._migrated = True
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (migrating first if nobody has yet)"""
+        if not self._migrated:
+            self.migrate()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
 
     def _hash_password(self, password: str) -> str:
         """Hash a password using SHA-256"""
@@ -47,86 +85,59 @@ class AuthDB:
     def register_user(self, username: str, password: str) -> bool:
         """Register a new user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Hash the password before storing
-            hashed_password = self._hash_password(password)
-
-            # Insert new user
-            cursor.execute(
-                'INSERT INTO users (username, password_hashed) VALUES (?, ?)',
-                (username, hashed_password)
-            )
-
-            # Get the user_id of the newly created user
-            user_id = cursor.lastrowid
-
-            # Log the registration activity
-            cursor.execute(
-                'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
-                (user_id, 'user_registration')
-            )
-
-            conn.commit()
+            with self._conn() as conn:  # one transaction: user and its log row
+                # Hash the password before storing
+                hashed_password = self._hash_password(password)
+
+                # Insert new user
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password_hashed) VALUES (?, ?)',
+                    (username, hashed_password)
+                )
+
+                # Log the registration activity
+                conn.execute(
+                    'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
+                    (cursor.lastrowid, 'user_registration')
+                )
             return True
         except sqlite3.IntegrityError:
             # Username already exists
             return False
-        finally:
-            conn.close()
 
     def verify_user(self, username: str, password: str) -> Optional[int]:
         """Verify user credentials and return user_id if valid"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
+        conn = self._conn()
+        result = conn.execute(
             'SELECT user_id, password_hashed FROM users WHERE username = ?',
             (username,)
-        )
-        result = cursor.fetchone()
+        ).fetchone()
 
         if result and result[1] == self._hash_password(password):
             user_id = result[0]
             # Log the successful login
-            cursor.execute(
-                'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
-                (user_id, 'user_login')
-            )
-            conn.commit()
-            conn.close()
+            with conn:
+                conn.execute(
+                    'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
+                    (user_id, 'user_login')
+                )
             return user_id
-
-        conn.close()
         return None
 
     def log_activity(self, user_id: int, action: str):
         """Log user activity"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
-            (user_id, action)
-        )
-
-        conn.commit()
-        conn.close()
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT INTO activity_logs (user_id, action) VALUES (?, ?)',
+                (user_id, action)
+            )
 
     def get_user_activities(self, user_id: int) -> list:
         """Get all activities for a specific user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
+        return self._conn().execute(
             '''SELECT action, timestamp 
                FROM activity_logs 
                WHERE user_id = ? 
                ORDER BY timestamp DESC''',
             (user_id,)
-        )
-        activities = cursor.fetchall()
-
-        conn.close()
-        return activities
+        ).fetchall()
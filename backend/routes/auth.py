@@ -5,6 +5,7 @@ from typing import Optional
 from datetime import datetime, timedelta
 import jwt
 from jwt.exceptions import PyJWTError
+import asyncio
 import os
 from backend.database.auth_db import AuthDB
 from backend.utils.password_validation import validate_password
@@ -16,7 +17,7 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 router = APIRouter()
-auth_db = AuthDB()
+auth_db = AuthDB()  # no I/O here; main.py runs auth_db.migrate() at startup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -39,7 +40,7 @@ class UserActivity(BaseModel):
 @router.post("/signup")
 async def signup(user: UserCreate):
     """Handle user registration"""
-    success = auth_db.register_user(user.username, user.password)
+    success = await asyncio.to_thread(auth_db.register_user, user.username, user.password)
     if not success:
         raise HTTPException(
             status_code=400,
@@ -74,7 +75,7 @@ def verify_token(token: str) -> int:
 @router.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Handle user login and return access token"""
-    user_id = auth_db.verify_user(form_data.username, form_data.password)
+    user_id = await asyncio.to_thread(auth_db.verify_user, form_data.username, form_data.password)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,7 +103,7 @@ async def get_user_activities(token: str = Depends(oauth2_scheme)):
     """Get user activities"""
     try:
         user_id = int(token)  # Convert token back to user_id
-        activities = auth_db.get_user_activities(user_id)
+        activities = await asyncio.to_thread(auth_db.get_user_activities, user_id)
         return {
             "activities": [
                 {"action": action, "timestamp": timestamp}
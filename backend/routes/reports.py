@@ -1,26 +1,31 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel
+import asyncio
 import os
-# import sys # Removed sys import
-from datetime import datetime
-from ..utils.report_generation.pdf_generator import generate_pdf_report
-from typing import Dict, Any, List # Added List import
+from ..utils.report_generation import report_store
+from ..utils.report_generation.batch import get_batches
+from ..utils.report_generation.report_jobs import get_jobs
+from datetime import date
+from typing import Dict, Any, List, Optional # Added List import
 
 router = APIRouter()
 
-@router.post("/generate")
-async def generate_report(
-    raw_price_data_payload: List[Dict[str, Any]],
-    analysis_results_payload: Dict[str, Dict[str, Any]],
-    llm_recommendations_payload: Dict[str, Dict[str, Any]],
-    research_data_payload: Dict[str, Any], # Retained for now, though PDF won't use it
-    user_symbols_payload: List[str], # Added to receive user-selected symbols
-    forecast_vs_actual_payload: Dict[str, Any] # Added for forecast data
-):
+
+class PriceRange(BaseModel):
+    """Which prices to chart; loaded server-side from the market data store."""
+    symbols: List[str] = [] # empty = the report's user symbols
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+
+class ReportRequest(BaseModel):
     """
-    Generate a PDF report for stock analysis
+    Report inputs (same JSON body as before: one key per payload).
 
-    Parameters:
+    Price data can be given three ways, in order of preference:
+    - raw_price_ref: symbols and date range; the server loads the prices itself.
+    - raw_price_arrow: base64 Arrow IPC stream (Date, Ticker, Close) for ad-hoc data.
     - raw_price_data_payload: List of dictionaries containing raw historical stock data.
     - analysis_results_payload: Dictionary containing ticker-specific analysis metrics.
     - llm_recommendations_payload: Dictionary containing LLM-generated recommendations.
@@ -28,52 +33,122 @@ async def generate_report(
     - user_symbols_payload: List of user-selected stock symbols.
     - forecast_vs_actual_payload: Dictionary containing forecast vs. actual price data.
     """
-    try:
-        # Create reports directory if it doesn't exist
-        os.makedirs("reports", exist_ok=True)
-
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"stock_analysis_report_{timestamp}.pdf"
-        output_path = os.path.join("reports", filename)
-
-        # Combine data into a single dictionary for the PDF generator.
-        # The PDF generator expects specific keys.
-        report_data_for_pdf_generation = {
-            "raw_price_data": raw_price_data_payload,
-            "ticker_analysis": analysis_results_payload,
-            # "stock_data": research_data_payload, # This section will be removed from PDF
-            "analysis_results": analysis_results_payload,
-            "llm_recommendations": llm_recommendations_payload,
-            "user_symbols": user_symbols_payload, # Pass symbols to PDF generator
-            "forecast_vs_actual": forecast_vs_actual_payload, # Pass forecast data
-        }
-        
-        # sys.stdout.write(f"STDOUT_WRITE DEBUG: In routes/reports.py, data for PDF: {report_data_for_pdf_generation}\\n")
-        # sys.stdout.flush() # Removed debug
-        
-        # Generate the report bytes
-        pdf_bytes = generate_pdf_report(report_data_for_pdf_generation)
-        
-        # Save the report bytes to a file
-        with open(output_path, "wb") as f:
-            f.write(pdf_bytes)
-        
-        # Return the PDF file
-        return FileResponse(
-            output_path,
+    raw_price_ref: Optional[PriceRange] = None
+    raw_price_arrow: Optional[str] = None
+    raw_price_data_payload: List[Dict[str, Any]] = []
+    analysis_results_payload: Dict[str, Dict[str, Any]] = {}
+    llm_recommendations_payload: Dict[str, Dict[str, Any]] = {}
+    research_data_payload: Dict[str, Any] = {} # Retained for now, though PDF won't use it
+    user_symbols_payload: List[str] = []
+    forecast_vs_actual_payload: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    """Many reports at once: one per symbol set, all over the same date range."""
+    symbol_sets: List[List[str]]
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+
+def report_data(request: ReportRequest) -> Dict[str, Any]:
+    # Combine data into a single dictionary for the PDF generator.
+    # The PDF generator expects specific keys.
+    # raw_price_ref / raw_price_arrow are resolved on the report worker
+    return {
+        "raw_price_ref": request.raw_price_ref.model_dump() if request.raw_price_ref else None,
+        "raw_price_arrow": request.raw_price_arrow,
+        "raw_price_data": request.raw_price_data_payload,
+        "ticker_analysis": request.analysis_results_payload,
+        "analysis_results": request.analysis_results_payload,
+        "llm_recommendations": request.llm_recommendations_payload,
+        "user_symbols": request.user_symbols_payload, # Pass symbols to PDF generator
+        "forecast_vs_actual": request.forecast_vs_actual_payload, # Pass forecast data
+    }
+
+
+async def pdf_response(job) -> Response:
+    """A finished job's PDF, read from the report store."""
+    if job.pdf is not None:  # report store disabled
+        return Response(
+            content=job.pdf,
             media_type="application/pdf",
-            filename=filename
+            headers={"Content-Disposition": f'attachment; filename="{job.filename}"'},
         )
-    except Exception as e:
-        # sys.stderr.write(f"STDERR_WRITE ERROR in routes/reports.py: {str(e)}\\n") # Removed debug
-        # sys.stderr.flush() # Removed debug
-        raise HTTPException(status_code=500, detail=str(e))
+    file_path = await asyncio.to_thread(report_store.lookup, job.filename)
+    if file_path is None or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Report no longer stored")
+    return FileResponse(file_path, media_type="application/pdf", filename=job.filename)
+
+
+@router.post("/generate")
+async def generate_report(request: ReportRequest):
+    """
+    Generate a PDF report for stock analysis and return it. Generation runs
+    on the report worker pool; this handler only awaits it, so other
+    requests keep being served meanwhile.
+    """
+    job = get_jobs().submit(report_data(request))
+    await asyncio.wrap_future(job.future)
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error)
+    return await pdf_response(job)  # also in the report store for /download
+
+
+@router.post("/jobs", status_code=202)
+async def submit_report_job(request: ReportRequest):
+    """Queue a report; poll GET /reports/jobs/{job_id}, then fetch /reports/jobs/{job_id}/pdf."""
+    return get_jobs().submit(report_data(request)).to_dict()
+
+
+@router.get("/jobs/{job_id}")
+async def report_job_status(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    status = job.to_dict()
+    if job.status == "done":
+        status["pdf_url"] = f"/reports/jobs/{job_id}/pdf"
+    return status
+
+
+@router.get("/jobs/{job_id}/pdf")
+async def report_job_pdf(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}")
+    return await pdf_response(job)
+
+
+@router.post("/batch", status_code=202)
+async def submit_report_batch(request: BatchRequest):
+    """Queue a batch of reports; poll GET /reports/batch/{batch_id} for progress."""
+    symbol_sets = [[s.strip().upper() for s in symbols if s.strip()] for symbols in request.symbol_sets]
+    symbol_sets = [symbols for symbols in symbol_sets if symbols]
+    if not symbol_sets:
+        raise HTTPException(status_code=422, detail="No symbol sets given")
+    return get_batches().submit(symbol_sets, request.start_date, request.end_date).to_dict()
+
+
+@router.get("/batch/{batch_id}")
+async def report_batch_status(batch_id: str):
+    batch = get_batches().get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Report batch not found")
+    status = batch.to_dict()
+    for item in status["items"]:
+        if item["filename"]:
+            item["download_url"] = f"/reports/download/{item['filename']}"
+    return status
+
 
 @router.get("/download/{filename}")
 async def download_report(filename: str):
     """Download a previously generated report"""
-    file_path = os.path.join("reports", filename)
-    if not os.path.exists(file_path):
+    file_path = await asyncio.to_thread(report_store.lookup, filename)
+    if file_path is None or not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Report not found")
     return FileResponse(file_path, media_type="application/pdf", filename=filename)
@@ -11,14 +11,34 @@ BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
 BACKEND_DIR = BASE_DIR / "backend"
 sys.path.insert(0, str(BASE_DIR))
 from backend.utils.data_processor import train_and_forecast
+from backend.utils import market_store
+from backend.utils.artifact_cache import cached_stage
+from backend.utils import company_info, data_handles, history_db
+from backend.utils.tracing import traced
 
+SECTOR_MAP_PATH = "../backend/outputs/ticker_sector_map.json"
+TICKER_ANALYSIS_PATH = "../backend/outputs/ticker_analysis.json"
+SECTOR_SUMMARY_PATH = "../backend/outputs/sector_summary.json"
 
-@tool("process_data")
-def preprocess( min_rows: int = 20) -> pd.DataFrame:
+
+def _load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+@traced("tool.preprocess")
+@cached_stage(
+    "preprocess",
+    inputs=[market_store.COLLECTED_CSV_PATH],
+    outputs=[market_store.CLEANED_CSV_PATH],
+    params={"float_dtype": market_store.FLOAT_DTYPE.name},
+    load=lambda: market_store.load_table(market_store.CLEANED_CSV_PATH),
+)
+def run_preprocess(min_rows: int = 20) -> pd.DataFrame:
         """Preprocesses stock data by standardizing column names and ensuring a minimum number of rows."""
 
-        # Step 1: Standardize column names
-        df = pd.read_csv('../backend/data/processed/cleaned_stock_data.csv')
+        # Step 1: Standardize column names (prices load as float32, labels as categoricals)
+        df = market_store.load_table(market_store.COLLECTED_CSV_PATH)
         df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
         '''
         # Step 2: Filter for specific tickers
@@ -32,18 +52,25 @@ def preprocess( min_rows: int = 20) -> pd.DataFrame:
 
         # Step 4: Sort by 'ticker' and 'date', then fill missing values by ticker
         df = df.sort_values(by=['ticker', 'date']).reset_index(drop=True)
-        df = df.groupby('ticker').apply(lambda g: g.ffill().bfill()).reset_index(drop=True)
+        filled = df.groupby('ticker', observed=True).ffill()
+        filled = filled.groupby(df['ticker'], observed=True).bfill()
+        df[filled.columns] = filled
 
         # Step 5: Feature engineering - Use `transform` instead of `apply`
-        df['sma_5'] = df.groupby('ticker')['close'].transform(lambda x: x.rolling(window=5).mean())
-        df['sma_10'] = df.groupby('ticker')['close'].transform(lambda x: x.rolling(window=10).mean())
-        df['sma_21'] = df.groupby('ticker')['close'].transform(lambda x: x.rolling(window=21).mean())
-        df['std_5'] = df.groupby('ticker')['close'].transform(lambda x: x.rolling(window=5).std())
-        df['return'] = df.groupby('ticker')['close'].pct_change()
+        by_ticker = df.groupby('ticker', observed=True)['close']
+        df['sma_5'] = by_ticker.transform(lambda x: x.rolling(window=5).mean())
+        df['sma_10'] = by_ticker.transform(lambda x: x.rolling(window=10).mean())
+        df['sma_21'] = by_ticker.transform(lambda x: x.rolling(window=21).mean())
+        df['std_5'] = by_ticker.transform(lambda x: x.rolling(window=5).std())
+        df['return'] = by_ticker.pct_change()
+        # rolling() upcasts to float64; bring the engineered features back to the store dtype
+        feature_cols = ['sma_5', 'sma_10', 'sma_21', 'std_5', 'return']
+        df[feature_cols] = df[feature_cols].astype(market_store.FLOAT_DTYPE)
 
         # Step 6: Drop tickers with fewer than 'min_rows' records
         valid_tickers = df['ticker'].value_counts()[lambda x: x >= min_rows].index
         df = df[df['ticker'].isin(valid_tickers)]
+        df['ticker'] = df['ticker'].cat.remove_unused_categories()
 
         # Step 7: Drop rows with remaining NaNs in the features
         df = df.dropna(subset=['sma_5', 'sma_10', 'sma_21', 'std_5', 'return'])
@@ -53,15 +80,23 @@ def preprocess( min_rows: int = 20) -> pd.DataFrame:
             ['date', 'ticker', 'open', 'high', 'low', 'close', 'volume', 'industry_tag', 'sma_5', 'sma_10', 'sma_21',
              'std_5', 'return']]
 
-        OUTPUT_PATH ='../backend/data/processed/cleaned_stock_data.csv'
+        OUTPUT_PATH = market_store.CLEANED_CSV_PATH
         os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
         df.to_csv(OUTPUT_PATH, index=False)
         return df
 
-@tool("show_one")
-def show_ticker(tickers: list[str]) -> pd.DataFrame:
+@traced("tool.show_ticker")
+def run_show_ticker(tickers: list[str], start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
     """Fetches data for a list of specific tickers from the cleaned stock data."""
-    df = pd.read_csv('../backend/data/processed/cleaned_stock_data.csv')
+    df = market_store.load_table(market_store.CLEANED_CSV_PATH, tickers=tickers)
+    if start or end:
+        dates = pd.to_datetime(df['date'], utc=True)
+        mask = pd.Series(True, index=df.index)
+        if start:
+            mask &= dates >= pd.Timestamp(start, tz="UTC")
+        if end:
+            mask &= dates <= pd.Timestamp(end, tz="UTC")
+        df = df[mask]
     list_of_dfs = [] # Initialize an empty list to store DataFrames
     for ticker in tickers:
         ticker_df = df[df['ticker'] == ticker].copy()
@@ -74,47 +109,67 @@ def show_ticker(tickers: list[str]) -> pd.DataFrame:
         return pd.DataFrame()
 
 
-@tool("fetch_data")
-def collect() -> pd.DataFrame:
-        """Fetcnong stock data and taks the important rows."""
+@traced("tool.collect")
+@cached_stage(
+    "collect",
+    inputs=[market_store.RAW_CSV_PATH],
+    outputs=[market_store.COLLECTED_CSV_PATH],
+    load=lambda: market_store.load_table(market_store.COLLECTED_CSV_PATH),
+)
+def run_collect() -> pd.DataFrame:
+        """Fetches the raw stock data and keeps the important columns."""
         # Initialize 'data' as an empty DataFrame
         data = pd.DataFrame()
-        df = pd.read_csv("../backend/data/raw/World-Stock-Prices-Dataset.csv")
-        data = df[['Industry_Tag', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume','Ticker']].dropna()
-        OUTPUT_PATH ='../backend/data/processed/cleaned_stock_data.csv'
+        columns = ['Industry_Tag', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Ticker']
+        df = market_store.load_table(market_store.RAW_CSV_PATH, columns=columns)
+        data = df[columns].dropna()
+        # Written next to (not over) the cleaned data, so collect and preprocess
+        # each own one artifact and can be cached independently.
+        OUTPUT_PATH = market_store.COLLECTED_CSV_PATH
         os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-        #df.to_csv(OUTPUT_PATH, index=False) # This saves the original df, not the cleaned data
         data.to_csv(OUTPUT_PATH, index=False) # Save the cleaned data
         return data
 
-@tool("generate_sector_map")
-def generate_sector_map() ->  pd.DataFrame:
+@traced("tool.generate_sector_map")
+@cached_stage(
+    "generate_sector_map",
+    inputs=[market_store.CLEANED_CSV_PATH],
+    outputs=[SECTOR_MAP_PATH],
+    load=lambda: _load_json(SECTOR_MAP_PATH),
+)
+def run_sector_map() -> Dict[str, str]:
     """Generates a mapping of stock tickers to their industry sectors and saves it to a JSON file."""
-    input_csv = "../backend/data/processed/cleaned_stock_data.csv"
-    output_json = "../backend/outputs/ticker_sector_map.json"
-    df = pd.read_csv(input_csv)
+    input_csv = market_store.CLEANED_CSV_PATH
+    output_json = SECTOR_MAP_PATH
+    df = market_store.load_table(input_csv)
     df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
     df = df.dropna(subset=["ticker", "industry_tag"])
 
     ticker_sector_map = (
-        df.groupby("ticker")["industry_tag"]
+        df.groupby("ticker", observed=True)["industry_tag"]
        .agg(lambda x: x.value_counts().idxmax())
        .to_dict()
     )
 
-    os.makedirs("outputs", exist_ok=True)
+    os.makedirs(os.path.dirname(output_json), exist_ok=True)
     with open(output_json, "w") as f:
         json.dump(ticker_sector_map, f, indent=4)
     print(f"✅ Saved sector map with {len(ticker_sector_map)} entries to {output_json}")
     return ticker_sector_map
 
-@tool("compute_statistics")
-def compute_statistics() -> pd.DataFrame:
+@traced("tool.compute_statistics")
+@cached_stage(
+    "compute_statistics",
+    inputs=[market_store.CLEANED_CSV_PATH, SECTOR_MAP_PATH],
+    outputs=[TICKER_ANALYSIS_PATH, SECTOR_SUMMARY_PATH],
+    load=lambda: pd.read_json(SECTOR_SUMMARY_PATH, orient="records"),
+)
+def run_statistics() -> pd.DataFrame:
     """Computes and saves sector and ticker statistics based on historical stock data and a sector map."""
     # Load and clean the CSV
-    input_csv = "../backend/data/processed/cleaned_stock_data.csv"
-    sector_map_path = "../backend/outputs/ticker_sector_map.json"
-    df = pd.read_csv(input_csv)
+    input_csv = market_store.CLEANED_CSV_PATH
+    sector_map_path = SECTOR_MAP_PATH
+    df = market_store.load_table(input_csv)
     df['date'] = pd.to_datetime(df['date'], utc=True)
     # Load sector mapping
     with open(sector_map_path, "r") as f:
@@ -122,12 +177,13 @@ def compute_statistics() -> pd.DataFrame:
 
     # Filter only known tickers
     df = df[df["ticker"].isin(sector_map.keys())]
+    df["ticker"] = df["ticker"].astype(str)
 
     # Vectorized statistics
-    hi = df.groupby("ticker")["high"].max().rename("highest_price")
-    lo = df.groupby("ticker")["low"].min().rename("lowest_price")
+    hi = market_store.widen(df.groupby("ticker")["high"].max()).rename("highest_price")
+    lo = market_store.widen(df.groupby("ticker")["low"].min()).rename("lowest_price")
 
-    y20 = df[df.date.dt.year == 2020]
+    y20 = df[df.date.dt.year == 2020].assign(close=lambda d: market_store.widen(d["close"]))
     growth = (
             (y20.groupby("ticker")["close"].last() -
              y20.groupby("ticker")["close"].first()) /
@@ -148,23 +204,95 @@ def compute_statistics() -> pd.DataFrame:
     }).reset_index()
 
     # Save to JSON
-    os.makedirs("outputs", exist_ok=True)
-    summary_df.set_index("ticker").to_json("../backend/outputs/ticker_analysis.json", indent=4, orient="index")
-    sector_summary.to_json("../backend/outputs/sector_summary.json", indent=4, orient="records")
+    os.makedirs("../backend/outputs", exist_ok=True)
+    summary_df.set_index("ticker").to_json(TICKER_ANALYSIS_PATH, indent=4, orient="index")
+    sector_summary.to_json(SECTOR_SUMMARY_PATH, indent=4, orient="records")
     print("Sector and ticker statistics saved to outputs/")
     return sector_summary
 
-@tool("forecast_prices")
-def forecast_prices(tickers: Optional[list] = None) -> str:
+@traced("tool.company_info")
+def run_company_info(tickers: list[str]) -> List[str]:
+    """Refresh stale fundamentals for `tickers` ahead of the recommendation step."""
+    refreshed = company_info.get_provider().refresh(tickers)
+    print(f"🏢 Company info: refreshed {len(refreshed)} of {len(tickers)} tickers, the rest were still fresh or unavailable")
+    return refreshed
+
+
+@traced("tool.history_db")
+def run_history_db() -> List[str]:
+    """Load the cleaned dataset into DuckDB and refresh changed tickers' context rows."""
+    refreshed = history_db.refresh()
+    print(f"🦆 History context refreshed for {len(refreshed)} ticker(s)")
+    return refreshed
+
+
+@traced("tool.forecast_prices")
+def run_forecast(tickers: Optional[list] = None) -> Dict[str, Any]:
     """Forecasts prices for a given list of tickers using a pre-existing function."""
     # Assuming train_and_forecast function is defined elsewhere and accessible
 
     results = train_and_forecast(tickers)
 
+    if results:
+        output_path = "../backend/outputs/forecast_results.json"
+        print(f"Forecasting complete for {len(results)} tickers. Results saved to {output_path}")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# crewai tool wrappers. The run_* functions above are the plain pipeline
+# stages, so the direct mode in agent_main_call can run them without an LLM.
+# ---------------------------------------------------------------------------
+
+@tool("process_data")
+def preprocess(min_rows: int = 20) -> Dict[str, Any]:
+    """Preprocesses stock data by standardizing column names and ensuring a minimum number of rows.
+    Returns a handle to the saved dataset with row counts, date range and key stats."""
+    return data_handles.frame_summary(run_preprocess(min_rows), "cleaned")
+
+
+@tool("show_one")
+def show_ticker(tickers: list[str], start: Optional[str] = None, end: Optional[str] = None,
+                columns: Optional[list[str]] = None, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+    """Fetches data for a list of specific tickers from the cleaned stock data.
+    Returns a per-ticker summary and one page of rows; narrow with start/end (YYYY-MM-DD),
+    columns, and page through with page/page_size only if individual rows are needed."""
+    df = run_show_ticker(tickers, start, end)
+    result = data_handles.frame_summary(df, "cleaned")
+    result["per_ticker"] = data_handles.ticker_summaries(df)
+    result.update(data_handles.page_rows(df, page, page_size, columns))
+    return result
+
+
+@tool("fetch_data")
+def collect() -> Dict[str, Any]:
+    """Fetcnong stock data and taks the important rows.
+    Returns a handle to the saved dataset with row counts, date range and key stats."""
+    return data_handles.frame_summary(run_collect(), "collected")
+
+
+@tool("generate_sector_map")
+def generate_sector_map() -> Dict[str, Any]:
+    """Generates a mapping of stock tickers to their industry sectors and saves it to a JSON file.
+    Returns the file location and the number of tickers per sector."""
+    sector_map = run_sector_map()
+    return {
+        "path": SECTOR_MAP_PATH,
+        "tickers": len(sector_map),
+        "tickers_per_sector": pd.Series(sector_map, dtype=object).value_counts().to_dict(),
+    }
+
+
+@tool("compute_statistics")
+def compute_statistics() -> List[Dict[str, Any]]:
+    """Computes and saves sector and ticker statistics based on historical stock data and a sector map."""
+    return run_statistics().to_dict(orient="records")
+
+
+@tool("forecast_prices")
+def forecast_prices(tickers: Optional[list] = None) -> str:
+    """Forecasts prices for a given list of tickers using a pre-existing function."""
+    results = run_forecast(tickers)
     if not results:
         return "Forecasting failed or no tickers were processed."
-
-    output_path = "../ackend/outputs/forecast_results.json"
-    print(f"Forecasting complete for {len(results)} tickers. Results saved to {output_path}")
     return results
-
@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+MANIFEST_PATH = "../backend/outputs/artifact_manifest.json"
+
+# "stat" fingerprints files by mtime+size (cheap, default); "hash" reads the
+# bytes (slower, but survives touch/copy without content changes).
+FINGERPRINT_MODE = os.getenv("ARTIFACT_FINGERPRINT", "stat")
+ENABLED = os.getenv("ARTIFACT_CACHE", "1") != "0"
+
+_manifest_lock = threading.Lock()
+
+
+def file_fingerprint(path: str, mode: Optional[str] = None) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    mode = mode or FINGERPRINT_MODE
+    if mode == "hash":
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"sha256:{digest.hexdigest()}"
+    stat = os.stat(path)
+    return f"stat:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def stage_fingerprint(name: str, inputs: List[str], params: Dict[str, Any]) -> str:
+    payload = {
+        "stage": name,
+        "inputs": {path: file_fingerprint(path) for path in inputs},
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_manifest() -> Dict[str, Any]:
+    if os.path.exists(MANIFEST_PATH):
+        try:
+            with open(MANIFEST_PATH, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def save_manifest(manifest: Dict[str, Any]):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def is_fresh(name: str, fingerprint: str, outputs: List[str]) -> bool:
+    """A stage is fresh when its inputs/params match and its outputs are untouched."""
+    entry = load_manifest().get(name)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    recorded = entry.get("outputs", {})
+    return all(path in recorded and file_fingerprint(path) == recorded[path] for path in outputs)
+
+
+def record(name: str, fingerprint: str, inputs: List[str], outputs: List[str],
+           params: Dict[str, Any], seconds: float):
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest[name] = {
+            "fingerprint": fingerprint,
+            "inputs": {path: file_fingerprint(path) for path in inputs},
+            "outputs": {path: file_fingerprint(path) for path in outputs},
+            "params": params,
+            "seconds": round(seconds, 3),
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        save_manifest(manifest)
+
+
+def cached_stage(name: str, inputs: List[str], outputs: List[str],
+                 params: Optional[Dict[str, Any]] = None, load: Optional[Callable[[], Any]] = None):
+    """
+    Skip a pipeline stage when its input files and call arguments (plus any
+    extra `params`) fingerprint the same as the last successful run and its
+    output files are still there. On a hit the stage returns `load()`
+    (or None) instead of recomputing.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            stage_params = dict(bound.arguments, **(params or {}))
+            fingerprint = stage_fingerprint(name, inputs, stage_params)
+
+            if ENABLED and is_fresh(name, fingerprint, outputs):
+                print(f"⏭️  {name}: inputs unchanged, reusing {', '.join(os.path.basename(p) for p in outputs)}")
+                return load() if load else None
+
+            t0 = time.perf_counter()
+            result = func(*args, **kwargs)
+            record(name, fingerprint, inputs, outputs, stage_params, time.perf_counter() - t0)
+            return result
+
+        return wrapper
+
+    return decorator
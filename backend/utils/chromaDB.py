@@ -1,10 +1,35 @@
+import argparse
+import os
+import pathlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
 import yfinance as yf
 import chromadb
-from chromadb.utils import embedding_functions
-import datetime
 import pandas as pd
-from chromadb.config import Settings # Import Settings
-import chromadb
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.utils import embeddings, market_store
+
+CHROMA_DIR = "../backend/input/chroma_db"
+EMBED_WORKERS = 4
+EMBED_CHUNK = embeddings.BATCH_SIZE
+# "day" writes one document per trading day; "week"/"month" write one summary
+# document per window, which is 5-20x fewer vectors for the same history.
+GRANULARITIES = {"day": None, "week": "W", "month": "M"}
+
+# HNSW index settings. space, M and ef_construction are fixed when a
+# collection is created; ef_search can be changed on an existing one and
+# applies from the next process that loads the index.
+# Measure changes with backend/benchmarks/chroma_hnsw_bench.py.
+HNSW_SPACE = os.getenv("CHROMA_HNSW_SPACE", "cosine")
+HNSW_M = int(os.getenv("CHROMA_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("CHROMA_HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("CHROMA_HNSW_EF_SEARCH", "100"))
+
 tickers = ['PTON', 'AMD', 'ADDYY', 'AXP', 'PMMAF', 'V', 'ADBE', 'UL', 'CSCO',
            'JPM', 'LVMUY', 'ABNB', 'MAR', 'UBSFY', 'ZI', 'TM', 'HLT', 'MCD',
            'HD', 'MA', 'JNJ', 'UBER', 'PG', 'COIN', 'FDX', 'MMM', 'JWN',
@@ -32,76 +57,268 @@ def get_yfinance_data(tickers):
             data[ticker] = None  # Store None to indicate failure
     return data
 
-def create_chroma_collection(client, collection_name="stock_data"):
+def load_csv_data(tickers, csv_path=market_store.RAW_CSV_PATH, period_days: Optional[int] = 365):
+    """
+    Same shape as `get_yfinance_data` (Date-indexed Open/High/Low/Close/Volume
+    frames per ticker), read from a local price CSV instead of the network.
+    `period_days` keeps the last N days per ticker, like yfinance's period="1y".
     """
-    Creates a Chroma collection.
+    df = market_store.load_table(
+        csv_path, columns=["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"], tickers=tickers
+    )
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    data = {}
+    for ticker in tickers:
+        frame = df[df["Ticker"] == ticker].drop(columns="Ticker").set_index("Date").sort_index()
+        if period_days and not frame.empty:
+            frame = frame[frame.index > frame.index.max() - pd.Timedelta(days=period_days)]
+        data[ticker] = frame.astype("float64") if not frame.empty else None
+    return data
+
+def collection_name(granularity: str = "day") -> str:
+    """Each granularity gets its own collection: the documents aren't comparable."""
+    return "stock_data" if granularity == "day" else f"stock_data_{granularity}"
+
+def hnsw_configuration(space: Optional[str] = None, m: Optional[int] = None,
+                       ef_construction: Optional[int] = None, ef_search: Optional[int] = None) -> dict:
+    return {
+        "space": space or HNSW_SPACE,
+        "max_neighbors": m or HNSW_M,
+        "ef_construction": ef_construction or HNSW_EF_CONSTRUCTION,
+        "ef_search": ef_search or HNSW_EF_SEARCH,
+    }
+
+def create_chroma_collection(client, collection_name="stock_data", hnsw: Optional[dict] = None):
+    """
+    Creates a Chroma collection that embeds documents and query texts with
+    the shared, disk-cached embedding service.
 
     Args:
         client: The Chroma client.
         collection_name: The name of the collection.
+        hnsw: Index settings from `hnsw_configuration` (defaults from the environment).
 
     Returns:
         The Chroma collection object.
     """
-    collection = client.get_or_create_collection(name=collection_name)
+    hnsw = hnsw or hnsw_configuration()
+    collection = client.get_or_create_collection(
+        name=collection_name,
+        embedding_function=embeddings.embedding_function(),
+        configuration={"hnsw": hnsw},
+    )
+    current = (collection.configuration or {}).get("hnsw") or {}
+    if current.get("ef_search") != hnsw["ef_search"]:
+        collection.modify(configuration={"hnsw": {"ef_search": hnsw["ef_search"]}})
+    fixed = [k for k in ("space", "max_neighbors", "ef_construction") if current.get(k) != hnsw[k]]
+    if fixed:
+        print(f"⚠️ {collection_name} was built with different {', '.join(fixed)}; "
+              f"delete the collection and re-ingest to apply them.")
     return collection
 
-def add_data_to_chroma(collection, data):
+def document_id(ticker: str, day) -> str:
+    """Deterministic id: re-ingesting the same trading day overwrites instead of duplicating."""
+    return f"{ticker}_{pd.Timestamp(day).strftime('%Y-%m-%d')}"
+
+def stored_latest_dates(collection, tickers: List[str]) -> Dict[str, str]:
+    """Latest ingested day per ticker, read back from the deterministic ids."""
+    latest = {}
+    for ticker in tickers:
+        ids = collection.get(where={"ticker": ticker}, include=[])["ids"]
+        days = [i.rsplit("_", 1)[-1] for i in ids if i.startswith(f"{ticker}_")]
+        if days:
+            latest[ticker] = max(days)
+    return latest
+
+def _day_number(day) -> int:
+    """YYYYMMDD as an int, so Chroma `where` filters can use $gte/$lte on it."""
+    return int(pd.Timestamp(day).strftime("%Y%m%d"))
+
+def build_documents(ticker: str, df: pd.DataFrame, after: Optional[str] = None):
+    """Daily documents for `ticker`, only for days after `after` (YYYY-MM-DD)."""
+    ids, documents, metadatas = [], [], []
+    for day, record in zip(df.index, df.to_dict(orient="records")):
+        date = pd.Timestamp(day).strftime("%Y-%m-%d")
+        if after and date <= after:
+            continue
+        ids.append(document_id(ticker, day))
+        documents.append(
+            f"{ticker} Date: {date}, Open: {record['Open']:.2f}, High: {record['High']:.2f}, "
+            f"Low: {record['Low']:.2f}, Close: {record['Close']:.2f}, Volume: {record['Volume']:.0f}"
+        )
+        metadatas.append({
+            "ticker": ticker,
+            "date": date,
+            "open": float(record['Open']),
+            "high": float(record['High']),
+            "low": float(record['Low']),
+            "close": float(record['Close']),
+            "volume": float(record['Volume']),
+            "start_day": _day_number(day),
+            "end_day": _day_number(day),
+        })
+    return ids, documents, metadatas
+
+def aggregate_windows(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """
+    One row per calendar week/month: OHLC, return over the previous window's
+    close, annualized volatility of daily returns, and average volume with
+    its change against the previous window.
+    """
+    df = df.sort_index()
+    index = df.index.tz_convert(None) if df.index.tz is not None else df.index
+    daily_return = df["Close"].pct_change()
+    grouped = df.assign(ret=daily_return.values).groupby(index.to_period(GRANULARITIES[granularity]))
+    windows = pd.DataFrame({
+        "start": grouped.apply(lambda g: g.index.min()),
+        "end": grouped.apply(lambda g: g.index.max()),
+        "days": grouped.size(),
+        "open": grouped["Open"].first(),
+        "high": grouped["High"].max(),
+        "low": grouped["Low"].min(),
+        "close": grouped["Close"].last(),
+        "volatility": grouped["ret"].std() * (252 ** 0.5) * 100,
+        "avg_volume": grouped["Volume"].mean(),
+    })
+    previous_close = windows["close"].shift(1).fillna(windows["open"])
+    windows["return"] = (windows["close"] / previous_close - 1) * 100
+    windows["volume_change"] = windows["avg_volume"].pct_change() * 100
+    return windows.reset_index(drop=True)
+
+def _window_text(ticker: str, granularity: str, w) -> str:
+    text = (
+        f"{ticker} {granularity} {w['start']:%Y-%m-%d} to {w['end']:%Y-%m-%d} ({w['days']} trading days): "
+        f"Open {w['open']:.2f}, High {w['high']:.2f}, Low {w['low']:.2f}, Close {w['close']:.2f}. "
+        f"Return {w['return']:+.2f}%"
+    )
+    if pd.notna(w["volatility"]):
+        text += f", annualized volatility {w['volatility']:.1f}%"
+    text += f". Average volume {w['avg_volume']:,.0f}"
+    if pd.notna(w["volume_change"]):
+        trend = "up" if w["volume_change"] >= 0 else "down"
+        text += f" ({trend} {abs(w['volume_change']):.1f}% vs previous {granularity})"
+    return text + "."
+
+def build_window_documents(ticker: str, df: pd.DataFrame, granularity: str, after: Optional[str] = None):
     """
-    Adds the yfinance data to a Chroma collection.
+    Weekly/monthly summary documents for `ticker`, keyed by window start.
+    Windows starting before `after` (the latest stored window start) are
+    skipped; the latest one is rewritten since it may have been partial.
+    """
+    ids, documents, metadatas = [], [], []
+    for w in aggregate_windows(df, granularity).to_dict(orient="records"):
+        start = pd.Timestamp(w["start"]).strftime("%Y-%m-%d")
+        if after and start < after:
+            continue
+        ids.append(document_id(ticker, w["start"]))
+        documents.append(_window_text(ticker, granularity, w))
+        metadatas.append({
+            "ticker": ticker,
+            "granularity": granularity,
+            "start_date": start,
+            "end_date": pd.Timestamp(w["end"]).strftime("%Y-%m-%d"),
+            "start_day": _day_number(w["start"]),
+            "end_day": _day_number(w["end"]),
+            "days": int(w["days"]),
+            "open": float(w["open"]),
+            "high": float(w["high"]),
+            "low": float(w["low"]),
+            "close": float(w["close"]),
+            "return_percent": round(float(w["return"]), 4),
+            "volatility_percent": round(float(w["volatility"]), 4) if pd.notna(w["volatility"]) else -1.0,
+            "avg_volume": float(w["avg_volume"]),
+        })
+    return ids, documents, metadatas
+
+def embed_parallel(documents: List[str], embedding_function, workers: int = EMBED_WORKERS,
+                   chunk: int = EMBED_CHUNK) -> List[List[float]]:
+    """Embed in chunks on a thread pool (the torch kernels release the GIL)."""
+    chunks = [documents[i:i + chunk] for i in range(0, len(documents), chunk)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(embedding_function, chunks))
+    return [list(map(float, vector)) for part in parts for vector in part]
+
+def add_data_to_chroma(collection, data, client=None, embedding_function=None, workers: int = EMBED_WORKERS,
+                       granularity: str = "day"):
+    """
+    Upserts the price data into a Chroma collection, skipping days (or
+    windows) that are already stored. New documents are embedded in parallel
+    and written in batches of the client's max batch size.
 
     Args:
         collection: The Chroma collection.
         data: A dictionary where keys are tickers and values are Pandas DataFrames.
+        granularity: "day", "week" or "month"; see `GRANULARITIES`.
+    Returns:
+        Number of documents written.
     """
-    for ticker, df in data.items():
-        if df is not None:
-            records = df.to_dict(orient="records")
-            ids = []
-            documents = []
-            metadatas = []
-
-            for i, record in enumerate(records):
-                record_id = f"{ticker}_{i}"
-                ids.append(record_id)
-                document_string = f"Date: {record['Open']}, Open: {record['Open']}, High: {record['High']}, Low: {record['Low']}, Close: {record['Close']}, Volume: {record['Volume']}"
-                documents.append(document_string)
-                metadatas.append({
-                    "ticker": ticker,
-                    "date": str(df.index[i]),
-                    "open": record['Open'],
-                    "high": record['High'],
-                    "low": record['Low'],
-                    "close": record['Close'],
-                    "volume": record['Volume'],
-                })
-            try:
-                collection.add(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                )
-                print(f"Added data for {ticker} to ChromaDB.")
-            except Exception as e:
-                print(f"Error adding data for {ticker} to ChromaDB: {e}")
-        else:
+    embedding_function = embedding_function or embeddings.embedding_function()
+    max_batch = client.get_max_batch_size() if client is not None else 5000
+    present = [t for t, df in data.items() if df is not None and not df.empty]
+    for ticker in data:
+        if ticker not in present:
             print(f"Skipping {ticker} as no data was retrieved.")
+    latest = stored_latest_dates(collection, present)
+
+    ids, documents, metadatas = [], [], []
+    for ticker in present:
+        if granularity == "day":
+            t_ids, t_docs, t_meta = build_documents(ticker, data[ticker], after=latest.get(ticker))
+        else:
+            t_ids, t_docs, t_meta = build_window_documents(ticker, data[ticker], granularity, after=latest.get(ticker))
+        ids += t_ids
+        documents += t_docs
+        metadatas += t_meta
+        print(f"{ticker}: {len(t_ids)} new {granularity} document(s) since {latest.get(ticker, 'start')}")
+    if not ids:
+        print("ChromaDB is up to date.")
+        return 0
+
+    vectors = embed_parallel(documents, embedding_function, workers=workers)
+    for start in range(0, len(ids), max_batch):
+        end = start + max_batch
+        try:
+            collection.upsert(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=vectors[start:end],
+            )
+        except Exception as e:
+            print(f"Error upserting documents {start}-{end} to ChromaDB: {e}")
+            raise
+    print(f"Upserted {len(ids)} document(s) in {-(-len(ids) // max_batch)} batch(es); "
+          f"embeddings {embeddings.stats()}")
+    return len(ids)
 
 if __name__ == "__main__":
-    # 1. Get data from yfinance
-    yf_data = get_yfinance_data(tickers)
+    parser = argparse.ArgumentParser(description="Ingest daily prices into the Chroma RAG index.")
+    parser.add_argument("--source", choices=["yfinance", "csv"], default="yfinance")
+    parser.add_argument("--csv", type=str, default=market_store.RAW_CSV_PATH,
+                        help="Price CSV for --source csv (World-Stock-Prices layout)")
+    parser.add_argument("--tickers", type=str, default=None, help="Comma-separated subset")
+    parser.add_argument("--persist-dir", type=str, default=CHROMA_DIR)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--granularity", choices=list(GRANULARITIES), default="week",
+                        help="One document per trading day, or per week/month summary")
+    args = parser.parse_args()
+
+    selected = [t.strip() for t in args.tickers.split(",")] if args.tickers else tickers
+
+    # 1. Get price data
+    if args.source == "csv":
+        price_data = load_csv_data(selected, args.csv)
+    else:
+        price_data = get_yfinance_data(selected)
 
     # 2. Initialize Chroma client with persistence
-    # Specify the directory where you want to save the database
-    persist_directory = "stock_data_chroma"
-    client = chromadb.PersistentClient(path="chroma_db")  # Persistence enabled
+    client = chromadb.PersistentClient(path=args.persist_dir)  # Persistence enabled
 
     # 3. Create a Chroma collection
-    chroma_collection = create_chroma_collection(client)
-
-    # 4. Add data to Chroma
-    add_data_to_chroma(chroma_collection, yf_data)
+    chroma_collection = create_chroma_collection(client, collection_name(args.granularity))
 
-    # 5. Persist the data to disk (optional, but recommended for clarity)
+    # 4. Upsert new days/windows into Chroma
+    add_data_to_chroma(chroma_collection, price_data, client=client, workers=args.workers,
+                       granularity=args.granularity)
 
-    print(f"Data ingestion into ChromaDB complete.  Data persisted to {persist_directory}")
+    print(f"Data ingestion into ChromaDB complete.  Data persisted to {args.persist_dir}")
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.utils import replay
+
+STORE_PATH = os.getenv(
+    "COMPANY_INFO_PATH",
+    str(pathlib.Path(__file__).resolve().parents[1] / "data" / "company_info.sqlite"),
+)
+# "yfinance" or the path of a JSON fixture ({ticker: {field: value}}), e.g. one
+# written by `python backend/utils/company_info.py --export fixture.json`.
+SOURCE = os.getenv("COMPANY_INFO_SOURCE", "yfinance")
+FETCH_WORKERS = int(os.getenv("COMPANY_INFO_WORKERS", "8"))
+
+DAY = 24 * 3600
+# Fields we keep, the yfinance keys they come from, and how long each stays fresh.
+FIELDS = {
+    "company_name": (("longName", "shortName"), 30 * DAY),
+    "sector": (("sector",), 30 * DAY),
+    "industry": (("industry",), 30 * DAY),
+    "current_price": (("currentPrice", "regularMarketPrice"), DAY),
+    "market_cap": (("marketCap",), DAY),
+    "pe_ratio": (("trailingPE",), DAY),
+    "dividend_yield": (("dividendYield",), 7 * DAY),
+    "52_week_high": (("fiftyTwoWeekHigh",), DAY),
+    "52_week_low": (("fiftyTwoWeekLow",), DAY),
+    "beta": (("beta",), 7 * DAY),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS company_info (
+    ticker TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (ticker, field)
+);
+"""
+
+
+class YFinanceSource:
+    """Fetches fundamentals from yfinance, a few tickers at a time."""
+
+    def __init__(self, workers: int = FETCH_WORKERS):
+        self.workers = workers
+
+    def _fetch_one(self, symbol: str) -> Dict[str, Any]:
+        import yfinance as yf
+        info = replay.recorded("yfinance.info", {"symbol": symbol}, lambda: yf.Ticker(symbol).info)
+        return {
+            field: next((info.get(k) for k in keys if info.get(k) is not None), None)
+            for field, (keys, _) in FIELDS.items()
+        }
+
+    def fetch(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(symbols)))) as pool:
+            for symbol, future in [(s, pool.submit(self._fetch_one, s)) for s in symbols]:
+                try:
+                    out[symbol] = future.result()
+                except Exception as e:
+                    print(f"[yfinance Error] {symbol}: {e}")
+        return out
+
+
+class FixtureSource:
+    """Serves fundamentals from a local JSON file; for tests and offline runs."""
+
+    def __init__(self, path: str):
+        with open(path, "r") as f:
+            self.data = {k.upper(): v for k, v in json.load(f).items()}
+
+    def fetch(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {s: {f: self.data[s].get(f) for f in FIELDS} for s in symbols if s in self.data}
+
+
+def default_source():
+    return YFinanceSource() if SOURCE == "yfinance" else FixtureSource(SOURCE)
+
+
+class CompanyInfoProvider:
+    """
+    Local table of company fundamentals. Reads never touch the network:
+    they return what is stored (stale or not) and queue a background refresh
+    of stale/missing tickers. `refresh` fetches stale tickers in bulk and is
+    what the pipeline's company_info stage calls ahead of recommendations.
+    """
+
+    def __init__(self, path: str = STORE_PATH, source=None):
+        self.path = path
+        self.source = source
+        self._local = threading.local()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="company-info")
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _source(self):
+        if self.source is None:
+            self.source = default_source()
+        return self.source
+
+    def _rows(self, symbols: List[str]) -> Dict[str, Dict[str, tuple]]:
+        placeholders = ",".join("?" * len(symbols))
+        rows = self._conn().execute(
+            f"SELECT ticker, field, value, fetched_at FROM company_info WHERE ticker IN ({placeholders})",
+            symbols,
+        ).fetchall()
+        out: Dict[str, Dict[str, tuple]] = {}
+        for ticker, field, value, fetched_at in rows:
+            out.setdefault(ticker, {})[field] = (json.loads(value), fetched_at)
+        return out
+
+    def stale(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Tickers with any field missing or older than its TTL."""
+        symbols = [s.upper() for s in symbols]
+        if not symbols:
+            return []
+        now = now or time.time()
+        rows = self._rows(symbols)
+        return [
+            s for s in symbols
+            if any(f not in rows.get(s, {}) or now - rows[s][f][1] > ttl for f, (_, ttl) in FIELDS.items())
+        ]
+
+    def get_many(self, symbols: Iterable[str], refresh_stale: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Stored fundamentals per ticker ("N/A" where unknown); never blocks on the network."""
+        symbols = [s.upper() for s in symbols]
+        if not symbols:
+            return {}
+        rows = self._rows(symbols)
+        if refresh_stale:
+            self.refresh_in_background(self.stale(symbols))
+        out = {}
+        for s in symbols:
+            fields = rows.get(s, {})
+            out[s] = {f: fields[f][0] if f in fields and fields[f][0] is not None else "N/A" for f in FIELDS}
+        return out
+
+    def get(self, symbol: str) -> Dict[str, Any]:
+        return self.get_many([symbol])[symbol.upper()]
+
+    def store(self, data: Dict[str, Dict[str, Any]], fetched_at: Optional[float] = None):
+        fetched_at = fetched_at or time.time()
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO company_info(ticker, field, value, fetched_at) VALUES (?, ?, ?, ?)",
+            [(t.upper(), f, json.dumps(v, default=str), fetched_at)
+             for t, fields in data.items() for f, v in fields.items() if f in FIELDS],
+        )
+
+    def refresh(self, symbols: Iterable[str], force: bool = False) -> List[str]:
+        """Fetch stale (or, with `force`, all) tickers in one bulk call; returns those refreshed."""
+        symbols = [s.upper() for s in symbols]
+        todo = symbols if force else self.stale(symbols)
+        if not todo:
+            return []
+        data = self._source().fetch(todo)
+        self.store(data)
+        return list(data)
+
+    def refresh_in_background(self, symbols: List[str]):
+        with self._in_flight_lock:
+            todo = [s for s in symbols if s not in self._in_flight]
+            self._in_flight.update(todo)
+        if not todo:
+            return
+
+        def run():
+            try:
+                self.refresh(todo)
+            except Exception as e:
+                print(f"[Company info refresh error] {e}")
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight.difference_update(todo)
+
+        self._refresher.submit(run)
+
+    def export(self, path: str):
+        rows = self._conn().execute("SELECT ticker, field, value FROM company_info").fetchall()
+        data: Dict[str, Dict[str, Any]] = {}
+        for ticker, field, value in rows:
+            data.setdefault(ticker, {})[field] = json.loads(value)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+
+_provider: Optional[CompanyInfoProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> CompanyInfoProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CompanyInfoProvider()
+        return _provider
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefetch or export the company fundamentals table.")
+    parser.add_argument("--refresh", type=str, default=None, help="Comma-separated tickers to refresh")
+    parser.add_argument("--force", action="store_true", help="Refetch even if fresh")
+    parser.add_argument("--export", type=str, default=None, help="Write the table as a fixture JSON file")
+    args = parser.parse_args()
+
+    provider = get_provider()
+    if args.refresh:
+        tickers = [s.strip() for s in args.refresh.split(",") if s.strip()]
+        print(f"Refreshed: {provider.refresh(tickers, force=args.force)}")
+    if args.export:
+        provider.export(args.export)
+        print(f"Exported to {args.export}")
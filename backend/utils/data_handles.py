@@ -0,0 +1,98 @@
+import math
+from typing import Any, Dict, List, Optional
+import pandas as pd
+
+from backend.utils import market_store
+
+# Datasets the tools persist and hand to the LLM by name instead of by value.
+HANDLES = {
+    "collected": market_store.COLLECTED_CSV_PATH,
+    "cleaned": market_store.CLEANED_CSV_PATH,
+}
+
+MAX_PAGE_SIZE = 200
+
+
+def _col(df: pd.DataFrame, name: str) -> Optional[str]:
+    for col in df.columns:
+        if market_store.normalize_column(col) == name:
+            return col
+    return None
+
+
+def _round(value, digits=4):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), digits)
+
+
+def frame_summary(df: pd.DataFrame, handle: str) -> Dict[str, Any]:
+    """
+    Small, LLM-friendly description of a persisted price table: where it
+    lives, how big it is, what period it covers and a few close-price stats.
+    """
+    summary = {
+        "handle": handle,
+        "path": HANDLES.get(handle),
+        "rows": int(len(df)),
+        "columns": [str(c) for c in df.columns],
+    }
+    ticker_col, date_col, close_col = _col(df, "ticker"), _col(df, "date"), _col(df, "close")
+    if ticker_col:
+        summary["tickers"] = int(df[ticker_col].nunique())
+    if date_col and len(df):
+        dates = pd.to_datetime(df[date_col], utc=True)
+        summary["date_range"] = [str(dates.min().date()), str(dates.max().date())]
+    if close_col and len(df):
+        close = df[close_col]
+        summary["close"] = {
+            "min": _round(close.min()),
+            "max": _round(close.max()),
+            "mean": _round(close.mean()),
+        }
+    return summary
+
+
+def ticker_summaries(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Per-ticker row count, date range, last close and period return."""
+    out = {}
+    if df.empty:
+        return out
+    dates = pd.to_datetime(df["date"], utc=True)
+    for ticker, group in df.assign(date=dates).sort_values("date").groupby("ticker", observed=True):
+        first, last = group["close"].iloc[0], group["close"].iloc[-1]
+        out[str(ticker)] = {
+            "rows": int(len(group)),
+            "date_range": [str(group["date"].iloc[0].date()), str(group["date"].iloc[-1].date())],
+            "last_close": _round(market_store.widen(last)),
+            "period_return_percent": _round((last - first) / first * 100, 2) if first else None,
+        }
+    return out
+
+
+def page_rows(df: pd.DataFrame, page: int = 1, page_size: int = 50,
+              columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """One page of rows as JSON-ready records, plus the paging metadata."""
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    total = int(len(df))
+    pages = max(1, math.ceil(total / page_size))
+    page = max(1, min(int(page), pages))
+
+    if columns:
+        keep = [c for c in df.columns if c in columns or c in ("date", "ticker")]
+        df = df[keep]
+    chunk = df.iloc[(page - 1) * page_size: page * page_size].copy()
+    if "date" in chunk.columns:
+        chunk["date"] = pd.to_datetime(chunk["date"], utc=True).dt.strftime("%Y-%m-%d")
+    for col in chunk.select_dtypes(include="category").columns:
+        chunk[col] = chunk[col].astype(str)
+    for col in chunk.select_dtypes(include="float32").columns:
+        chunk[col] = market_store.widen(chunk[col])
+
+    return {
+        "total_rows": total,
+        "page": page,
+        "pages": pages,
+        "page_size": page_size,
+        "records": chunk.astype(object).where(chunk.notna(), None).to_dict(orient="records"),
+    }
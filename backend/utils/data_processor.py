@@ -17,6 +17,8 @@ from backend.utils.sequence_generator import generate_sequences
 from backend.models.lstm import build_lstm_model
 from backend.models.mlp import build_mlp_model
 from backend.utils.cache_utils import load_cached_params, save_cached_params
+from backend.utils import market_store
+from backend.utils.tracing import span
 
 
 def inverse_scale_close_only(scaler, scaled_close):
@@ -41,8 +43,10 @@ def get_first_trading_day_and_price(ticker, target_month="2025-01"):
         
     #df = pd.read_csv(data_file)
 
-    df = pd.read_csv("../backend/data/processed/cleaned_stock_data.csv")
-    
+    df = market_store.load_table(
+        market_store.CLEANED_CSV_PATH, columns=["date", "ticker", "close"], tickers=[ticker]
+    )
+
     df["date"] = pd.to_datetime(df["date"], utc=True)
 
     month_df = df[
@@ -55,7 +59,7 @@ def get_first_trading_day_and_price(ticker, target_month="2025-01"):
 
     first_row = month_df.sort_values("date").iloc[0]
     first_date = str(first_row["date"].date())   # 'YYYY-MM-DD'
-    first_close = float(first_row["close"])
+    first_close = market_store.widen(first_row["close"])
     return first_date, first_close
 
 
@@ -75,9 +79,10 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
         print(f"Processing {ticker}...")
 
         # ---- NEW: dynamically choose the first available date in the month
-        target_date, actual_price = get_first_trading_day_and_price(
-            ticker, target_month=target_month
-        )
+        with span("forecast.read", ticker=ticker):
+            target_date, actual_price = get_first_trading_day_and_price(
+                ticker, target_month=target_month
+            )
         if actual_price is None:
             print(f"No price found for {ticker} in {target_month}, skipping.")
             continue
@@ -86,16 +91,18 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
 
         try:
 
-            X_lstm, _, y_train, _, lstm_scaler = generate_sequences(
-                ticker=ticker,
-                model_type="lstm",
-                forecast_target_date=target_date
-            )
-            X_mlp, _, _, _, mlp_scaler = generate_sequences(
-                ticker=ticker,
-                model_type="mlp",
-                forecast_target_date=target_date
-            )
+            with span("forecast.sequences", ticker=ticker) as attrs:
+                X_lstm, _, y_train, _, lstm_scaler = generate_sequences(
+                    ticker=ticker,
+                    model_type="lstm",
+                    forecast_target_date=target_date
+                )
+                X_mlp, _, _, _, mlp_scaler = generate_sequences(
+                    ticker=ticker,
+                    model_type="mlp",
+                    forecast_target_date=target_date
+                )
+                attrs["windows"] = int(X_lstm.shape[0])
 
             lstm_input_shape = X_lstm.shape[1:]
             mlp_input_shape = X_mlp.shape
@@ -105,9 +112,10 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
                 lstm_best = param_cache[ticker]["lstm"]
                 print("      ↳ loaded cached LSTM params")
             else:
-                lstm_best = optimize_model(
-                    "lstm", X_lstm, y_train, X_lstm, y_train
-                )
+                with span("forecast.tune", ticker=ticker, model="lstm"):
+                    lstm_best = optimize_model(
+                        "lstm", X_lstm, y_train, X_lstm, y_train
+                    )
                 param_cache.setdefault(ticker, {})["lstm"] = lstm_best
 
             lstm_best = {
@@ -120,15 +128,17 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
                 None, lstm_input_shape, lstm_best
             )
             lstm_model.compile(optimizer=lstm_opt, loss="mse")
-            lstm_model.fit(
-                X_lstm,
-                y_train,
-                epochs=10,
-                batch_size=lstm_best["batch_size"],
-                verbose=0
-            )
+            with span("forecast.fit", ticker=ticker, model="lstm"):
+                lstm_model.fit(
+                    X_lstm,
+                    y_train,
+                    epochs=10,
+                    batch_size=lstm_best["batch_size"],
+                    verbose=0
+                )
 
-            lstm_scaled_pred = lstm_model.predict(X_lstm[-1:]).flatten()[0]
+            with span("forecast.predict", ticker=ticker, model="lstm"):
+                lstm_scaled_pred = lstm_model.predict(X_lstm[-1:]).flatten()[0]
             lstm_forecast = float(
                 inverse_scale_close_only(lstm_scaler, lstm_scaled_pred)
             )
@@ -140,9 +150,10 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
                 mlp_best = param_cache[ticker]["mlp"]
                 print("      ↳ loaded cached MLP params")
             else:
-                mlp_best = optimize_model(
-                    "mlp", X_mlp, y_train, X_mlp, y_train
-                )
+                with span("forecast.tune", ticker=ticker, model="mlp"):
+                    mlp_best = optimize_model(
+                        "mlp", X_mlp, y_train, X_mlp, y_train
+                    )
                 param_cache.setdefault(ticker, {})["mlp"] = mlp_best
 
             mlp_best = {
@@ -155,15 +166,17 @@ def train_and_forecast(tickers=None, target_month="2025-01"):
                 None, mlp_input_shape, mlp_best
             )
             mlp_model.compile(optimizer=mlp_opt, loss="mse")
-            mlp_model.fit(
-                X_mlp,
-                y_train,
-                epochs=10,
-                batch_size=mlp_best["batch_size"],
-                verbose=0
-            )
+            with span("forecast.fit", ticker=ticker, model="mlp"):
+                mlp_model.fit(
+                    X_mlp,
+                    y_train,
+                    epochs=10,
+                    batch_size=mlp_best["batch_size"],
+                    verbose=0
+                )
 
-            mlp_scaled_pred = mlp_model.predict(X_mlp[-1:]).flatten()[0]
+            with span("forecast.predict", ticker=ticker, model="mlp"):
+                mlp_scaled_pred = mlp_model.predict(X_mlp[-1:]).flatten()[0]
             mlp_forecast = float(
                 inverse_scale_close_only(mlp_scaler, mlp_scaled_pred)
             )
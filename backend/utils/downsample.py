@@ -0,0 +1,79 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# About one point per horizontal pixel of a 10in chart at 100 dpi; more
+# points than pixels can't be seen, only shipped and rasterized.
+MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))
+METHOD = os.getenv("CHART_DOWNSAMPLE", "lttb")  # "lttb", "minmax" or "none"
+
+
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the
+    visual shape of the series. First and last points are always kept.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(x, y, n_out: int) -> np.ndarray:
+    """Indices of each bucket's min and max (n_out // 2 buckets), in order."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    picks = [0, n - 1]
+    for bucket in np.array_split(np.arange(n), n_out // 2):
+        values = y[bucket]
+        picks += [bucket[int(np.argmin(values))], bucket[int(np.argmax(values))]]
+    return np.unique(picks)
+
+
+def downsample_indices(x, y, max_points: int = MAX_POINTS, method: str = METHOD) -> np.ndarray:
+    """
+    Indices to plot for one series, at most ~`max_points`. The series'
+    global min and max are always kept so peaks and troughs survive.
+    """
+    n = len(y)
+    if method == "none" or n <= max_points:
+        return np.arange(n)
+    picks = minmax(x, y, max_points) if method == "minmax" else lttb(x, y, max_points)
+    y = np.asarray(y, dtype=float)
+    return np.union1d(picks, [int(np.argmin(y)), int(np.argmax(y))])
+
+
+def downsample_frame(df: pd.DataFrame, x: str, y: str, group: Optional[str] = None,
+                     max_points: int = MAX_POINTS, method: str = METHOD) -> pd.DataFrame:
+    """Rows of `df` to plot, downsampled per `group` (e.g. per ticker), sorted by `x`."""
+    df = df.dropna(subset=[y]).sort_values([group, x] if group else [x])
+    if method == "none":
+        return df
+    parts = []
+    for _, part in (df.groupby(group, sort=False) if group else [(None, df)]):
+        idx = downsample_indices(part[x].to_numpy(), part[y].to_numpy(), max_points, method)
+        parts.append(part.iloc[idx])
+    return pd.concat(parts) if parts else df
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    str(pathlib.Path(__file__).resolve().parents[1] / "outputs" / "embedding_cache.sqlite"),
+)
+ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL
+);
+"""
+
+_SQLITE_MAX_PARAMS = 900
+
+_model = None
+_model_lock = threading.Lock()
+_local = threading.local()
+_stats = {"cached": 0, "computed": 0}
+_stats_lock = threading.Lock()
+
+
+def get_model():
+    """The sentence-transformers model, loaded once per process."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            print(f"🧠 Loading embedding model {MODEL_NAME}")
+            _model = SentenceTransformer(MODEL_NAME)
+        return _model
+
+
+def _connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def text_key(text: str, model_name: str = MODEL_NAME) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+
+def _cached(keys: List[str]) -> dict:
+    conn, found = _connection(), {}
+    for start in range(0, len(keys), _SQLITE_MAX_PARAMS):
+        chunk = keys[start:start + _SQLITE_MAX_PARAMS]
+        rows = conn.execute(
+            f"SELECT key, dim, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        for key, dim, blob in rows:
+            found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+    return found
+
+
+def _store(pairs):
+    _connection().executemany(
+        "INSERT OR REPLACE INTO vectors(key, dim, vector) VALUES (?, ?, ?)",
+        [(key, int(vec.shape[0]), np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in pairs],
+    )
+
+
+def embed(texts: Sequence[str], batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """
+    Normalized float32 embeddings for `texts`, in order. Vectors already in
+    the disk cache are reused; only unseen texts reach the model, in batches
+    of `batch_size`.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    keys = [text_key(t) for t in texts]
+    found = _cached(list(set(keys))) if ENABLED else {}
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        vectors = get_model().encode(
+            list(missing.values()), batch_size=batch_size,
+            normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False,
+        ).astype(np.float32)
+        computed = dict(zip(missing, vectors))
+        if ENABLED:
+            _store(computed.items())
+        found.update(computed)
+
+    with _stats_lock:
+        _stats["computed"] += len(missing)
+        _stats["cached"] += len(texts) - len(missing)
+    return np.stack([found[key] for key in keys])
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+@register_embedding_function
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by `embed`, for both ingestion and queries."""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or BATCH_SIZE
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [vector for vector in embed(input, self.batch_size)]
+
+    @staticmethod
+    def name() -> str:
+        return "stock-analysis-cached-sentence-transformers"
+
+    def get_config(self) -> dict:
+        return {"model_name": MODEL_NAME, "batch_size": self.batch_size}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "CachedEmbeddingFunction":
+        return CachedEmbeddingFunction(config.get("batch_size"))
+
+
+_function: Optional[CachedEmbeddingFunction] = None
+
+
+def embedding_function() -> CachedEmbeddingFunction:
+    """Shared instance to hand to Chroma collections."""
+    global _function
+    if _function is None:
+        _function = CachedEmbeddingFunction()
+    return _function
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List
+
+import duckdb
+
+from backend.utils import market_store
+
+DUCKDB_PATH = "../backend/input/stock_data.db"
+# DuckDB lets one process at a time hold the file read-write (a refresh in
+# another process); wait this long for its lock before giving up.
+LOCK_TIMEOUT = float(os.getenv("HISTORY_DB_LOCK_TIMEOUT", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_meta (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    loaded_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ticker_context (
+    ticker VARCHAR PRIMARY KEY,
+    last_date DATE,
+    rows BIGINT,
+    last_close DOUBLE,
+    last_5_closes DOUBLE[],
+    avg_volume DOUBLE,
+    avg_volume_20d DOUBLE,
+    high_52w DOUBLE,
+    low_52w DOUBLE,
+    return_1m_percent DOUBLE,
+    return_3m_percent DOUBLE,
+    volatility_20d_percent DOUBLE,
+    refreshed_at TIMESTAMP
+);
+"""
+
+# One table for the whole universe, physically sorted so DuckDB's zone maps
+# can skip everything but the requested tickers.
+LOAD_HISTORY_SQL = """
+CREATE OR REPLACE TABLE history AS
+SELECT CAST(ticker AS VARCHAR) AS ticker,
+       CAST(substr(CAST(date AS VARCHAR), 1, 10) AS DATE) AS date,
+       CAST(open AS DOUBLE) AS open,
+       CAST(high AS DOUBLE) AS high,
+       CAST(low AS DOUBLE) AS low,
+       CAST(close AS DOUBLE) AS close,
+       CAST(volume AS DOUBLE) AS volume
+FROM read_parquet(?)
+ORDER BY ticker, date
+"""
+
+# Tickers whose history changed since their context row was computed.
+CHANGED_TICKERS_SQL = """
+SELECT s.ticker
+FROM (SELECT ticker, max(date) AS last_date, count(*) AS rows FROM history GROUP BY ticker) s
+LEFT JOIN ticker_context c USING (ticker)
+WHERE c.ticker IS NULL OR c.last_date <> s.last_date OR c.rows <> s.rows
+"""
+
+REFRESH_CONTEXT_SQL = """
+INSERT INTO ticker_context
+WITH h AS (
+    SELECT ticker, date, close, high, low, volume,
+           row_number() OVER (PARTITION BY ticker ORDER BY date DESC) AS rn,
+           max(date) OVER (PARTITION BY ticker) AS last_date,
+           close / lag(close) OVER (PARTITION BY ticker ORDER BY date) - 1 AS ret
+    FROM history
+    WHERE list_contains(?, ticker)
+)
+SELECT ticker,
+       max(date),
+       count(*),
+       round(arg_max(close, date), 4),
+       list(round(close, 4) ORDER BY date DESC) FILTER (WHERE rn <= 5),
+       round(avg(volume), 2),
+       round(avg(volume) FILTER (WHERE rn <= 20), 2),
+       round(max(high) FILTER (WHERE date > last_date - INTERVAL 365 DAY), 4),
+       round(min(low) FILTER (WHERE date > last_date - INTERVAL 365 DAY), 4),
+       round((arg_max(close, date) / max(close) FILTER (WHERE rn = 22) - 1) * 100, 2),
+       round((arg_max(close, date) / max(close) FILTER (WHERE rn = 64) - 1) * 100, 2),
+       round(stddev_samp(ret) FILTER (WHERE rn <= 20) * sqrt(252) * 100, 2),
+       now()
+FROM h
+GROUP BY ticker
+"""
+
+CONTEXT_SQL = """
+SELECT * EXCLUDE (refreshed_at)
+FROM ticker_context
+WHERE list_contains(?, ticker)
+"""
+
+_lock = threading.Lock()
+
+
+def _open(path: str, read_only: bool) -> duckdb.DuckDBPyConnection:
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            return duckdb.connect(database=path, read_only=read_only)
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower() or time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+@contextmanager
+def connect(path: str = DUCKDB_PATH, read_only: bool = True) -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Short-lived connection to the history database, read-only unless
+    `refresh` needs to write. Nothing keeps the file open between calls, so
+    a Streamlit session doesn't lock the CLI or the report batch out of it.
+    """
+    with _lock:  # DuckDB refuses a read-only and a read-write handle to one file in one process
+        con = _open(path, read_only)
+        try:
+            yield con
+        finally:
+            con.close()
+
+
+def _fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def refresh(csv_path: str = market_store.CLEANED_CSV_PATH, path: str = DUCKDB_PATH) -> List[str]:
+    """
+    Reload `history` from the columnar store when the cleaned dataset changed,
+    then recompute context rows only for tickers whose history changed.
+    Returns the refreshed tickers.
+    """
+    if not os.path.exists(csv_path):
+        return []
+    parquet = market_store.ensure_store(csv_path)
+    fingerprint = _fingerprint(parquet)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with connect(path, read_only=False) as con:
+        con.execute(SCHEMA)
+        stored = con.execute(
+            "SELECT fingerprint FROM history_meta WHERE source = 'history'"
+        ).fetchone()
+        if stored is None or stored[0] != fingerprint:
+            t0 = time.perf_counter()
+            con.execute(LOAD_HISTORY_SQL, [parquet])
+            con.execute(
+                "INSERT OR REPLACE INTO history_meta VALUES ('history', ?, now())", [fingerprint]
+            )
+            print(f"🦆 Loaded history table from {os.path.basename(parquet)} "
+                  f"in {time.perf_counter() - t0:.2f}s")
+
+        changed = [row[0] for row in con.execute(CHANGED_TICKERS_SQL).fetchall()]
+        con.execute("DELETE FROM ticker_context WHERE ticker NOT IN (SELECT DISTINCT ticker FROM history)")
+        if changed:
+            con.execute("DELETE FROM ticker_context WHERE list_contains(?, ticker)", [changed])
+            con.execute(REFRESH_CONTEXT_SQL, [changed])
+        return changed
+
+
+def context_for(tickers: Iterable[str], path: str = DUCKDB_PATH,
+                refresh_first: bool = True) -> Dict[str, Dict[str, Any]]:
+    """Context fields for a batch of tickers in one parameterized query."""
+    tickers = [t.upper() for t in tickers]
+    if not tickers:
+        return {}
+    if refresh_first:
+        refresh(path=path)
+    if not os.path.exists(path):
+        return {}
+    with connect(path) as con:
+        cursor = con.execute(CONTEXT_SQL, [tickers])
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    out = {}
+    for row in rows:
+        record = dict(zip(columns, row))
+        record["last_date"] = str(record["last_date"]) if record["last_date"] else None
+        out[record.pop("ticker")] = record
+    return out
+
@@ -0,0 +1,255 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    str(pathlib.Path(__file__).resolve().parents[1] / "outputs" / "llm_cache.sqlite"),
+)
+ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_session = {"hits": 0, "misses": 0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    answered_by TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quota_usage (
+    day TEXT NOT NULL,
+    model TEXT NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0,
+    exhausted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, model)
+);
+"""
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread; the dispatcher and crew threads share the file."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != CACHE_PATH:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn, _local.path = conn, CACHE_PATH
+    return conn
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Indentation, trailing spaces and blank lines don't change the answer; drop them."""
+    lines = (re.sub(r"\s+", " ", line).strip() for line in prompt.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(model: str, prompt: Any) -> str:
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True, default=str)
+    return hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+def _count(conn: sqlite3.Connection, name: str):
+    with _stats_lock:
+        _session[name] += 1
+    conn.execute(
+        "INSERT INTO counters(name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+    )
+
+
+def get(model: str, prompt: Any) -> Optional[Dict[str, Any]]:
+    """Cached {"text", "model"} for this model/prompt, or None (also counts the hit/miss)."""
+    if not ENABLED:
+        return None
+    conn = _connection()
+    key = cache_key(model, prompt)
+    now = time.time()
+    row = conn.execute(
+        "SELECT response, answered_by, created_at FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+    if row is not None and now - row[2] > TTL_SECONDS:
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        row = None
+    if row is None:
+        _count(conn, "misses")
+        return None
+    conn.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+    _count(conn, "hits")
+    return {"text": row[0], "model": row[1] or model}
+
+
+def put(model: str, prompt: Any, response: str, answered_by: Optional[str] = None):
+    if not ENABLED or not isinstance(response, str):
+        return
+    conn = _connection()
+    now = time.time()
+    size = len(response.encode())
+    conn.execute(
+        "INSERT OR REPLACE INTO responses(key, model, answered_by, response, size, created_at, last_access) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (cache_key(model, prompt), model, answered_by or model, response, size, now, now),
+    )
+    evict(conn)
+
+
+def evict(conn: Optional[sqlite3.Connection] = None, max_bytes: Optional[int] = None) -> int:
+    """Drop expired rows, then least recently used ones until the total fits `max_bytes`."""
+    conn = conn or _connection()
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    removed = conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - TTL_SECONDS,)).rowcount
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return removed
+    excess, doomed = total - max_bytes, []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+        doomed.append((key,))
+        excess -= size
+        if excess <= 0:
+            break
+    conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+    return removed + len(doomed)
+
+
+def stats() -> Dict[str, Any]:
+    """Lifetime and this-process hit rates plus the cache's current size."""
+    conn = _connection()
+    counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    with _stats_lock:
+        s_hits, s_misses = _session["hits"], _session["misses"]
+    return {
+        "entries": entries,
+        "bytes": total,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "session_hits": s_hits,
+        "session_misses": s_misses,
+        "session_hit_rate": round(s_hits / (s_hits + s_misses), 3) if s_hits + s_misses else None,
+    }
+
+
+def clear():
+    conn = _connection()
+    conn.execute("DELETE FROM responses")
+    conn.execute("DELETE FROM counters")
+
+
+def quota_usage(model: str, day: Optional[date] = None) -> Tuple[int, bool]:
+    """(requests made, quota reported exhausted) for `model` on `day`, across all runs."""
+    row = _connection().execute(
+        "SELECT used, exhausted FROM quota_usage WHERE day = ? AND model = ?",
+        ((day or date.today()).isoformat(), model),
+    ).fetchone()
+    return (row[0], bool(row[1])) if row else (0, False)
+
+
+def record_quota(model: str, used: int = 0, exhausted: bool = False, day: Optional[date] = None):
+    """Add `used` requests to today's count for `model` (and/or mark it exhausted)."""
+    _connection().execute(
+        "INSERT INTO quota_usage(day, model, used, exhausted) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(day, model) DO UPDATE SET used = used + excluded.used, "
+        "exhausted = MAX(exhausted, excluded.exhausted)",
+        ((day or date.today()).isoformat(), model, used, int(exhausted)),
+    )
+    _prune_quota()
+
+
+def reserve_quota(model: str, rpd: Optional[int] = None, day: Optional[date] = None) -> bool:
+    """
+    Count one request for `model` today if it is under `rpd` and not marked
+    exhausted. Check and increment are one UPDATE, so concurrent callers
+    and processes can't overshoot the limit.
+    """
+    conn = _connection()
+    day = (day or date.today()).isoformat()
+    conn.execute("INSERT OR IGNORE INTO quota_usage(day, model) VALUES (?, ?)", (day, model))
+    reserved = conn.execute(
+        "UPDATE quota_usage SET used = used + 1 "
+        "WHERE day = ? AND model = ? AND exhausted = 0 AND (? IS NULL OR used < ?)",
+        (day, model, rpd, rpd),
+    ).rowcount == 1
+    _prune_quota()
+    return reserved
+
+
+def _prune_quota():
+    _connection().execute("DELETE FROM quota_usage WHERE day < ?",
+                          (date.fromordinal(date.today().toordinal() - 7).isoformat(),))
+
+
+def wrap_llm(llm):
+    """
+    Serve a crewai LLM's text replies from the cache, keyed by model and the
+    normalized conversation. Native tool-call replies aren't cached, so
+    tools still run on every pass.
+    """
+    if llm is None or getattr(llm, "_cache_wrapped", False):
+        return llm
+    call = llm.call
+    model = getattr(llm, "model", "unknown")
+
+    @functools.wraps(call)
+    def cached_call(messages, tools=None, *args, **kwargs):
+        if isinstance(messages, str):
+            prompt = messages
+        else:
+            prompt = [{"role": m.get("role"), "content": normalize_prompt(str(m.get("content", "")))}
+                      if isinstance(m, dict) else str(m) for m in messages]
+        prompt = {"messages": prompt, "tools": _tool_names(tools)}
+        hit = get(model, prompt)
+        if hit is not None:
+            return hit["text"]
+        response = call(messages, tools, *args, **kwargs)
+        put(model, prompt, response)
+        return response
+
+    object.__setattr__(llm, "call", cached_call)
+    object.__setattr__(llm, "_cache_wrapped", True)
+    return llm
+
+
+def _tool_names(tools) -> list:
+    names = []
+    for tool in tools or []:
+        if isinstance(tool, dict):
+            names.append(str(tool.get("name") or tool.get("function", {}).get("name")))
+        else:
+            names.append(str(getattr(tool, "name", tool)))
+    return sorted(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+    if args.clear:
+        clear()
+    print(json.dumps(stats(), indent=2))
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import httpx
+
+from backend.utils import llm_cache, replay
+from backend.utils.tracing import span
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# Count requests per model and day in the llm_cache SQLite file, so the rpd
+# limits hold across runs and processes, not just within one dispatcher.
+PERSIST_QUOTA = os.getenv("LLM_PERSIST_QUOTA", "1") != "0"
+
+# Free-tier quotas; override with LLM_MODEL_LIMITS='{"gemini/...": {"rpm": .., "rpd": ..}}'
+MODEL_LIMITS: Dict[str, Dict[str, int]] = {
+    "gemini/gemini-1.5-pro": {"rpm": 2, "rpd": 15},
+    "gemini/gemini-2.0-flash": {"rpm": 15, "rpd": 1500},
+}
+MODEL_LIMITS.update(json.loads(os.getenv("LLM_MODEL_LIMITS", "{}")))
+
+# Where to go once a model's daily quota is spent.
+FALLBACKS: Dict[str, str] = {
+    "gemini/gemini-1.5-pro": "gemini/gemini-2.0-flash",
+}
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class QuotaExhausted(LLMError):
+    """The model's daily quota is spent; retrying today won't help."""
+
+
+class RetryableError(LLMError):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, bursting up to `capacity`. Waiters queue on a
+    lock so they are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def api_model_name(model: str) -> str:
+    return model.split("/", 1)[1] if model.startswith("gemini/") else model
+
+
+def _retry_after(error: Dict[str, Any]) -> Optional[float]:
+    for detail in error.get("details", []):
+        delay = detail.get("retryDelay")
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+    return None
+
+
+def _is_daily_quota(error: Dict[str, Any]) -> bool:
+    for detail in error.get("details", []):
+        for violation in detail.get("violations", []):
+            if "PerDay" in str(violation.get("quotaId", "")):
+                return True
+    return "per day" in str(error.get("message", "")).lower()
+
+
+class GeminiDispatcher:
+    """
+    Fan prompts out to the Gemini REST API with bounded concurrency, a
+    token bucket per model, jittered retries and pro -> flash fallback when
+    a model's daily quota runs out. `base_url` points it at a fake server
+    (backend/benchmarks/fake_llm_server.py) for tests and benchmarks.
+
+    Create it inside the event loop that uses it (or via `generate_many`).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_concurrency: int = MAX_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 fallbacks: Optional[Dict[str, str]] = None, timeout: float = REQUEST_TIMEOUT,
+                 persist_quota: Optional[bool] = None):
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY", "")
+        self.base_url = (base_url or GEMINI_API_BASE).rstrip("/")
+        self.max_retries = max_retries
+        self.limits = limits if limits is not None else MODEL_LIMITS
+        self.fallbacks = fallbacks if fallbacks is not None else FALLBACKS
+        self.timeout = timeout
+        self.persist_quota = PERSIST_QUOTA if persist_quota is None else persist_quota
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.used: Dict[str, int] = {}
+        self.exhausted: Dict[str, date] = {}
+        self.stats = {"calls": 0, "retries": 0, "fallbacks": 0, "errors": 0, "cache_hits": 0}
+        self._announced = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self.buckets:
+            rpm = self.limits.get(model, {}).get("rpm", 60)
+            self.buckets[model] = TokenBucket(rate=rpm / 60.0, capacity=max(1, rpm))
+        return self.buckets[model]
+
+    def _available(self, model: str) -> bool:
+        if self.persist_quota:
+            used, exhausted = llm_cache.quota_usage(model)
+        else:
+            used, exhausted = self.used.get(model, 0), self.exhausted.get(model) == date.today()
+        if exhausted:
+            return False
+        rpd = self.limits.get(model, {}).get("rpd")
+        return rpd is None or used < rpd
+
+    def _reserve(self, model: str) -> bool:
+        """Take one of today's requests for `model`; False once the daily quota is spent."""
+        rpd = self.limits.get(model, {}).get("rpd")
+        if self.persist_quota:
+            reserved = llm_cache.reserve_quota(model, rpd)
+        else:
+            reserved = self.exhausted.get(model) != date.today() and (rpd is None or self.used.get(model, 0) < rpd)
+        if reserved:
+            self.used[model] = self.used.get(model, 0) + 1
+        return reserved
+
+    def _mark_exhausted(self, model: str):
+        self.exhausted[model] = date.today()
+        if self.persist_quota:
+            llm_cache.record_quota(model, exhausted=True)
+
+    async def _post(self, model: str, prompt: str, json_mode: bool = False) -> str:
+        url = f"{self.base_url}/v1beta/models/{api_model_name(model)}:generateContent"
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if json_mode:
+            body["generationConfig"] = {"responseMimeType": "application/json"}
+        try:
+            response = await self._client.post(url, params={"key": self.api_key}, json=body)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise RetryableError(f"{model}: {e!r}")
+
+        if response.status_code == 200:
+            data = response.json()
+            try:
+                return "".join(p.get("text", "") for p in data["candidates"][0]["content"]["parts"])
+            except (KeyError, IndexError, TypeError):
+                raise LLMError(f"{model}: unexpected response {str(data)[:200]}")
+
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            error = {"message": response.text}
+        message = f"{model}: HTTP {response.status_code} {error.get('message', '')}".strip()
+        if response.status_code == 429 and _is_daily_quota(error):
+            raise QuotaExhausted(message)
+        if response.status_code in RETRYABLE_STATUS:
+            raise RetryableError(message, _retry_after(error))
+        raise LLMError(message)
+
+    async def _call_model(self, model: str, prompt: str, json_mode: bool = False) -> str:
+        for attempt in range(self.max_retries + 1):
+            await self._bucket(model).acquire()
+            # Checked per attempt, after the rate-limit wait: requests queued
+            # behind the bucket may have spent the day's quota meanwhile.
+            if not self._reserve(model):
+                raise QuotaExhausted(f"{model}: daily quota exhausted")
+            self.stats["calls"] += 1
+            try:
+                async with self.semaphore:
+                    return await self._post(model, prompt, json_mode)
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(max(e.retry_after or 0, backoff_delay(attempt)))
+        raise LLMError(f"{model}: retries exhausted")
+
+    async def generate(self, prompt: str, model: str, json_mode: bool = False, **span_attrs) -> Dict[str, str]:
+        """Returns {"text", "model"} — `model` is the one that actually answered."""
+        current = model
+        while True:
+            if not self._available(current):
+                fallback = self.fallbacks.get(current)
+                if not fallback:
+                    raise QuotaExhausted(f"{current}: daily quota exhausted and no fallback model")
+                self.stats["fallbacks"] += 1
+                if current not in self._announced:
+                    self._announced.add(current)
+                    print(f"↪️  {current} quota exhausted, falling back to {fallback}")
+                current = fallback
+                continue
+            with span("llm.generate", model=current, prompt_chars=len(prompt), **span_attrs):
+                try:
+                    text = await self._call_model(current, prompt, json_mode)
+                    return {"text": text, "model": current}
+                except QuotaExhausted:
+                    self._mark_exhausted(current)
+                except LLMError:
+                    self.stats["errors"] += 1
+                    raise
+
+    async def generate_all(self, prompts: Sequence[str], model: str,
+                           labels: Optional[Sequence[str]] = None, json_mode: bool = False,
+                           validators: Optional[Sequence[Callable[[str], bool]]] = None,
+                           read_cache: bool = True) -> List[Any]:
+        """
+        All prompts concurrently; failures come back as exception objects.
+        `json_mode` asks the API for a JSON-only reply. A reply is cached only
+        if its prompt's validator (when given) accepts it, and cached replies
+        it rejects are asked again; `read_cache=False` always asks the API.
+        """
+        labels = labels or [None] * len(prompts)
+        validators = validators or [None] * len(prompts)
+
+        async def one(prompt, label, validate):
+            cached = llm_cache.get(model, prompt) if read_cache else None
+            if cached is not None and (validate is None or validate(cached["text"])):
+                self.stats["cache_hits"] += 1
+                return cached
+            payload = {"model": model, "prompt": prompt}
+            if replay.MODE == "replay":
+                return {"text": replay.lookup("gemini.generate", payload), "model": model}
+            result = await self.generate(prompt, model, json_mode=json_mode, ticker=label)
+            if replay.MODE == "record":
+                replay.store("gemini.generate", payload, result["text"])
+            if validate is None or validate(result["text"]):
+                llm_cache.put(model, prompt, result["text"], answered_by=result["model"])
+            return result
+
+        return await asyncio.gather(*(one(p, l, v) for p, l, v in zip(prompts, labels, validators)),
+                                    return_exceptions=True)
+
+
+def run_sync(coro):
+    """Run a coroutine from sync code, even when this thread already has a running loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner, name="llm-dispatch")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def generate_many(prompts: Sequence[str], model: str, labels: Optional[Sequence[str]] = None,
+                  json_mode: bool = False, validators: Optional[Sequence[Callable[[str], bool]]] = None,
+                  read_cache: bool = True, **dispatcher_kwargs) -> List[Any]:
+    """Sync entry point: one dispatcher for the batch, results in prompt order."""
+    async def main():
+        async with GeminiDispatcher(**dispatcher_kwargs) as dispatcher:
+            results = await dispatcher.generate_all(prompts, model, labels, json_mode, validators, read_cache)
+            print(f"🤖 LLM dispatch: {len(prompts)} prompts, {dispatcher.stats}")
+            if llm_cache.ENABLED:
+                cache = llm_cache.stats()
+                print(f"🗃️  LLM cache: hit rate {cache['hit_rate']} lifetime, {cache['entries']} entries, "
+                      f"{cache['bytes'] / 1024:.0f} KiB")
+            return results
+
+    return run_sync(main())
@@ -0,0 +1,114 @@
+import os
+import pathlib
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+RAW_CSV_PATH = "../backend/data/raw/World-Stock-Prices-Dataset.csv"
+COLLECTED_CSV_PATH = "../backend/data/processed/collected_stock_data.csv"
+CLEANED_CSV_PATH = "../backend/data/processed/cleaned_stock_data.csv"
+# Anchored to the package (same place as "../backend/data/store" from
+# frontend/ or backend/) so the API server, which runs from the repo root,
+# shares the store.
+STORE_DIR = os.getenv("STOCK_STORE_DIR", str(pathlib.Path(__file__).resolve().parents[1] / "data" / "store"))
+
+# Keras trains in float32 anyway, so the whole data path (store, features,
+# windows, scalers) stays in float32. Set STOCK_FLOAT_DTYPE=float64 to get the
+# old full-precision behaviour back (used by backend/benchmarks/float32_check.py).
+FLOAT_DTYPE = np.dtype(os.getenv("STOCK_FLOAT_DTYPE", "float32"))
+
+NUMERIC_COLUMNS = {
+    "open", "high", "low", "close", "volume",
+    "dividends", "stock_splits", "capital_gains",
+    "sma_5", "sma_10", "sma_21", "std_5", "return",
+}
+CATEGORICAL_COLUMNS = {"ticker", "industry_tag", "brand_name", "country"}
+
+# Pipeline stages can load the same table from several threads at once.
+_build_lock = threading.Lock()
+
+
+def normalize_column(col):
+    return col.strip().lower().replace(" ", "_")
+
+
+def column_dtypes(columns, float_dtype=None):
+    """
+    Map raw CSV column names to the dtypes we keep in memory: floats for
+    prices/features, categoricals for ticker and industry labels.
+    """
+    float_dtype = np.dtype(float_dtype or FLOAT_DTYPE)
+    dtypes = {}
+    for col in columns:
+        key = normalize_column(col)
+        if key in NUMERIC_COLUMNS:
+            dtypes[col] = float_dtype
+        elif key in CATEGORICAL_COLUMNS:
+            dtypes[col] = "category"
+    return dtypes
+
+
+def widen(values):
+    """
+    Upcast float32 values for reporting using their shortest float32 repr, so
+    a stored 182.79 comes back as 182.79 and not 182.7899932861328.
+    """
+    if isinstance(values, pd.Series):
+        if values.dtype == np.float32:
+            return values.astype(str).astype(np.float64)
+        return values
+    if isinstance(values, np.float32):
+        return float(str(values))
+    return float(values)
+
+
+def read_csv(csv_path, float_dtype=None, **kwargs):
+    """pd.read_csv with the store dtypes applied while parsing (no float64 detour)."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return pd.read_csv(csv_path, dtype=column_dtypes(header, float_dtype), **kwargs)
+
+
+def store_path(csv_path, float_dtype=None):
+    float_dtype = np.dtype(float_dtype or FLOAT_DTYPE)
+    return os.path.join(STORE_DIR, f"{pathlib.Path(csv_path).stem}.{float_dtype.name}.parquet")
+
+
+def build_store(csv_path, float_dtype=None):
+    """Convert a CSV into its typed parquet copy and return the parquet path."""
+    path = store_path(csv_path, float_dtype)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = read_csv(csv_path, float_dtype)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_store(csv_path, float_dtype=None):
+    """Parquet path for `csv_path`, (re)built first if missing or older than the CSV."""
+    path = store_path(csv_path, float_dtype)
+    with _build_lock:
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+            build_store(csv_path, float_dtype)
+    return path
+
+
+def load_table(csv_path, columns=None, tickers=None, float_dtype=None):
+    """
+    Load a price table through the typed parquet store, rebuilding the store
+    whenever the source CSV is newer. `tickers` is pushed down as a row filter
+    so per-ticker callers never materialise the whole universe.
+    """
+    path = ensure_store(csv_path, float_dtype)
+
+    filters = None
+    if tickers is not None:
+        ticker_col = "Ticker" if "Ticker" in pq.read_schema(path).names else "ticker"
+        filters = [(ticker_col, "in", [str(t) for t in tickers])]
+
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    for col in df.columns:
+        if normalize_column(col) in CATEGORICAL_COLUMNS and df[col].dtype == "category":
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
@@ -0,0 +1,186 @@
+import cProfile
+import functools
+import io
+import os
+import pathlib
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from backend.utils.scheduler import Stage
+
+PROFILE_DIR = str(pathlib.Path(__file__).resolve().parents[1] / "outputs" / "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+_session_dir: Optional[str] = None
+
+
+class StackSampler:
+    """
+    Wall-clock sampler: every `interval` seconds it snapshots the Python
+    stacks of the watched threads (all but itself when `thread_ids` is None)
+    and counts them in folded form, ready for flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, thread_ids: Optional[Iterable[int]] = None, interval: float = SAMPLE_INTERVAL):
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if self.thread_ids is None:
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(f"thread {names.get(thread_id, thread_id)}")
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str, root: Optional[str] = None):
+        prefix = f"{root};" if root else ""
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{prefix}{stack} {count}\n")
+
+
+def start_session(name: str) -> str:
+    """Create profiles/<name>_<timestamp>/ and make it the target of `profile_block`."""
+    global _session_dir
+    _session_dir = os.path.join(PROFILE_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(_session_dir, exist_ok=True)
+    return _session_dir
+
+
+def session_dir() -> Optional[str]:
+    return _session_dir
+
+
+def top_functions(stats: pstats.Stats, sort: str, top_n: int) -> str:
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.sort_stats(sort).print_stats(top_n)
+    return buffer.getvalue()
+
+
+@contextmanager
+def profile_block(name: str, out_dir: Optional[str] = None, all_threads: bool = False):
+    """
+    Profile a block with cProfile (calling thread) and the stack sampler,
+    writing <name>.prof, <name>.folded and <name>.top.txt. No-op outside a
+    profiling session.
+    """
+    out_dir = out_dir or _session_dir
+    if out_dir is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 3.12+ allows one deterministic profiler per process; concurrent
+        # stages beyond the first fall back to sampled stacks only.
+        profiler = None
+    sampler = StackSampler(None if all_threads else [threading.get_ident()]).start()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+        base = os.path.join(out_dir, name)
+        sampler.write_folded(f"{base}.folded", root=name)
+        with open(f"{base}.top.txt", "w") as f:
+            if profiler is not None:
+                profiler.dump_stats(f"{base}.prof")
+                f.write(top_functions(pstats.Stats(profiler), "tottime", TOP_N))
+            else:
+                f.write("deterministic profile unavailable (another profiler was active); see the .folded samples\n")
+
+
+def profile_call(name: str, out_dir: str, func, *args, **kwargs):
+    """Module-level so process-pool stages can pickle it via functools.partial."""
+    with profile_block(name, out_dir):
+        return func(*args, **kwargs)
+
+
+def profile_stages(stages: List[Stage], out_dir: Optional[str] = None) -> List[Stage]:
+    """Wrap every stage so it profiles itself, in its worker thread or process."""
+    out_dir = out_dir or _session_dir
+    if out_dir is None:
+        return stages
+    return [
+        Stage(s.name, functools.partial(profile_call, f"stage.{s.name}", out_dir, s.func),
+              deps=s.deps, kind=s.kind, args=s.args, kwargs=s.kwargs)
+        for s in stages
+    ]
+
+
+def summarize(out_dir: Optional[str] = None, top_n: int = TOP_N) -> Optional[Dict[str, str]]:
+    """
+    Merge the session's per-block profiles into summary.txt (top-N by self and
+    cumulative time) and all.folded (one flame graph, a root per block).
+    """
+    out_dir = out_dir or _session_dir
+    if out_dir is None:
+        return None
+    files = sorted(os.listdir(out_dir))
+    prof_files = [os.path.join(out_dir, f) for f in files if f.endswith(".prof")]
+    folded_files = [os.path.join(out_dir, f) for f in files if f.endswith(".folded") and f != "all.folded"]
+
+    summary_path = os.path.join(out_dir, "summary.txt")
+    with open(summary_path, "w") as f:
+        if prof_files:
+            stats = pstats.Stats(*prof_files)
+            f.write(f"Top {top_n} functions by self time\n")
+            f.write(top_functions(stats, "tottime", top_n))
+            f.write(f"\nTop {top_n} functions by cumulative time\n")
+            f.write(top_functions(stats, "cumulative", top_n))
+        else:
+            f.write("No deterministic profiles recorded; see all.folded\n")
+
+    folded_path = os.path.join(out_dir, "all.folded")
+    with open(folded_path, "w") as out:
+        for path in folded_files:
+            with open(path) as f:
+                out.write(f.read())
+
+    return {"dir": out_dir, "summary": summary_path, "folded": folded_path}
+
+
+def print_hot_functions(out_dir: Optional[str] = None, top_n: int = 10):
+    """Short console version of summary.txt."""
+    out_dir = out_dir or _session_dir
+    prof_files = [os.path.join(out_dir, f) for f in sorted(os.listdir(out_dir)) if f.endswith(".prof")]
+    if not prof_files:
+        return
+    stats = pstats.Stats(*prof_files)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+    print(f"🔥 Top {top_n} functions by self time:")
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in rows:
+        print(f"   {tottime:8.3f}s self {cumtime:8.3f}s cum {ncalls:>8} calls  "
+              f"{func} ({os.path.basename(filename)}:{line})")
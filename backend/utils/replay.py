@@ -0,0 +1,125 @@
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# "off" calls through, "record" calls through and stores every response,
+# "replay" serves stored responses only (no network) so runs reproduce offline.
+MODES = ("off", "record", "replay")
+MODE = os.getenv("LLM_REPLAY", "off")
+CASSETTE_PATH = os.getenv(
+    "LLM_CASSETTE",
+    str(pathlib.Path(__file__).resolve().parents[1] / "outputs" / "replay" / "cassette.json"),
+)
+
+_lock = threading.Lock()
+_cassette: Optional[Dict[str, Any]] = None
+
+
+class ReplayMissError(LookupError):
+    """Replay mode hit a request that was never recorded."""
+
+
+def configure(mode: str, path: Optional[str] = None):
+    """
+    Switch mode/cassette for this process and, through the environment, for
+    the process-pool workers it spawns afterwards.
+    """
+    global MODE, CASSETTE_PATH, _cassette
+    if mode not in MODES:
+        raise ValueError(f"Replay mode must be one of {MODES}, got '{mode}'")
+    MODE = mode
+    os.environ["LLM_REPLAY"] = mode
+    if path:
+        CASSETTE_PATH = path
+        os.environ["LLM_CASSETTE"] = path
+    _cassette = None
+
+
+def request_key(kind: str, payload: Any) -> str:
+    blob = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _load() -> Dict[str, Any]:
+    global _cassette
+    if _cassette is None:
+        _cassette = {}
+        if os.path.exists(CASSETTE_PATH):
+            with open(CASSETTE_PATH, "r") as f:
+                _cassette = json.load(f)
+    return _cassette
+
+
+def _save(cassette: Dict[str, Any]):
+    os.makedirs(os.path.dirname(CASSETTE_PATH), exist_ok=True)
+    tmp_path = f"{CASSETTE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cassette, f, indent=1, default=str)
+    os.replace(tmp_path, CASSETTE_PATH)
+
+
+def lookup(kind: str, payload: Any) -> Any:
+    """Recorded response for a request; raises ReplayMissError when absent."""
+    key = request_key(kind, payload)
+    with _lock:
+        entry = _load().get(key)
+    if entry is None:
+        raise ReplayMissError(f"No recorded {kind} response in {CASSETTE_PATH} (key {key[:12]})")
+    return entry["response"]
+
+
+def store(kind: str, payload: Any, response: Any):
+    with _lock:
+        cassette = _load()
+        cassette[request_key(kind, payload)] = {"kind": kind, "response": response}
+        _save(cassette)
+
+
+def recorded(kind: str, payload: Any, fetch: Callable[[], Any]) -> Any:
+    """
+    Return `fetch()` while honouring the replay mode. `payload` identifies
+    the request (model, prompt, symbol, ...); the response must be JSON
+    serializable.
+    """
+    if MODE == "off":
+        return fetch()
+    if MODE == "replay":
+        return lookup(kind, payload)
+    response = fetch()
+    store(kind, payload, response)
+    return response
+
+
+def wrap_llm(llm):
+    """
+    Route a crewai LLM's `call` through `recorded`, keyed by model, messages
+    and tool names. Replay returns the recorded reply as-is: tools the
+    provider executed natively during recording are not rerun.
+    """
+    if llm is None or getattr(llm, "_replay_wrapped", False):
+        return llm
+    call = llm.call
+
+    @functools.wraps(call)
+    def replayable_call(messages, tools=None, *args, **kwargs):
+        payload = {
+            "model": getattr(llm, "model", None),
+            "messages": messages,
+            "tools": sorted(_tool_name(t) for t in tools or []),
+        }
+        return recorded("crewai.llm", payload, lambda: call(messages, tools, *args, **kwargs))
+
+    # BaseLLM is a pydantic model in crewai 1.x; bypass its field checks
+    object.__setattr__(llm, "call", replayable_call)
+    object.__setattr__(llm, "_replay_wrapped", True)
+    return llm
+
+
+def _tool_name(tool) -> str:
+    if isinstance(tool, dict):
+        return str(tool.get("name") or tool.get("function", {}).get("name"))
+    return str(getattr(tool, "name", tool))
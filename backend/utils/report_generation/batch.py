@@ -0,0 +1,274 @@
+"""
+Generate reports for many symbol sets in one go (e.g. every saved watchlist
+overnight):
+
+    python backend/utils/report_generation/batch.py --symbols AAPL,MSFT --symbols KO,PEP --start 2020-01-01
+    python backend/utils/report_generation/batch.py --file watchlists.json --workers 4
+
+Prices are loaded once for the union of all symbols, analysis/forecast/
+recommendation outputs are read once, and every distinct chart is rendered
+once before the PDFs are laid out, all in one bounded process pool.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pathlib
+import shutil
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.utils.report_generation import chart_cache, charts, report_store
+from backend.utils.report_generation.pdf_generator import (
+    forecast_vs_actual_job, generate_pdf_report, raw_price_job, ticker_analysis_job,
+)
+from backend.utils.report_generation.report_inputs import load_prices
+
+OUTPUTS_DIR = BASE_DIR / "backend" / "outputs"
+BATCH_WORKERS = int(os.getenv("REPORT_BATCH_WORKERS", "2"))
+
+
+def load_shared_inputs(outputs_dir: pathlib.Path = OUTPUTS_DIR) -> Dict[str, Dict[str, Any]]:
+    """The pipeline outputs every report slices from, keyed by ticker."""
+    def read(name, default):
+        try:
+            with open(outputs_dir / name) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"⚠️ {name} unavailable for batch reports: {e}")
+            return default
+
+    crew = read("crew_result.json", [])
+    recommendations = crew.get("recommendations", []) if isinstance(crew, dict) else crew
+    return {
+        "analysis": read("ticker_analysis.json", {}),
+        "forecast": read("forecast_results.json", {}),
+        "recommendations": {r["ticker"]: r for r in recommendations if isinstance(r, dict) and "ticker" in r},
+    }
+
+
+def report_data_for(symbols: Sequence[str], shared: Dict[str, Dict[str, Any]], prices) -> Dict[str, Any]:
+    """One report's inputs, in the same shape as the /reports endpoints build them."""
+    symbols = list(symbols)
+    pick = lambda table: {t: table[t] for t in symbols if t in table}
+    analysis = pick(shared["analysis"])
+    return {
+        "raw_price_data": prices[prices["Ticker"].isin(symbols)].reset_index(drop=True),
+        "ticker_analysis": analysis,
+        "analysis_results": analysis,
+        "llm_recommendations": pick(shared["recommendations"]),
+        "user_symbols": symbols,
+        "forecast_vs_actual": pick(shared["forecast"]),
+    }
+
+
+def _init_worker():
+    # Charts are rendered by the batch pool itself; no nested render pool.
+    charts.RENDER_WORKERS = 0
+    # Load matplotlib's font cache and Agg once per worker, not per report.
+    charts.render_line_chart({"warmup": ([0, 1], [0, 1])}, "", "", "", (1, 1))
+
+
+def _generate(report_data: Dict[str, Any]) -> bytes:
+    return bytes(generate_pdf_report(report_data))
+
+
+class ReportBatch:
+    """Progress of one batch: per symbol set, its status and stored filename."""
+
+    def __init__(self, symbol_sets: Sequence[Sequence[str]]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.items = [{"symbols": list(s), "status": "queued", "filename": None, "cached": False, "error": None}
+                      for s in symbol_sets]
+        self.charts = {"total": 0, "rendered": 0, "cached": 0}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        done = sum(item["status"] in ("done", "failed") for item in self.items)
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.items),
+            "done": done,
+            "failed": sum(item["status"] == "failed" for item in self.items),
+            "charts": dict(self.charts),
+            "items": [dict(item) for item in self.items],
+            "duration_s": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+
+def run_batch(batch: ReportBatch, start_date: Optional[date] = None, end_date: Optional[date] = None,
+              workers: int = BATCH_WORKERS, shared: Optional[Dict[str, Dict[str, Any]]] = None,
+              on_progress: Optional[Callable[[ReportBatch, Dict[str, Any]], None]] = None) -> ReportBatch:
+    """
+    Generate every report of `batch`, updating its items as they finish.
+    Reports already in the report store are served from there.
+    """
+    batch.status = "running"
+    progress = on_progress or (lambda b, item: None)
+    try:
+        shared = shared if shared is not None else load_shared_inputs()
+        symbols = sorted({s for item in batch.items for s in item["symbols"]})
+        prices = load_prices(symbols, start_date, end_date)
+
+        todo = {}  # report key -> (inputs, items waiting for it); repeated sets share one PDF
+        for i, item in enumerate(batch.items):
+            report_data = report_data_for(item["symbols"], shared, prices)
+            key = report_store.report_key(report_data)
+            stored = report_store.get(key) if key not in todo else None
+            if stored is not None:
+                item.update(status="done", filename=stored[0], cached=True)
+                progress(batch, item)
+            else:
+                todo.setdefault(key, (report_data, []))[1].append(i)
+
+        if todo:
+            _generate_all(batch, todo, workers, progress)
+        batch.status = "done"
+    except Exception as e:
+        print(f"🚨 Report batch {batch.id} failed: {e}")
+        batch.status, batch.error = "failed", str(e)
+    finally:
+        batch.finished_at = time.time()
+    return batch
+
+
+def _generate_all(batch: ReportBatch, todo: Dict[str, Any], workers: int, progress):
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker) as pool:
+        _render_shared_charts(batch, [data for data, _ in todo.values()], pool)
+        futures = {pool.submit(_generate, data): key for key, (data, _) in todo.items()}
+        for _, indices in todo.values():
+            for i in indices:
+                batch.items[i]["status"] = "running"
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = futures[future]
+                try:
+                    result = {"status": "done", "filename": report_store.put(key, future.result())}
+                except Exception as e:
+                    print(f"🚨 Batch report for {batch.items[todo[key][1][0]]['symbols']} failed: {e}")
+                    result = {"status": "failed", "error": str(e)}
+                for i in todo[key][1]:
+                    batch.items[i].update(result)
+                    progress(batch, batch.items[i])
+
+
+def _render_shared_charts(batch: ReportBatch, reports: List[Dict[str, Any]], pool: ProcessPoolExecutor):
+    """Render each distinct chart of the batch once, into the chart cache the reports then read."""
+    if not chart_cache.ENABLED:
+        return
+    jobs = {}
+    for data in reports:
+        symbols = data["user_symbols"]
+        for job in (raw_price_job(data["raw_price_data"], symbols),
+                    ticker_analysis_job(data["ticker_analysis"], symbols),
+                    forecast_vs_actual_job(data["forecast_vs_actual"], symbols)):
+            if job is not None:
+                jobs.setdefault(chart_cache.chart_key(job.chart, job.symbols, job.data), job)
+    batch.charts["total"] = len(jobs)
+    futures = {}
+    for key, job in jobs.items():
+        if chart_cache.get(key) is not None:
+            batch.charts["cached"] += 1
+        else:
+            futures[pool.submit(job.func, *job.args)] = key
+    for future, key in futures.items():
+        try:
+            chart_cache.put(key, future.result())
+            batch.charts["rendered"] += 1
+        except Exception as e:
+            print(f"Error rendering batch chart: {e}")  # the report renders it again itself
+
+
+class ReportBatches:
+    """Runs one batch at a time in the background; keeps finished batches for `ttl` seconds."""
+
+    def __init__(self, workers: int = BATCH_WORKERS, ttl: float = 24 * 3600):
+        self.workers = workers
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-batch")
+        self._batches: Dict[str, ReportBatch] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, symbol_sets: Sequence[Sequence[str]], start_date: Optional[date] = None,
+               end_date: Optional[date] = None) -> ReportBatch:
+        cutoff = time.time() - self.ttl
+        batch = ReportBatch(symbol_sets)
+        with self._lock:
+            for batch_id in [b.id for b in self._batches.values() if b.finished_at and b.finished_at < cutoff]:
+                del self._batches[batch_id]
+            self._batches[batch.id] = batch
+        self._executor.submit(run_batch, batch, start_date, end_date, self.workers)
+        return batch
+
+    def get(self, batch_id: str) -> Optional[ReportBatch]:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+
+_batches: Optional[ReportBatches] = None
+_batches_lock = threading.Lock()
+
+
+def get_batches() -> ReportBatches:
+    global _batches
+    with _batches_lock:
+        if _batches is None:
+            _batches = ReportBatches()
+        return _batches
+
+
+def _print_progress(batch: ReportBatch, item: Dict[str, Any]):
+    status = batch.to_dict()
+    detail = item["filename"] if item["status"] == "done" else item["error"]
+    print(f"📄 [{status['done']}/{status['total']}] {','.join(item['symbols'])}: {item['status']}"
+          f"{' (stored)' if item['cached'] else ''} {detail}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate PDF reports for many symbol sets.")
+    parser.add_argument("--symbols", action="append", default=[], help="Comma-separated symbol set (repeatable)")
+    parser.add_argument("--file", type=str, default=None,
+                        help="JSON list of symbol lists, or {name: [symbols]} (e.g. saved watchlists)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First price date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last price date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--out", type=str, default=None, help="Also copy the PDFs into this directory")
+    args = parser.parse_args()
+
+    symbol_sets = [[s.strip().upper() for s in arg.split(",") if s.strip()] for arg in args.symbols]
+    if args.file:
+        with open(args.file) as f:
+            loaded = json.load(f)
+        symbol_sets += list(loaded.values()) if isinstance(loaded, dict) else loaded
+    symbol_sets = [s for s in symbol_sets if s]
+    if not symbol_sets:
+        parser.error("no symbol sets given (use --symbols or --file)")
+
+    batch = run_batch(ReportBatch(symbol_sets), args.start, args.end, args.workers, on_progress=_print_progress)
+    summary = batch.to_dict()
+    print(f"✅ {summary['done'] - summary['failed']}/{summary['total']} reports in {summary['duration_s']:.1f}s "
+          f"(charts: {summary['charts']['rendered']} rendered, {summary['charts']['cached']} cached)")
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for item in batch.items:
+            if item["filename"]:
+                shutil.copy(report_store.lookup(item["filename"]), os.path.join(args.out, item["filename"]))
+    if batch.status == "failed" or summary["failed"]:
+        sys.exit(1)
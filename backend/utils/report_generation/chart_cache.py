@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import uuid
+from typing import Any, List, Optional
+
+import pandas as pd
+
+from backend.utils import downsample
+
+CACHE_DIR = os.getenv(
+    "CHART_CACHE_DIR",
+    str(pathlib.Path(__file__).resolve().parents[2] / "outputs" / "chart_cache"),
+)
+ENABLED = os.getenv("CHART_CACHE", "1") != "0"
+MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Bump when the chart rendering changes so old PNGs stop matching.
+CHART_VERSION = "3"
+
+_evict_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def digest(data: Any) -> str:
+    """Content hash of a chart's input: DataFrames by value, everything else as sorted JSON."""
+    h = hashlib.sha256()
+    if isinstance(data, pd.DataFrame):
+        h.update(json.dumps([str(c) for c in data.columns]).encode())
+        h.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    else:
+        h.update(json.dumps(data, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def chart_key(chart: str, symbols: List[str], data: Any) -> str:
+    """
+    Chart type, symbols (in order: they end up in the title), the data hash
+    and the downsampling settings the line charts were drawn with.
+    """
+    settings = [downsample.MAX_POINTS, downsample.METHOD]
+    return hashlib.sha256(
+        json.dumps([CHART_VERSION, settings, chart, list(symbols), digest(data)]).encode()
+    ).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.png")
+
+
+def get(key: str) -> Optional[bytes]:
+    if not ENABLED:
+        return None
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            png = f.read()
+        os.utime(path)  # mtime doubles as last access for eviction
+    except FileNotFoundError:
+        png = None
+    with _stats_lock:
+        _stats["hits" if png is not None else "misses"] += 1
+    return png
+
+
+def put(key: str, png: bytes):
+    if not ENABLED or not png:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = os.path.join(CACHE_DIR, f".{key}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(png)
+    os.replace(tmp, _path(key))  # atomic, so concurrent reports never read half a file
+    evict()
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Remove least recently used PNGs until the cache fits `max_bytes`."""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        try:
+            entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".png")]
+        except FileNotFoundError:
+            return 0
+        stats = []
+        for entry in entries:
+            try:
+                stats.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in stats)
+        removed = 0
+        for _, size, path in sorted(stats):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,105 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Charts are rendered with the object-oriented Agg API only: no pyplot, so
+# no global figure manager shared between requests or threads.
+
+RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "3"))  # 0 renders in-process
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _png(fig: Figure) -> bytes:
+    FigureCanvasAgg(fig)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_line_chart(series: Dict[str, Tuple[np.ndarray, np.ndarray]], title: str, xlabel: str,
+                      ylabel: str, figsize: Tuple[float, float] = (10, 5)) -> bytes:
+    """One line per label; x is a datetime64 array, y a float array."""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+    for label, (x, y) in series.items():
+        ax.plot(x, y, label=label)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend()
+    return _png(fig)
+
+
+def render_grouped_bars(labels: Sequence[str], groups: List[Tuple[str, List[float]]], title: str,
+                        ylabel: str, figsize: Tuple[float, float] = (10, 6), width: float = 0.25) -> bytes:
+    """One bar group per label, one bar per (name, values) in `groups`."""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+    x = np.arange(len(labels))
+    for i, (name, values) in enumerate(groups):
+        ax.bar(x + i * width, values, width, label=name)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xticks(x + width / 2 * (len(groups) - 1))
+    ax.set_xticklabels(labels)
+    ax.legend()
+    return _png(fig)
+
+
+def pool() -> ProcessPoolExecutor:
+    """Shared render pool; spawn, not fork, since the server process runs threads."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def render_many(jobs: Dict[str, Tuple[Callable[..., bytes], tuple]]) -> Dict[str, Optional[bytes]]:
+    """
+    Render {name: (func, args)} concurrently in the process pool and return
+    {name: png bytes or None}. A failing chart is logged and comes back as None.
+    """
+    if not jobs:
+        return {}
+    futures = {}
+    if RENDER_WORKERS > 0:
+        try:
+            executor = pool()
+            futures = {name: executor.submit(func, *args) for name, (func, args) in jobs.items()}
+        except BrokenProcessPool as e:
+            print(f"Chart render pool is broken ({e}); rendering in-process")
+            shutdown()
+            futures = {}
+    out = {}
+    for name, (func, args) in jobs.items():
+        try:
+            try:
+                out[name] = futures[name].result() if name in futures else func(*args)
+            except BrokenProcessPool:
+                shutdown()  # the next report starts a fresh pool
+                out[name] = func(*args)
+        except Exception as e:
+            print(f"Error rendering {name} chart: {e}")
+            out[name] = None
+    return out
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
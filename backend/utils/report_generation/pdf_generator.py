@@ -1,10 +1,173 @@
 import json
 from fpdf import FPDF
-import matplotlib.pyplot as plt
 import io
 from datetime import datetime
 import pandas as pd
-import numpy as np
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from backend.utils import downsample
+from backend.utils.report_generation import chart_cache, charts
+from backend.utils.report_generation.report_inputs import parse_dates
+from backend.utils.tracing import span, trace_run, traced
+
+class ChartJob(NamedTuple):
+    """A chart to render: the cache key inputs plus a picklable render call."""
+    chart: str
+    symbols: List[str]
+    data: Any
+    func: Callable[..., bytes]
+    args: tuple
+
+
+def raw_price_job(raw_price_data, user_symbols) -> Optional[ChartJob]:
+    # records from the request body or a DataFrame loaded from the store
+    if raw_price_data is None or len(raw_price_data) == 0 or not user_symbols:
+        return None
+
+    try:
+        df_raw = pd.DataFrame(raw_price_data)
+        if "Ticker" not in df_raw.columns:
+            print("Error: 'Ticker' column not found in raw_price_data for chart generation.")
+            return None
+
+        df_raw_filtered = df_raw[df_raw["Ticker"].isin(user_symbols)]
+        if df_raw_filtered.empty:
+            print(f"No raw price data for symbols: {user_symbols} after filtering.")
+            return None
+
+        # Ensure 'Date' column exists before trying to convert
+        if "Date" not in df_raw_filtered.columns:
+            print("Error: 'Date' column not found in filtered raw_price_data.")
+            return None
+        df_raw_filtered = df_raw_filtered[["Date", "Ticker", "Close"]].copy() # Avoid SettingWithCopyWarning
+        df_raw_filtered["Date"] = parse_dates(df_raw_filtered["Date"])
+
+        series = {}
+        for ticker in df_raw_filtered["Ticker"].unique():
+            df_ticker = df_raw_filtered[df_raw_filtered["Ticker"] == ticker].dropna(subset=["Close"]).sort_values("Date")
+            dates, closes = df_ticker["Date"].to_numpy(), df_ticker["Close"].to_numpy(dtype=float)
+            # decades of daily closes are far more points than the chart has pixels
+            keep = downsample.downsample_indices(dates, closes)
+            series[ticker] = (dates[keep], closes[keep])
+
+        # Adjusted figsize for potentially less space on title page
+        args = (series, f"Raw Price Data for {', '.join(user_symbols)}", "Date", "Close Price", (10, 5))
+        return ChartJob("raw_price", list(user_symbols), df_raw_filtered, charts.render_line_chart, args)
+    except Exception as e:
+        print(f"Error generating raw price chart: {e}") # Use print for backend logs
+        return None
+
+
+def _bar_groups(df: pd.DataFrame, group_column: str, value_column: str):
+    """Values per group aligned with the tickers on the x axis (0 where a ticker has none)."""
+    tickers = list(df["Ticker"].unique())
+    groups = []
+    for name in df[group_column].unique():
+        group = df[df[group_column] == name]
+        values = []
+        for ticker in tickers:
+            val_series = group[group["Ticker"] == ticker][value_column]
+            values.append(float(val_series.iloc[0]) if not val_series.empty else 0)
+        groups.append((name, values))
+    return tickers, groups
+
+
+def ticker_analysis_job(ticker_analysis_data, user_symbols) -> Optional[ChartJob]:
+    if not ticker_analysis_data or not user_symbols:
+        return None
+
+    try:
+        plot_data = []
+        # Filter ticker_analysis_data for user_symbols
+        filtered_ticker_analysis = {k: v for k, v in ticker_analysis_data.items() if k in user_symbols}
+        if not filtered_ticker_analysis:
+            return None
+
+        for ticker, data in filtered_ticker_analysis.items():
+            if data.get("highest_price") is not None:
+                plot_data.append({"Ticker": ticker, "Metric": "Highest Price", "Value": data["highest_price"]})
+            if data.get("lowest_price") is not None:
+                plot_data.append({"Ticker": ticker, "Metric": "Lowest Price", "Value": data["lowest_price"]})
+            if data.get("growth_2020_percent") is not None:
+                plot_data.append({"Ticker": ticker, "Metric": "Growth Percentage", "Value": data["growth_2020_percent"]})
+
+        if not plot_data:
+            return None
+
+        tickers, groups = _bar_groups(pd.DataFrame(plot_data), "Metric", "Value")
+        args = (tickers, groups, f"Ticker Price and Growth Analysis for {', '.join(user_symbols)}", "Value")
+        return ChartJob("ticker_analysis", list(user_symbols), plot_data, charts.render_grouped_bars, args)
+    except Exception as e:
+        print(f"Error generating ticker analysis chart: {e}") # Use print for backend logs
+        return None
+
+
+def forecast_vs_actual_job(forecast_data, user_symbols) -> Optional[ChartJob]:
+    if not forecast_data or not user_symbols:
+        return None
+
+    try:
+        plot_data = []
+        # Filter forecast_data for user_symbols
+        filtered_forecast_data = {k: v for k, v in forecast_data.items() if k in user_symbols}
+        if not filtered_forecast_data:
+            return None
+
+        for ticker, data in filtered_forecast_data.items():
+            actual_price = data.get("actual_price")
+            lstm_forecast = data.get("LSTM", {}).get("forecast")
+            mlp_forecast = data.get("MLP", {}).get("forecast")
+
+            if actual_price is not None:
+                plot_data.append({"Ticker": ticker, "Value Type": "Actual Price", "Price": actual_price})
+            if lstm_forecast is not None:
+                plot_data.append({"Ticker": ticker, "Value Type": "LSTM Forecast", "Price": lstm_forecast})
+            if mlp_forecast is not None:
+                plot_data.append({"Ticker": ticker, "Value Type": "MLP Forecast", "Price": mlp_forecast})
+
+        if not plot_data:
+            return None
+
+        tickers, groups = _bar_groups(pd.DataFrame(plot_data), "Value Type", "Price")
+        args = (tickers, groups, f"Forecast vs. Actual Prices for {', '.join(user_symbols)}", "Price")
+        return ChartJob("forecast_vs_actual", list(user_symbols), plot_data, charts.render_grouped_bars, args)
+    except Exception as e:
+        print(f"Error generating forecast vs. actual chart: {e}")
+        return None
+
+
+def render_jobs(jobs: Dict[str, Optional[ChartJob]]) -> Dict[str, Optional[io.BytesIO]]:
+    """
+    PNG buffers for the jobs: cached charts are read back, the rest render
+    concurrently in the chart process pool, so the wait is the slowest chart.
+    """
+    out, todo, keys = {}, {}, {}
+    for name, job in jobs.items():
+        if job is None:
+            out[name] = None
+            continue
+        keys[name] = chart_cache.chart_key(job.chart, job.symbols, job.data)
+        png = chart_cache.get(keys[name])
+        if png is None:
+            todo[name] = (job.func, job.args)
+        else:
+            out[name] = io.BytesIO(png)
+    for name, png in charts.render_many(todo).items():
+        if png:
+            chart_cache.put(keys[name], png)
+        out[name] = io.BytesIO(png) if png else None
+    return out
+
+
+def render_charts(report_data) -> Dict[str, Optional[io.BytesIO]]:
+    """All three report charts at once, keyed by chart type."""
+    user_symbols = report_data.get("user_symbols", [])
+    return render_jobs({
+        "raw_price": raw_price_job(report_data.get("raw_price_data", []), user_symbols),
+        "ticker_analysis": ticker_analysis_job(report_data.get("ticker_analysis", {}), user_symbols),
+        "forecast_vs_actual": forecast_vs_actual_job(report_data.get("forecast_vs_actual", {}), user_symbols),
+    })
+
 
 class StockReportPDF(FPDF):
     def __init__(self):
@@ -12,7 +175,7 @@ class StockReportPDF(FPDF):
         self.set_auto_page_break(auto=True, margin=15)
         # Page for title and first chart will be added in a dedicated method or by generate_pdf_report
 
-    def add_title_page_and_raw_price_chart(self, report_data):
+    def add_title_page_and_raw_price_chart(self, report_data, chart_buffers=None):
         self.add_page()
         self.set_font("Arial", "B", 24)
         self.cell(0, 20, "Stock Analysis Report", ln=True, align="C")
@@ -27,7 +190,10 @@ class StockReportPDF(FPDF):
         self.cell(0, 10, "1. Raw Price Data Overview", ln=True, align="L")
         self.set_font("Arial", "", 12)
 
-        chart_buffer_raw = self.generate_raw_price_chart(raw_price_data, user_symbols)
+        if chart_buffers is not None:
+            chart_buffer_raw = chart_buffers.get("raw_price")
+        else:
+            chart_buffer_raw = self.generate_raw_price_chart(raw_price_data, user_symbols)
         if chart_buffer_raw:
             image_width = self.w - self.l_margin - self.r_margin
             # Calculate available height or set a max height for the first page chart
@@ -48,171 +214,21 @@ class StockReportPDF(FPDF):
         self.ln(5)
 
 
+    @traced("report.chart.raw_price")
     def generate_raw_price_chart(self, raw_price_data, user_symbols):
-        if not raw_price_data or not user_symbols:
-            return None
-
-        try:
-            df_raw = pd.DataFrame(raw_price_data)
-            if "Ticker" not in df_raw.columns:
-                print("Error: 'Ticker' column not found in raw_price_data for chart generation.")
-                return None
-            
-            df_raw_filtered = df_raw[df_raw["Ticker"].isin(user_symbols)]
-            if df_raw_filtered.empty:
-                print(f"No raw price data for symbols: {user_symbols} after filtering.")
-                return None
-            
-            # Ensure 'Date' column exists before trying to convert
-            if "Date" not in df_raw_filtered.columns:
-                print("Error: 'Date' column not found in filtered raw_price_data.")
-                return None
-            df_raw_filtered = df_raw_filtered.copy() # Avoid SettingWithCopyWarning
-            df_raw_filtered.loc[:, "Date"] = pd.to_datetime(df_raw_filtered["Date"])
-
-            fig, ax = plt.subplots(figsize=(10, 5)) # Adjusted figsize for potentially less space on title page
-            for ticker in df_raw_filtered["Ticker"].unique():
-                df_ticker = df_raw_filtered[df_raw_filtered["Ticker"] == ticker]
-                ax.plot(df_ticker["Date"], df_ticker["Close"], label=ticker)
-
-            ax.set_title(f"Raw Price Data for {', '.join(user_symbols)}")
-            ax.set_xlabel("Date")
-            ax.set_ylabel("Close Price")
-            ax.legend()
-            plt.tight_layout()
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            plt.close(fig) # Close the figure to free memory
-            return buf
-        except Exception as e:
-            print(f"Error generating raw price chart: {e}") # Use print for backend logs
-            return None
+        return render_jobs({"raw_price": raw_price_job(raw_price_data, user_symbols)})["raw_price"]
 
+    @traced("report.chart.ticker_analysis")
     def generate_ticker_analysis_chart(self, ticker_analysis_data, user_symbols):
-        if not ticker_analysis_data or not user_symbols:
-            return None
-
-        try:
-            plot_data = []
-            # Filter ticker_analysis_data for user_symbols
-            filtered_ticker_analysis = {k: v for k, v in ticker_analysis_data.items() if k in user_symbols}
-            if not filtered_ticker_analysis:
-                return None
-
-            for ticker, data in filtered_ticker_analysis.items():
-                if data.get("highest_price") is not None:
-                    plot_data.append({"Ticker": ticker, "Metric": "Highest Price", "Value": data["highest_price"]})
-                if data.get("lowest_price") is not None:
-                    plot_data.append({"Ticker": ticker, "Metric": "Lowest Price", "Value": data["lowest_price"]})
-                if data.get("growth_2020_percent") is not None:
-                    plot_data.append({"Ticker": ticker, "Metric": "Growth Percentage", "Value": data["growth_2020_percent"]})
-
-            if not plot_data:
-                return None
-
-            df_analysis = pd.DataFrame(plot_data)
-            
-            # Ensure 'Ticker' column exists and is not empty for x-axis labels
-            unique_tickers_for_plot = df_analysis["Ticker"].unique()
-            if len(unique_tickers_for_plot) == 0:
-                return None
-
-
-            fig, ax = plt.subplots(figsize=(10, 6))
-            metrics = df_analysis["Metric"].unique()
-            x = np.arange(len(unique_tickers_for_plot)) # Use unique_tickers_for_plot
-            width = 0.25
-
-            for i, metric in enumerate(metrics):
-                metric_data = df_analysis[df_analysis["Metric"] == metric]
-                # Align values with unique_tickers_for_plot
-                values = []
-                for t_plot in unique_tickers_for_plot:
-                    val_series = metric_data[metric_data["Ticker"] == t_plot]["Value"]
-                    values.append(val_series.iloc[0] if not val_series.empty else 0)
-                ax.bar(x + i*width, values, width, label=metric)
-
-            ax.set_ylabel("Value")
-            ax.set_title(f"Ticker Price and Growth Analysis for {', '.join(user_symbols)}")
-            ax.set_xticks(x + width/2 * (len(metrics) - 1))
-            ax.set_xticklabels(unique_tickers_for_plot) # Use unique_tickers_for_plot
-            ax.legend()
-            plt.tight_layout()
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            plt.close(fig) # Close the figure to free memory
-            return buf
-        except Exception as e:
-            print(f"Error generating ticker analysis chart: {e}") # Use print for backend logs
-            return None
+        job = ticker_analysis_job(ticker_analysis_data, user_symbols)
+        return render_jobs({"ticker_analysis": job})["ticker_analysis"]
 
+    @traced("report.chart.forecast_vs_actual")
     def generate_forecast_vs_actual_chart(self, forecast_data, user_symbols):
-        if not forecast_data or not user_symbols:
-            return None
-
-        try:
-            plot_data = []
-            # Filter forecast_data for user_symbols
-            filtered_forecast_data = {k: v for k, v in forecast_data.items() if k in user_symbols}
-            if not filtered_forecast_data:
-                return None
-
-            for ticker, data in filtered_forecast_data.items():
-                actual_price = data.get("actual_price")
-                lstm_forecast = data.get("LSTM", {}).get("forecast")
-                mlp_forecast = data.get("MLP", {}).get("forecast")
-
-                if actual_price is not None:
-                    plot_data.append({"Ticker": ticker, "Value Type": "Actual Price", "Price": actual_price})
-                if lstm_forecast is not None:
-                    plot_data.append({"Ticker": ticker, "Value Type": "LSTM Forecast", "Price": lstm_forecast})
-                if mlp_forecast is not None:
-                    plot_data.append({"Ticker": ticker, "Value Type": "MLP Forecast", "Price": mlp_forecast})
-            
-            if not plot_data:
-                return None
-
-            df_forecast_plot = pd.DataFrame(plot_data)
-            
-            unique_tickers_for_plot = df_forecast_plot["Ticker"].unique()
-            if len(unique_tickers_for_plot) == 0:
-                return None
-
-            fig, ax = plt.subplots(figsize=(10, 6))
-            value_types = df_forecast_plot["Value Type"].unique()
-            x = np.arange(len(unique_tickers_for_plot))
-            width = 0.25 # Adjust width as needed based on number of value types
-
-            for i, v_type in enumerate(value_types):
-                type_data = df_forecast_plot[df_forecast_plot["Value Type"] == v_type]
-                values = []
-                for t_plot in unique_tickers_for_plot:
-                    val_series = type_data[type_data["Ticker"] == t_plot]["Price"]
-                    values.append(val_series.iloc[0] if not val_series.empty else 0)
-                ax.bar(x + i * width, values, width, label=v_type)
-
-            ax.set_ylabel("Price")
-            ax.set_title(f"Forecast vs. Actual Prices for {', '.join(user_symbols)}")
-            ax.set_xticks(x + width / 2 * (len(value_types) -1))
-            ax.set_xticklabels(unique_tickers_for_plot)
-            ax.legend()
-            plt.tight_layout()
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            plt.close(fig)
-            return buf
-        except Exception as e:
-            print(f"Error generating forecast vs. actual chart: {e}")
-            return None
-
+        job = forecast_vs_actual_job(forecast_data, user_symbols)
+        return render_jobs({"forecast_vs_actual": job})["forecast_vs_actual"]
 
-    def add_report_content(self, report_data):
+    def add_report_content(self, report_data, chart_buffers=None):
         user_symbols = report_data.get("user_symbols", [])
         # Raw Price Data chart is now on the title page.
 
@@ -223,7 +239,10 @@ class StockReportPDF(FPDF):
         self.cell(0, 10, "2. Ticker Price and Growth Analysis", ln=True, align="L")
         self.set_font("Arial", "", 12)
         ticker_analysis_data = report_data.get("ticker_analysis", {})
-        chart_buffer_analysis = self.generate_ticker_analysis_chart(ticker_analysis_data, user_symbols)
+        if chart_buffers is not None:
+            chart_buffer_analysis = chart_buffers.get("ticker_analysis")
+        else:
+            chart_buffer_analysis = self.generate_ticker_analysis_chart(ticker_analysis_data, user_symbols)
         if chart_buffer_analysis:
             image_width = self.w - self.l_margin - self.r_margin
             self.image(chart_buffer_analysis, x=self.l_margin, w=image_width)
@@ -241,7 +260,10 @@ class StockReportPDF(FPDF):
         self.cell(0, 10, "3. Forecast vs. Actual Prices", ln=True, align="L")
         self.set_font("Arial", "", 12)
         forecast_vs_actual_data = report_data.get("forecast_vs_actual", {})
-        chart_buffer_forecast = self.generate_forecast_vs_actual_chart(forecast_vs_actual_data, user_symbols)
+        if chart_buffers is not None:
+            chart_buffer_forecast = chart_buffers.get("forecast_vs_actual")
+        else:
+            chart_buffer_forecast = self.generate_forecast_vs_actual_chart(forecast_vs_actual_data, user_symbols)
         if chart_buffer_forecast:
             image_width = self.w - self.l_margin - self.r_margin
             self.image(chart_buffer_forecast, x=self.l_margin, w=image_width)
@@ -290,7 +312,11 @@ class StockReportPDF(FPDF):
 
 
 def generate_pdf_report(report_data):
-    pdf = StockReportPDF()
-    pdf.add_title_page_and_raw_price_chart(report_data) # Add title page with first chart
-    pdf.add_report_content(report_data) # Add subsequent content
-    return pdf.output(dest='S') # Return PDF as bytes
+    with trace_run("report"):
+        with span("report.charts"):
+            chart_buffers = render_charts(report_data) # All charts at once, in the render pool
+        pdf = StockReportPDF()
+        pdf.add_title_page_and_raw_price_chart(report_data, chart_buffers) # Add title page with first chart
+        pdf.add_report_content(report_data, chart_buffers) # Add subsequent content
+        with span("report.output"):
+            return pdf.output(dest='S') # Return PDF as bytes
@@ -0,0 +1,79 @@
+import base64
+import io
+import os
+import pathlib
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from backend.utils import market_store
+
+# The report chart only needs these columns; everything else stays on disk.
+PRICE_COLUMNS = ["Date", "Ticker", "Close"]
+PRICE_CSV_PATH = os.getenv(
+    "REPORT_PRICE_CSV",
+    str(pathlib.Path(__file__).resolve().parents[2] / "data" / "raw" / "World-Stock-Prices-Dataset.csv"),
+)
+
+
+def parse_dates(values) -> pd.Series:
+    """
+    Naive day timestamps, each row's own calendar day. The raw dataset mixes
+    UTC offsets (-05:00/-04:00, +09:00 for Tokyo listings), which a plain
+    pd.to_datetime refuses and a UTC conversion can shift by a day.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is not None:
+            values = values.dt.tz_localize(None)  # keeps the local wall time
+        return values.dt.normalize()
+    return pd.to_datetime(values.astype(str).str[:10])
+
+
+def load_prices(symbols: List[str], start_date: Optional[date] = None, end_date: Optional[date] = None,
+                csv_path: str = PRICE_CSV_PATH) -> pd.DataFrame:
+    """
+    Date/Ticker/Close rows for `symbols` between `start_date` and `end_date`
+    (inclusive, either may be open), read from the market data store.
+    """
+    df = market_store.load_table(csv_path, columns=PRICE_COLUMNS, tickers=symbols)
+    df["Date"] = parse_dates(df["Date"])
+    if start_date is not None:
+        df = df[df["Date"] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df = df[df["Date"] <= pd.Timestamp(end_date)]
+    df["Ticker"] = df["Ticker"].astype(str)
+    return df.reset_index(drop=True)
+
+
+def frame_to_arrow(df: pd.DataFrame) -> str:
+    """Base64 Arrow IPC stream of `df`, for sending ad-hoc price data."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue()).decode("ascii")
+
+
+def frame_from_arrow(payload: str) -> pd.DataFrame:
+    with ipc.open_stream(base64.b64decode(payload)) as reader:
+        return reader.read_all().to_pandas()
+
+
+def resolve_price_data(report_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a report's price reference (`raw_price_ref`) or Arrow payload
+    (`raw_price_arrow`) into `raw_price_data`. Inline records are left as
+    they are.
+    """
+    ref = report_data.pop("raw_price_ref", None)
+    arrow = report_data.pop("raw_price_arrow", None)
+    if arrow:
+        report_data["raw_price_data"] = frame_from_arrow(arrow)
+    elif ref is not None:
+        symbols = ref.get("symbols") or report_data.get("user_symbols", [])
+        report_data["raw_price_data"] = load_prices(symbols, ref.get("start_date"), ref.get("end_date"))
+    return report_data
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from backend.utils.report_generation import report_store
+from backend.utils.report_generation.pdf_generator import generate_pdf_report
+from backend.utils.report_generation.report_inputs import resolve_price_data
+
+# Report layout is light Python; chart rendering already happens in the chart
+# process pool, so a few threads are enough to keep the event loop free.
+JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = float(os.getenv("REPORT_JOB_TTL", "3600"))
+
+
+class ReportJob:
+    """
+    One report request: its status and, once done, where the PDF is. The PDF
+    itself lives in the report store; only with the store disabled does
+    the job hold the bytes.
+    """
+
+    def __init__(self, report_data: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.report_data = report_data
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.pdf: Optional[bytes] = None  # only when the report store is disabled
+        self.filename: Optional[str] = None  # set from the report store once done
+        self.size: Optional[int] = None
+        self.cached = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "cached": self.cached,
+            "error": self.error,
+            "size": self.size,
+            "queued_s": round((self.started_at or time.time()) - self.created_at, 3),
+            "duration_s": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+        }
+
+
+class ReportJobs:
+    """
+    Runs report generation on a worker pool so request handlers only submit
+    and poll. Reports already in the report store are served from there
+    instead of being generated again. Finished jobs keep only the stored
+    filename, for `ttl` seconds.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, ttl: float = JOB_TTL_SECONDS,
+                 generate: Callable[[Dict[str, Any]], bytes] = generate_pdf_report):
+        self.ttl = ttl
+        self.generate = generate
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._jobs: Dict[str, ReportJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, report_data: Dict[str, Any]) -> ReportJob:
+        self._expire()
+        job = ReportJob(report_data)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ReportJob) -> ReportJob:
+        job.status, job.started_at = "running", time.time()
+        try:
+            # price references are loaded here, on the worker, not in the handler
+            report_data = resolve_price_data(job.report_data)
+            key = report_store.report_key(report_data)
+            stored = report_store.get(key)
+            if stored is not None:
+                (job.filename, pdf), job.cached = stored, True
+            else:
+                pdf = bytes(self.generate(report_data))
+                job.filename = report_store.put(key, pdf)
+            job.size = len(pdf)
+            if not report_store.ENABLED:
+                job.pdf = pdf  # nowhere else to serve it from
+            job.status = "done"
+        except Exception as e:
+            print(f"🚨 Report job {job.id} failed: {e}")
+            job.status, job.error = "failed", str(e)
+        finally:
+            job.finished_at = time.time()
+            job.report_data = None  # the inputs can be large; only the stored filename is needed now
+        return job
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+
+_jobs: Optional[ReportJobs] = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs() -> ReportJobs:
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = ReportJobs()
+        return _jobs
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from backend.utils import downsample
+from backend.utils.report_generation.chart_cache import digest
+
+STORE_DIR = os.getenv(
+    "REPORT_STORE_DIR",
+    str(pathlib.Path(__file__).resolve().parents[2] / "outputs" / "reports"),
+)
+ENABLED = os.getenv("REPORT_STORE", "1") != "0"
+MAX_AGE_SECONDS = float(os.getenv("REPORT_STORE_MAX_AGE_DAYS", "30")) * 86400
+MAX_BYTES = int(os.getenv("REPORT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Bump when the PDF layout changes so old reports stop matching.
+REPORT_VERSION = "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_accessed ON reports(accessed_at);
+"""
+
+_local = threading.local()
+_evict_lock = threading.Lock()
+_put_lock = threading.Lock()
+
+
+def _connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(STORE_DIR, "index.sqlite"), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def report_key(report_data: Dict[str, Any]) -> str:
+    """
+    Hash of the report inputs (price frames by value) and the chart
+    downsampling settings, so identical requests share one PDF.
+    """
+    parts = {name: digest(value) for name, value in sorted(report_data.items())}
+    settings = [downsample.MAX_POINTS, downsample.METHOD]
+    return hashlib.sha256(json.dumps([REPORT_VERSION, settings, parts]).encode()).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(STORE_DIR, f"{key}.pdf")
+
+
+def _forget(key: str):
+    _connection().execute("DELETE FROM reports WHERE key = ?", (key,))
+
+
+def get(key: str) -> Optional[Tuple[str, bytes]]:
+    """(filename, pdf) of a stored report, or None."""
+    if not ENABLED:
+        return None
+    row = _connection().execute("SELECT filename FROM reports WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    try:
+        with open(_path(key), "rb") as f:
+            pdf = f.read()
+    except FileNotFoundError:
+        _forget(key)  # removed behind our back
+        return None
+    _connection().execute("UPDATE reports SET accessed_at = ? WHERE key = ?", (time.time(), key))
+    return row[0], pdf
+
+
+def put(key: str, pdf: bytes, filename: Optional[str] = None) -> str:
+    """
+    Store `pdf` under `key` and return its download filename. If the key is
+    already stored (two jobs for the same inputs), the first report and its
+    filename are kept, so links handed out for it stay valid.
+    """
+    filename = filename or f"stock_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{key[:8]}.pdf"
+    if not ENABLED:
+        return filename
+    with _put_lock:
+        now = time.time()
+        conn = _connection()
+        row = conn.execute("SELECT filename FROM reports WHERE key = ?", (key,)).fetchone()
+        if row is not None and os.path.exists(_path(key)):
+            conn.execute("UPDATE reports SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+        os.makedirs(STORE_DIR, exist_ok=True)
+        tmp = os.path.join(STORE_DIR, f".{key}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, _path(key))
+        # another process may have stored the key meanwhile: keep its row
+        conn.execute(
+            "INSERT INTO reports(key, filename, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET accessed_at = excluded.accessed_at",
+            (key, filename, len(pdf), now, now),
+        )
+        filename = conn.execute("SELECT filename FROM reports WHERE key = ?", (key,)).fetchone()[0]
+    evict()
+    return filename
+
+
+def lookup(filename: str) -> Optional[str]:
+    """Path of the stored report called `filename`, from the index alone."""
+    if not ENABLED:
+        return None
+    row = _connection().execute("SELECT key FROM reports WHERE filename = ?", (filename,)).fetchone()
+    if row is None:
+        return None
+    _connection().execute("UPDATE reports SET accessed_at = ? WHERE key = ?", (time.time(), row[0]))
+    return _path(row[0])
+
+
+def evict(max_age: Optional[float] = None, max_bytes: Optional[int] = None) -> int:
+    """Drop reports older than `max_age` seconds, then least recently used ones until under `max_bytes`."""
+    max_age = MAX_AGE_SECONDS if max_age is None else max_age
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        cutoff = time.time() - max_age
+        rows = _connection().execute("SELECT key, size, created_at FROM reports ORDER BY accessed_at").fetchall()
+        expired = [key for key, _, created_at in rows if created_at < cutoff]
+        live = [(key, size) for key, size, created_at in rows if created_at >= cutoff]
+        total = sum(size for _, size in live)
+        for key, size in live:
+            if total <= max_bytes:
+                break
+            expired.append(key)
+            total -= size
+        for key in expired:
+            try:
+                os.remove(_path(key))
+            except FileNotFoundError:
+                pass
+            _forget(key)
+        return len(expired)
+
+
+def stats() -> Dict[str, Any]:
+    count, size = _connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reports").fetchone()
+    return {"reports": count, "bytes": size}
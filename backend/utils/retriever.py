@@ -0,0 +1,222 @@
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.utils import history_db
+from backend.utils.tracing import span
+
+LOOKBACK_DAYS = int(os.getenv("RAG_LOOKBACK_DAYS", "90"))
+VECTOR_K = int(os.getenv("RAG_VECTOR_K", "3"))
+TOKEN_BUDGET = int(os.getenv("RAG_TOKEN_BUDGET", "1500"))
+GRANULARITY = os.getenv("RAG_GRANULARITY", "week")
+
+# Questions about these are answered from the history table, not by vector search.
+STRUCTURED_TERMS = re.compile(
+    r"\b(price|prices|close|closes|closing|open|high|low|return|returns|volatility|volatile|"
+    r"drawdown|volume|average|avg|range|performance|change|gain|loss|trend)\b",
+    re.IGNORECASE,
+)
+STOPWORDS = {"what", "was", "is", "the", "of", "for", "over", "in", "and", "last", "since", "to",
+             "a", "its", "how", "did", "has", "been", "days", "weeks", "months", "year"}
+
+# Range statistics for a batch of tickers. The range ends at `end` (or each
+# ticker's last day) and starts at `start` (or `lookback` days before the end).
+RANGE_STATS_SQL = """
+WITH bounds AS (
+    SELECT ticker, coalesce(CAST(? AS DATE), max(date)) AS end_date
+    FROM history
+    WHERE list_contains(?, ticker)
+    GROUP BY ticker
+), h AS (
+    SELECT h.ticker, h.date, h.close, h.high, h.low, h.volume,
+           h.close / lag(h.close) OVER w - 1 AS ret,
+           h.close / max(h.close) OVER (w ROWS UNBOUNDED PRECEDING) - 1 AS drawdown
+    FROM history h JOIN bounds b USING (ticker)
+    WHERE h.date <= b.end_date
+      AND h.date >= coalesce(CAST(? AS DATE), b.end_date - to_days(CAST(? AS INTEGER)))
+    WINDOW w AS (PARTITION BY h.ticker ORDER BY h.date)
+)
+SELECT ticker,
+       min(date) AS start_date,
+       max(date) AS end_date,
+       count(*) AS days,
+       round(arg_min(close, date), 4) AS first_close,
+       round(arg_max(close, date), 4) AS last_close,
+       round((arg_max(close, date) / arg_min(close, date) - 1) * 100, 2) AS return_percent,
+       round(max(high), 4) AS high,
+       round(min(low), 4) AS low,
+       round(stddev_samp(ret) * sqrt(252) * 100, 2) AS volatility_percent,
+       round(min(drawdown) * 100, 2) AS max_drawdown_percent,
+       round(avg(volume), 0) AS avg_volume
+FROM h
+GROUP BY ticker
+"""
+
+
+def route(question: Optional[str]) -> str:
+    """"structured" when the question is only about numbers the history table has, else "hybrid"."""
+    if not question:
+        return "structured"
+    words = re.findall(r"[A-Za-z]+", question)
+    other = [w for w in words
+             if not STRUCTURED_TERMS.fullmatch(w) and w.lower() not in STOPWORDS and not w.isupper()]
+    return "structured" if STRUCTURED_TERMS.search(question) and not other else "hybrid"
+
+
+def _tokens(text: str) -> int:
+    # same 4 chars/token heuristic as the recommendation batching
+    return len(text) // 4 + 1
+
+
+def _day_number(day) -> Optional[int]:
+    return int(str(day).replace("-", "")[:8]) if day else None
+
+
+def range_stats(tickers: Iterable[str], start: Optional[str] = None, end: Optional[str] = None,
+                lookback_days: int = LOOKBACK_DAYS, path: str = history_db.DUCKDB_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    Close/return/volatility/drawdown/volume over a date range, one query for
+    all tickers. Reads the history table as the pipeline's history_db stage
+    left it; call history_db.refresh first when running outside the pipeline.
+    """
+    tickers = [t.upper() for t in tickers]
+    if not tickers or not os.path.exists(path):
+        return {}
+    with history_db.connect(path) as con:
+        cursor = con.execute(RANGE_STATS_SQL, [end, tickers, start, lookback_days])
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    out = {}
+    for row in rows:
+        record = dict(zip(columns, row))
+        record["start_date"], record["end_date"] = str(record["start_date"]), str(record["end_date"])
+        out[record.pop("ticker")] = record
+    return out
+
+
+def _known(value) -> bool:
+    return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+
+def structured_line(ticker: str, s: Dict[str, Any]) -> str:
+    # return is NULL for a missing/zero first close, avg volume NaN for
+    # missing volumes: leave such figures out rather than fail the batch
+    line = (
+        f"[{ticker}] {s['start_date']}..{s['end_date']} ({s['days']} trading days): "
+        f"close {s['first_close']} -> {s['last_close']}"
+    )
+    if _known(s.get("return_percent")):
+        line += f" ({s['return_percent']:+}%)"
+    line += f", range {s['low']}-{s['high']}"
+    if _known(s.get("volatility_percent")):
+        line += f", annualized volatility {s['volatility_percent']}%"
+    if _known(s.get("max_drawdown_percent")):
+        line += f", max drawdown {s['max_drawdown_percent']}%"
+    if _known(s.get("avg_volume")):
+        line += f", avg volume {s['avg_volume']:,.0f}"
+    return line
+
+
+class HybridRetriever:
+    """
+    Context for the recommendation agent. Numbers come from the DuckDB
+    history table; Chroma is only searched for questions that aren't purely
+    numeric, and only among the ticker's documents inside the date range.
+    Both are merged into one block per ticker under a token budget.
+    """
+
+    def __init__(self, duckdb_path: str = history_db.DUCKDB_PATH, chroma_dir: Optional[str] = None,
+                 granularity: str = GRANULARITY):
+        self.duckdb_path = duckdb_path
+        self.chroma_dir = chroma_dir
+        self.granularity = granularity
+        self._collection = None
+        self._collection_lock = threading.Lock()
+        self._collection_missing = False
+
+    def collection(self):
+        """The Chroma collection for `granularity`, or None if it hasn't been ingested."""
+        with self._collection_lock:
+            if self._collection is None and not self._collection_missing:
+                import chromadb
+                from backend.utils import chromaDB, embeddings
+                client = chromadb.PersistentClient(path=self.chroma_dir or chromaDB.CHROMA_DIR)
+                try:
+                    self._collection = client.get_collection(
+                        chromaDB.collection_name(self.granularity),
+                        embedding_function=embeddings.embedding_function(),
+                    )
+                except Exception as e:
+                    print(f"[Retriever] No {self.granularity} Chroma collection, structured context only: {e}")
+                    self._collection_missing = True
+            return self._collection
+
+    def vector_snippets(self, question: str, stats: Dict[str, Dict[str, Any]],
+                        k: int = VECTOR_K) -> Dict[str, List[str]]:
+        """Top-k documents per ticker, pre-filtered to the ticker and its date range."""
+        collection = self.collection()
+        if collection is None or not stats:
+            return {}
+        from backend.utils import embeddings
+        query = embeddings.embed([question])[0].tolist()
+        out = {}
+        for ticker, s in stats.items():
+            where = {"$and": [
+                {"ticker": ticker},
+                {"end_day": {"$gte": _day_number(s["start_date"])}},
+                {"start_day": {"$lte": _day_number(s["end_date"])}},
+            ]}
+            result = collection.query(query_embeddings=[query], n_results=k, where=where, include=["documents"])
+            out[ticker] = result["documents"][0] if result["documents"] else []
+        return out
+
+    def retrieve(self, tickers: Iterable[str], question: Optional[str] = None, start: Optional[str] = None,
+                 end: Optional[str] = None, token_budget: int = TOKEN_BUDGET) -> Dict[str, str]:
+        """One context block per ticker; the numeric line always comes first."""
+        tickers = [t.upper() for t in tickers]
+        if not tickers:
+            return {}
+        t0 = time.perf_counter()
+        with span("retrieve.structured", tickers=len(tickers)):
+            stats = range_stats(tickers, start, end, path=self.duckdb_path)
+        snippets = {}
+        if route(question) == "hybrid":
+            with span("retrieve.vector", tickers=len(stats)):
+                snippets = self.vector_snippets(question, stats)
+
+        per_ticker = max(1, token_budget // len(tickers))
+        blocks = {}
+        for ticker in tickers:
+            if ticker not in stats:
+                continue
+            lines = [structured_line(ticker, stats[ticker])]
+            used = _tokens(lines[0])
+            for snippet in snippets.get(ticker, []):
+                cost = _tokens(snippet) + 1
+                if used + cost > per_ticker:
+                    break
+                lines.append(f"- {snippet}")
+                used += cost
+            blocks[ticker] = "\n".join(lines)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        print(f"🔎 Context for {len(blocks)} ticker(s) in {elapsed_ms:.1f} ms "
+              f"({elapsed_ms / len(tickers):.2f} ms/ticker, {route(question)})")
+        return blocks
+
+    def context_block(self, tickers: Iterable[str], question: Optional[str] = None, **kwargs) -> str:
+        return "\n\n".join(self.retrieve(tickers, question, **kwargs).values())
+
+
+_retriever: Optional[HybridRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> HybridRetriever:
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            _retriever = HybridRetriever()
+        return _retriever
@@ -0,0 +1,150 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.utils import tracing
+
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    `kind` picks the executor: "thread" for I/O-bound stages (file reads,
+    small pandas jobs), "process" for CPU-bound ones (model training). Process
+    stages need a module-level `func` and picklable args/results.
+    """
+
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (), kind: str = "thread",
+                 args: tuple = (), kwargs: Optional[dict] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Stage '{name}': kind must be 'thread' or 'process', got '{kind}'")
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.kind = kind
+        self.args = args
+        self.kwargs = kwargs or {}
+
+
+class StageScheduler:
+    """
+    Run stages as soon as their dependencies finish, so independent branches
+    overlap and wall-clock time approaches the longest dependency chain.
+    """
+
+    def __init__(self, stages: List[Stage], max_threads: int = 4, max_processes: int = 2):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self.wall_time = 0.0
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def run(self) -> Dict[str, Any]:
+        """Execute every stage and return {stage name: return value}."""
+        results: Dict[str, Any] = {}
+        pending = list(self._order)
+        running = {}
+        t_start = time.perf_counter()
+
+        needs_processes = any(self.stages[n].kind == "process" for n in pending)
+        threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="stage")
+        # spawn, not fork: the parent already runs pandas/arrow worker threads
+        processes = ProcessPoolExecutor(
+            max_workers=self.max_processes, mp_context=multiprocessing.get_context("spawn")
+        ) if needs_processes else None
+
+        try:
+            while pending or running:
+                for name in [n for n in pending if all(d in results for d in self.stages[n].deps)]:
+                    stage = self.stages[name]
+                    pool = processes if stage.kind == "process" else threads
+                    print(f"   ▶ {name} ({stage.kind})")
+                    future = pool.submit(
+                        tracing.call_traced, f"stage.{name}", stage.func, stage.args, stage.kwargs,
+                        collect=stage.kind == "process",
+                    )
+                    running[future] = (name, time.perf_counter())
+                    pending.remove(name)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    self.timings[name] = (started - t_start, time.perf_counter() - t_start)
+                    try:
+                        results[name], child_spans = future.result()
+                        tracing.merge(child_spans)
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        raise RuntimeError(f"Stage '{name}' failed: {e}") from e
+                    print(f"   ✔ {name} ({self.timings[name][1] - self.timings[name][0]:.1f}s)")
+        finally:
+            self.wall_time = time.perf_counter() - t_start
+            threads.shutdown(wait=True, cancel_futures=True)
+            if processes:
+                processes.shutdown(wait=True, cancel_futures=True)
+
+        return results
+
+    def duration(self, name: str) -> float:
+        start, end = self.timings.get(name, (0.0, 0.0))
+        return end - start
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Longest chain of stage durations through the DAG."""
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in self._order:
+            deps = self.stages[name].deps
+            prev_cost, prev_path = max((best[d] for d in deps), key=lambda b: b[0], default=(0.0, []))
+            best[name] = (prev_cost + self.duration(name), prev_path + [name])
+        if not best:
+            return [], 0.0
+        cost, path = max(best.values(), key=lambda b: b[0])
+        return path, cost
+
+    def report(self) -> Dict[str, Any]:
+        path, cost = self.critical_path()
+        serial = sum(self.duration(n) for n in self.timings)
+        return {
+            "stages": {n: round(self.duration(n), 3) for n in self._order if n in self.timings},
+            "critical_path": path,
+            "critical_path_s": round(cost, 3),
+            "serial_s": round(serial, 3),
+            "wall_s": round(self.wall_time, 3),
+        }
+
+    def print_report(self):
+        report = self.report()
+        print("⏱️  Stage timings:")
+        for name, seconds in report["stages"].items():
+            marker = "*" if name in report["critical_path"] else " "
+            print(f"   {marker} {name:<14} {seconds:8.2f}s")
+        print(f"   critical path: {' -> '.join(report['critical_path'])} ({report['critical_path_s']:.2f}s)")
+        print(f"   wall {report['wall_s']:.2f}s vs. serial {report['serial_s']:.2f}s")
@@ -1,30 +1,43 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import StandardScaler
 
+from backend.utils import market_store
 
-def generate_sequences(ticker, model_type, sequence_length=10, forecast_target_date=None):
-    df = pd.read_csv("../backend/data/processed/cleaned_stock_data.csv")
-    df = df[df['ticker'] == ticker].sort_values("date").reset_index(drop=True)
+
+def generate_sequences(ticker, model_type, sequence_length=10, forecast_target_date=None, float_dtype=None):
+    float_dtype = np.dtype(float_dtype or market_store.FLOAT_DTYPE)
+    features = ['close', 'sma_5', 'sma_10', 'sma_21', 'std_5']
+
+    df = market_store.load_table(
+        market_store.CLEANED_CSV_PATH,
+        columns=['date', 'ticker'] + features,
+        tickers=[ticker],
+        float_dtype=float_dtype,
+    )
+    df = df.sort_values("date").reset_index(drop=True)
     df['date'] = pd.to_datetime(df['date'], utc=True)
 
     if forecast_target_date:
         df = df[df['date'] < pd.Timestamp(forecast_target_date, tz="UTC")]
 
-    features = ['close', 'sma_5', 'sma_10', 'sma_21', 'std_5']
     df = df[features].dropna()
 
-
+    # StandardScaler keeps the input dtype, so the scaled matrix stays in
+    # float32 and Keras can fit on the windows without a conversion copy.
     scaler = StandardScaler()
-    scaled = scaler.fit_transform(df)
+    scaled = scaler.fit_transform(df.to_numpy(dtype=float_dtype))
 
-    X, y = [], []
-    for i in range(sequence_length, len(scaled)):
-        X.append(scaled[i - sequence_length:i])
-        y.append(scaled[i][0])
+    n_features = scaled.shape[1]
+    if len(scaled) > sequence_length:
+        windows = sliding_window_view(scaled, (sequence_length, n_features))[:-1, 0]
+        X = np.ascontiguousarray(windows)
+        y = scaled[sequence_length:, 0].copy()
+    else:
+        X = np.empty((0, sequence_length, n_features), dtype=float_dtype)
+        y = np.empty((0,), dtype=float_dtype)
 
-    X = np.array(X)
-    y = np.array(y)
     if model_type == "mlp":
         X = X.reshape((X.shape[0], -1))
 
@@ -0,0 +1,269 @@
+import contextvars
+import functools
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Anchored to the package: traces come from both the pipeline (run from
+# frontend/) and the API server (run from the project root).
+TRACE_DIR = str(pathlib.Path(__file__).resolve().parents[1] / "outputs" / "traces")
+ENABLED = os.getenv("PIPELINE_TRACE", "1") != "0"
+# Every report request writes a trace, so a long-running API server would
+# fill TRACE_DIR; only the newest MAX_TRACES files are kept.
+MAX_TRACES = int(os.getenv("PIPELINE_TRACE_KEEP", "50"))
+
+
+class TraceRun:
+    """Spans collected for one pipeline run / report, exported as a Chrome trace."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, events: List[Dict[str, Any]]):
+        with self._lock:
+            self.events.extend(events)
+
+
+_current_run: contextvars.ContextVar[Optional[TraceRun]] = contextvars.ContextVar("trace_run", default=None)
+# Pool threads and crewai event handlers don't inherit context variables, so
+# spans opened there fall back to the most recent run started in this process.
+_active_runs: List[TraceRun] = []
+_active_lock = threading.Lock()
+
+_crewai_instrumented = False
+_crewai_handlers: List[Any] = []  # keep the bus handlers referenced
+
+
+def current_run() -> Optional[TraceRun]:
+    run = _current_run.get()
+    if run is None:
+        with _active_lock:
+            run = _active_runs[-1] if _active_runs else None
+    return run
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+        except ImportError:
+            return None
+
+
+def record_span(name: str, start_wall: float, wall_s: float, cpu_s: Optional[float] = None,
+                run: Optional[TraceRun] = None, **attrs):
+    """Add a finished span (Chrome trace "complete" event) to the current run."""
+    run = run or current_run()
+    if run is None or not ENABLED:
+        return
+    args = {k: v for k, v in attrs.items() if v is not None}
+    if cpu_s is not None:
+        args["cpu_ms"] = round(cpu_s * 1000, 3)
+    args["peak_rss_mb"] = _peak_rss_mb()
+    run.add([{
+        "name": name,
+        "cat": name.split(".", 1)[0],
+        "ph": "X",
+        "ts": int(start_wall * 1e6),
+        "dur": int(wall_s * 1e6),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }])
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block: wall time, CPU time of the calling thread and the process
+    peak RSS when it ends. Yields the attrs dict so callers can add fields.
+    No-op outside a trace run.
+    """
+    if not ENABLED or current_run() is None:
+        yield attrs
+        return
+    start_wall = time.time()
+    t0 = time.perf_counter()
+    c0 = time.thread_time()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = repr(e)
+        raise
+    finally:
+        record_span(name, start_wall, time.perf_counter() - t0, time.thread_time() - c0, **attrs)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of `span`."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def export(run: TraceRun, path: Optional[str] = None) -> str:
+    """Write the run as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)."""
+    if path is None:
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(run.started_at))
+        path = os.path.join(TRACE_DIR, f"trace_{run.name}_{stamp}_{os.getpid()}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "traceEvents": sorted(run.events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"run": run.name, "started_at": run.started_at},
+        }, f, indent=1)
+    if os.path.dirname(path) == TRACE_DIR:
+        prune()
+    return path
+
+
+def prune(keep: Optional[int] = None) -> int:
+    """Delete all but the newest `keep` trace files in TRACE_DIR."""
+    keep = MAX_TRACES if keep is None else keep
+    try:
+        traces = [e for e in os.scandir(TRACE_DIR) if e.name.startswith("trace_") and e.name.endswith(".json")]
+    except FileNotFoundError:
+        return 0
+    stamped = []
+    for entry in traces:
+        try:
+            stamped.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+    removed = 0
+    for _, old in sorted(stamped, reverse=True)[max(keep, 0):]:
+        try:
+            os.remove(old)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+@contextmanager
+def trace_run(name: str):
+    """
+    Collect spans for a whole run and export them on exit. Nested inside an
+    active run this is just another span.
+    """
+    if not ENABLED or _current_run.get() is not None:
+        with span(name):
+            yield None
+        return
+
+    run = TraceRun(name)
+    token = _current_run.set(run)
+    with _active_lock:
+        _active_runs.append(run)
+    try:
+        with span(name):
+            yield run
+    finally:
+        _current_run.reset(token)
+        with _active_lock:
+            _active_runs.remove(run)
+        path = export(run)
+        print(f"🧭 Trace with {len(run.events)} spans written to {path}")
+
+
+def call_traced(name: str, func, args: tuple = (), kwargs: Optional[dict] = None, collect: bool = False):
+    """
+    Run `func` under a span and return (result, events). With `collect=True`
+    (used for process-pool stages) the call gets its own run and its spans
+    are handed back so the parent can merge them into its trace.
+    """
+    kwargs = kwargs or {}
+    if collect and ENABLED and _current_run.get() is None:
+        run = TraceRun(name)
+        token = _current_run.set(run)
+        try:
+            with span(name):
+                result = func(*args, **kwargs)
+        finally:
+            _current_run.reset(token)
+        return result, run.events
+    with span(name):
+        return func(*args, **kwargs), None
+
+
+def merge(events: Optional[List[Dict[str, Any]]]):
+    run = current_run()
+    if run is not None and events:
+        run.add(events)
+
+
+def instrument_crewai():
+    """
+    Emit an `llm.call` span for every LLM call crewai makes, via its event
+    bus. Safe to call more than once; a no-op on crewai versions without it.
+    """
+    global _crewai_instrumented
+    if _crewai_instrumented:
+        return
+    try:
+        from crewai.events import (
+            crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+        )
+    except ImportError:
+        try:
+            from crewai.utilities.events import (
+                crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+            )
+        except ImportError:
+            return
+
+    started: Dict[str, tuple] = {}
+
+    def _key(event):
+        return getattr(event, "call_id", None) or f"{getattr(event, 'model', '')}:{threading.get_ident()}"
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _on_start(source, event):
+        started[_key(event)] = (time.time(), time.perf_counter())
+
+    def _on_end(event, error=None):
+        begin = started.pop(_key(event), None)
+        if begin is None:
+            return
+        record_span(
+            "llm.call", begin[0], time.perf_counter() - begin[1],
+            model=getattr(event, "model", None),
+            agent=getattr(event, "agent_role", None),
+            task=getattr(event, "task_name", None),
+            error=error,
+        )
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def _on_completed(source, event):
+        _on_end(event)
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def _on_failed(source, event):
+        _on_end(event, error=getattr(event, "error", "failed"))
+
+    _crewai_handlers.extend([_on_start, _on_completed, _on_failed])
+    _crewai_instrumented = True
@@ -18,7 +18,8 @@ sys.path.insert(0, str(BASE_DIR))
 sys.stdout.reconfigure(encoding='utf-8')
 
 
-from backend.agent_main_call import run_crew
+from backend.agent_main_call import run_pipeline
+from backend.utils import downsample
 
 # Helper function to replace NaN with None for JSON compatibility
 def replace_nan_with_none(obj):
@@ -37,7 +38,7 @@ st.set_page_config(page_title="Stock Analysis App", layout="wide")
 
 init_auth_state()
 ss = st.session_state
-ss.setdefault("results",        {"research": {}, "analysis": {}, "recommendations": [], "raw_price_data": [], "ticker_analysis": {}})
+ss.setdefault("results",        {"research": {}, "analysis": {}, "recommendations": [], "ticker_analysis": {}})
 ss.setdefault("run_triggered",  False)
 ss.setdefault("backend_log",    "")
 ss.setdefault("pdf_content", None)
@@ -56,13 +57,16 @@ st.title("Stock Analysis Pipeline")
 
 symbols_str = st.text_input("Stock Symbols (comma-separated)", "AAPL, AMD, GOOGL")
 user_pov    = "I'm a conservative investor looking for stable growth with low risk."
+direct_mode = st.checkbox("Direct mode (run data stages without LLM tool routing)", value=False)
+# direct mode only: a question beyond price figures adds matching Chroma snippets to the context
+rag_question = st.text_input("Question for the retriever (optional)", "") if direct_mode else ""
 
 if st.button("Start Analysis Pipeline"):
     syms = [s.strip().upper() for s in symbols_str.split(",") if s.strip()]
     if syms:
         ss.run_triggered = True
         # Reset results and PDF content for a new run
-        ss.results       = {"research": {}, "analysis": {}, "recommendations": [], "raw_price_data": [], "ticker_analysis": {}}
+        ss.results       = {"research": {}, "analysis": {}, "recommendations": [], "ticker_analysis": {}}
         ss.backend_log   = ""
         ss.pdf_content = None
         ss.pdf_filename = ""
@@ -84,7 +88,6 @@ if ss.run_triggered:
     result_json_path = "../backend/outputs/crew_result.json"
     forecast_json_path = "../backend/outputs/forecast_results.json"
     ticker_analysis_path = "../backend/outputs/ticker_analysis.json"
-    raw_prices_csv_path = "../backend/data/raw/World-Stock-Prices-Dataset.csv"
 
     # Initialize data containers for this run
     crew_data = None
@@ -116,7 +119,7 @@ if ss.run_triggered:
         message_2.write("🤖 Launching Crew agents …")
         t0 = time.time()
         try:
-            run_crew(syms, user_pov) # This function should create/update the JSON files
+            run_pipeline(syms, user_pov, direct=direct_mode, rag_question=rag_question or None) # This function should create/update the JSON files
             message_2.empty()
             status.write(f"✔️ Crew finished ({time.time()-t0:.1f}s)")
         except Exception as e:
@@ -151,28 +154,6 @@ if ss.run_triggered:
             status.write(f"⚠️ Error decoding {os.path.basename(forecast_json_path)}. Forecast data may be missing or incomplete.")
             forecast_data = {} # Default to empty on error
 
-        # Load raw price data for the report payload
-        try:
-            df_raw = pd.read_csv(raw_prices_csv_path)
-            if "Date" not in df_raw.columns:
-                status.write(f"⚠️ 'Date' column not found in {os.path.basename(raw_prices_csv_path)}. Raw price data for report will be empty or incomplete.")
-                ss.results["raw_price_data"] = [] 
-            else:
-                df_raw["Date"] = pd.to_datetime(df_raw["Date"], errors='coerce')
-                df_raw = df_raw.dropna(subset=['Date']) 
-                if not df_raw.empty:
-                    if pd.api.types.is_datetime64_any_dtype(df_raw['Date']):
-                        df_raw["Date"] = df_raw["Date"].dt.strftime('%Y-%m-%d')
-                    else:
-                        df_raw["Date"] = df_raw["Date"].astype(str)
-                ss.results["raw_price_data"] = df_raw.to_dict(orient="records")
-        except FileNotFoundError:
-            status.write(f"⚠️ Raw data CSV ({os.path.basename(raw_prices_csv_path)}) not found. Raw price data will not be included in the report.")
-            ss.results["raw_price_data"] = [] 
-        except Exception as e:
-            status.write(f"🚨 Critical error loading raw price data for report: {e}") 
-            ss.results["raw_price_data"] = []
-        
         # Load ticker analysis data for the report payload and Section 5 display
         try:
             with open(ticker_analysis_path) as f2:
@@ -247,6 +228,8 @@ try:
     if user_symbols_for_display:
         df_filtered_display = df_raw_display[df_raw_display["Ticker"].isin(user_symbols_for_display)].copy()
         if not df_filtered_display.empty:
+            # LTTB keeps the shape of each line while capping the points sent to the browser
+            df_filtered_display = downsample.downsample_frame(df_filtered_display, "Date", "Close", group="Ticker")
             fig = px.line(df_filtered_display, x="Date", y="Close", color="Ticker",
                           title="Raw Price Data for Selected Symbols")
             st.plotly_chart(fig, use_container_width=True)
@@ -365,7 +348,7 @@ else:
 st.header("4. Download PDF report")
 
 if st.button("Generate PDF Report"):
-    if not ss.results.get("recommendations") and not ss.results.get("raw_price_data") and not ss.results.get("ticker_analysis"):
+    if not ss.results.get("recommendations") and not ss.results.get("ticker_analysis"):
         st.warning("No data available to generate a report. Please run the analysis pipeline first.")
         st.stop()
     
@@ -386,10 +369,12 @@ if st.button("Generate PDF Report"):
             # forecast_pdf_data will remain empty or partially filled
 
     try:
-        backend_url = "http://localhost:8000/reports/generate" # Ensure backend is running at this address
+        backend_url = "http://localhost:8000/reports" # Ensure backend is running at this address
         user_symbols_list = [s.strip().upper() for s in symbols_str.split(",") if s.strip()] # Redundant if using user_symbols_list_for_pdf
         payload = {
-            "raw_price_data_payload": ss.results.get("raw_price_data", []),
+            # The backend loads the prices from its market data store, so only
+            # the reference goes over the wire.
+            "raw_price_ref": {"symbols": user_symbols_list},
             "analysis_results_payload": ss.results.get("ticker_analysis", {}),
             "llm_recommendations_payload": {r["ticker"]: r for r in ss.results.get("recommendations", []) if isinstance(r, dict) and "ticker" in r},
             "research_data_payload": ss.results.get("research", {}), 
@@ -401,9 +386,22 @@ if st.button("Generate PDF Report"):
         cleaned_payload = replace_nan_with_none(payload)
         
         with st.spinner("Generating PDF... Please wait."):
-            r = requests.post(backend_url, json=cleaned_payload, timeout=120) # Use cleaned_payload
-            r.raise_for_status() # Will raise HTTPError for bad responses (4xx or 5xx)
-        
+            # Submit a report job, poll its status, then fetch the PDF
+            job = requests.post(f"{backend_url}/jobs", json=cleaned_payload, timeout=30) # Use cleaned_payload
+            job.raise_for_status() # Will raise HTTPError for bad responses (4xx or 5xx)
+            job_id = job.json()["job_id"]
+            deadline = time.time() + 300
+            status = job.json()
+            while status["status"] not in ("done", "failed"):
+                if time.time() > deadline:
+                    raise requests.exceptions.Timeout(f"Report job {job_id} still {status['status']}")
+                time.sleep(0.5)
+                status_r = requests.get(f"{backend_url}/jobs/{job_id}", timeout=10)
+                status_r.raise_for_status()
+                status = status_r.json()
+            r = requests.get(f"{backend_url}/jobs/{job_id}/pdf", timeout=60)
+            r.raise_for_status()
+
         ss.pdf_content = r.content
         ss.pdf_filename = (
             r.headers.get("Content-Disposition", "")
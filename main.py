@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -9,11 +10,20 @@ from backend.routes import auth, reports
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create/upgrade the auth schema once, before the first request
+    auth.auth_db.migrate()
+    yield
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Stock Market Analysis Platform",
     description="API for stock market data analysis and user management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
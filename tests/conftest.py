@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
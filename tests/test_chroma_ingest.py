@@ -0,0 +1,64 @@
+import chromadb
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils import chromaDB, market_store
+
+
+def hash_embed(texts):
+    """Deterministic stand-in for the sentence-transformers model."""
+    rng = [np.random.default_rng(abs(hash(t)) % (2 ** 32)) for t in texts]
+    return [r.random(8).astype(np.float32) for r in rng]
+
+
+def write_prices(path, days):
+    rows = []
+    for ticker, base in (("AAPL", 100.0), ("KO", 50.0)):
+        for i, day in enumerate(pd.bdate_range("2024-01-02", periods=days)):
+            price = base + i
+            rows.append({"Date": f"{day:%Y-%m-%d} 00:00:00-05:00", "Open": price, "High": price + 1,
+                         "Low": price - 1, "Close": price, "Volume": 1000 + i, "Ticker": ticker})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_store, "STORE_DIR", str(tmp_path / "store"))
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    return client.get_or_create_collection("stock_data_test")
+
+
+def ingest(collection, csv_path):
+    data = chromaDB.load_csv_data(["AAPL", "KO"], str(csv_path), period_days=None)
+    return chromaDB.add_data_to_chroma(collection, data, embedding_function=hash_embed, workers=1)
+
+
+def test_reingesting_the_same_csv_adds_nothing(tmp_path, collection):
+    csv_path = tmp_path / "prices.csv"
+    write_prices(csv_path, days=10)
+
+    assert ingest(collection, csv_path) == 20
+    ids = collection.get(include=[])["ids"]
+    assert sorted(ids) == sorted(f"{t}_{d:%Y-%m-%d}" for t in ("AAPL", "KO")
+                                 for d in pd.bdate_range("2024-01-02", periods=10))
+
+    assert ingest(collection, csv_path) == 0
+    assert collection.count() == 20
+
+
+def test_only_new_days_are_upserted(tmp_path, collection):
+    csv_path = tmp_path / "prices.csv"
+    write_prices(csv_path, days=10)
+    ingest(collection, csv_path)
+
+    write_prices(csv_path, days=13)  # three more trading days per ticker
+    upserted = []
+    original = collection.upsert
+    collection.upsert = lambda **kwargs: (upserted.extend(kwargs["ids"]), original(**kwargs))
+
+    assert ingest(collection, csv_path) == 6
+    new_days = pd.bdate_range("2024-01-02", periods=13)[10:]
+    assert sorted(upserted) == sorted(f"{t}_{d:%Y-%m-%d}" for t in ("AAPL", "KO") for d in new_days)
+    assert collection.count() == 26
+    assert len(set(collection.get(include=[])["ids"])) == 26
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from backend.utils import history_db, market_store
+
+
+def write_prices(path, days=30):
+    rows = [{"date": f"{day:%Y-%m-%d}", "open": 100.0 + i, "high": 101.0 + i, "low": 99.0 + i,
+             "close": 100.0 + i, "volume": 1000.0 + i, "ticker": "AAPL"}
+            for i, day in enumerate(pd.bdate_range("2024-01-02", periods=days))]
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def in_other_process(code, db_path):
+    return subprocess.Popen([sys.executable, "-c", f"import duckdb, time\ncon = duckdb.connect({db_path!r})\n{code}"],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def test_file_is_not_held_between_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_store, "STORE_DIR", str(tmp_path / "store"))
+    csv_path, db_path = tmp_path / "cleaned.csv", str(tmp_path / "stock_data.db")
+    write_prices(csv_path)
+    assert history_db.refresh(str(csv_path), db_path) == ["AAPL"]
+    assert history_db.context_for(["aapl"], db_path, refresh_first=False)["AAPL"]["rows"] == 30
+
+    # another process (CLI run, report batch) can take the write lock now
+    writer = in_other_process("con.execute('DELETE FROM ticker_context')\nprint('ok')", db_path)
+    assert writer.communicate(timeout=60)[0].strip().endswith("ok")
+    assert history_db.context_for(["AAPL"], db_path, refresh_first=False) == {}
+
+
+def test_reads_wait_for_another_process_write_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_store, "STORE_DIR", str(tmp_path / "store"))
+    csv_path, db_path = tmp_path / "cleaned.csv", str(tmp_path / "stock_data.db")
+    write_prices(csv_path)
+    history_db.refresh(str(csv_path), db_path)
+
+    writer = in_other_process("print('locked', flush=True)\ntime.sleep(1.5)", db_path)
+    assert writer.stdout.readline().strip() == "locked"
+    t0 = time.monotonic()
+    assert "AAPL" in history_db.context_for(["AAPL"], db_path, refresh_first=False)
+    assert time.monotonic() - t0 > 0.5
+    writer.wait(timeout=60)
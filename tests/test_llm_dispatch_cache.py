@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from backend.utils import llm_cache, llm_dispatcher
+
+MODEL = "gemini/gemini-2.0-flash"
+
+
+def is_json(text):
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+def run(replies, monkeypatch, **kwargs):
+    calls = []
+
+    async def fake_post(self, model, prompt, json_mode=False):
+        calls.append(prompt)
+        return replies.pop(0)
+
+    async def main():
+        async with llm_dispatcher.GeminiDispatcher(api_key="fake", persist_quota=False) as dispatcher:
+            return await dispatcher.generate_all(["prompt"], MODEL, **kwargs)
+
+    monkeypatch.setattr(llm_dispatcher.GeminiDispatcher, "_post", fake_post)
+    return asyncio.run(main())[0]["text"], len(calls)
+
+
+def test_rejected_reply_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    replies = ["not json", "[]", "[1]"]
+    assert run(replies, monkeypatch, validators=[is_json]) == ("not json", 1)
+    assert run(replies, monkeypatch, validators=[is_json]) == ("[]", 1)
+    assert run(replies, monkeypatch, validators=[is_json]) == ("[]", 0)
+    assert run(replies, monkeypatch, validators=[is_json], read_cache=False) == ("[1]", 1)
+
+
+def test_cached_reply_failing_validation_is_asked_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    llm_cache.put(MODEL, "prompt", "not json")
+    assert run(["[]"], monkeypatch, validators=[is_json]) == ("[]", 1)
+    assert llm_cache.get(MODEL, "prompt")["text"] == "[]"
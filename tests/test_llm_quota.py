@@ -0,0 +1,50 @@
+from backend.utils import llm_cache, llm_dispatcher
+
+MODEL = "gemini/gemini-1.5-pro"
+
+
+def dispatcher(**kwargs):
+    return llm_dispatcher.GeminiDispatcher(api_key="fake", limits={MODEL: {"rpm": 60, "rpd": 3}}, **kwargs)
+
+
+def test_daily_quota_is_shared_across_dispatchers(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    llm_cache.record_quota(MODEL, used=2)
+    first = dispatcher()
+    assert first._available(MODEL)
+    llm_cache.record_quota(MODEL, used=1)
+    assert not dispatcher()._available(MODEL)
+    assert llm_cache.quota_usage(MODEL) == (3, False)
+
+
+def test_exhausted_model_stays_exhausted_for_new_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    dispatcher()._mark_exhausted(MODEL)
+    assert not dispatcher()._available(MODEL)
+    assert dispatcher(persist_quota=False)._available(MODEL)
+
+
+def fallback_run(monkeypatch, prompts, **kwargs):
+    async def fake_post(self, model, prompt, json_mode=False):
+        return model
+
+    async def main():
+        flash = "gemini/gemini-2.0-flash"
+        async with llm_dispatcher.GeminiDispatcher(api_key="fake", limits={MODEL: {"rpm": 60, "rpd": 2}},
+                                                   fallbacks={MODEL: flash}, **kwargs) as d:
+            d.buckets[MODEL] = llm_dispatcher.TokenBucket(rate=50, capacity=1)  # one call at a time
+            return await d.generate_all([f"p{i}" for i in range(prompts)], MODEL)
+
+    monkeypatch.setattr(llm_dispatcher.GeminiDispatcher, "_post", fake_post)
+    monkeypatch.setattr(llm_cache, "ENABLED", False)
+    return [r["model"] for r in llm_dispatcher.run_sync(main())]
+
+
+def test_queued_requests_fall_back_once_quota_is_spent(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    for persist in (False, True):
+        models = fallback_run(monkeypatch, 6, persist_quota=persist)
+        assert models.count(MODEL) == 2
+        assert len(models) == 6
+    # the persisted budget is spent for the rest of the day
+    assert MODEL not in fallback_run(monkeypatch, 3)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from backend.utils.report_generation.pdf_generator import raw_price_job
+from backend.utils.report_generation.report_inputs import frame_from_arrow, frame_to_arrow
+
+# Like the raw dataset: the offset switches with daylight saving time.
+RECORDS = [
+    {"Date": "2024-03-08 00:00:00-05:00", "Ticker": "AAPL", "Close": 170.7},
+    {"Date": "2024-03-11 00:00:00-04:00", "Ticker": "AAPL", "Close": 172.8},
+    {"Date": "2024-03-12 00:00:00-04:00", "Ticker": "AAPL", "Close": 173.2},
+]
+
+
+def test_inline_records_with_mixed_offsets_make_a_chart():
+    job = raw_price_job(RECORDS, ["AAPL"])
+    assert job is not None
+    assert list(job.data["Date"]) == list(pd.to_datetime(["2024-03-08", "2024-03-11", "2024-03-12"]))
+
+
+def test_arrow_payload_with_mixed_offsets_makes_a_chart():
+    assert raw_price_job(frame_from_arrow(frame_to_arrow(pd.DataFrame(RECORDS))), ["AAPL"]) is not None
+
+
+def test_dates_keep_their_local_day():
+    from backend.utils.report_generation.report_inputs import parse_dates
+    tokyo = parse_dates(pd.Series(["2024-03-11 00:00:00+09:00", "2024-03-12 00:00:00+09:00"]))
+    assert list(tokyo) == list(pd.to_datetime(["2024-03-11", "2024-03-12"]))
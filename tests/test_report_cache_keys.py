@@ -0,0 +1,20 @@
+import pandas as pd
+
+from backend.utils import downsample
+from backend.utils.report_generation import chart_cache, report_store
+
+PRICES = pd.DataFrame({"Date": pd.bdate_range("2024-01-02", periods=5), "Ticker": "AAPL", "Close": range(5)})
+
+
+def test_keys_change_with_downsampling_settings(monkeypatch):
+    chart = chart_cache.chart_key("raw_price", ["AAPL"], PRICES)
+    report = report_store.report_key({"raw_price_data": PRICES, "user_symbols": ["AAPL"]})
+    assert chart_cache.chart_key("raw_price", ["AAPL"], PRICES) == chart
+
+    monkeypatch.setattr(downsample, "MAX_POINTS", downsample.MAX_POINTS + 1)
+    assert chart_cache.chart_key("raw_price", ["AAPL"], PRICES) != chart
+    assert report_store.report_key({"raw_price_data": PRICES, "user_symbols": ["AAPL"]}) != report
+
+    monkeypatch.undo()
+    monkeypatch.setattr(downsample, "METHOD", "minmax" if downsample.METHOD != "minmax" else "lttb")
+    assert chart_cache.chart_key("raw_price", ["AAPL"], PRICES) != chart
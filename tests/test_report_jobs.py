@@ -0,0 +1,39 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import reports
+from backend.utils.report_generation import report_jobs, report_store
+
+REPORT = {"raw_price_data": [], "ticker_analysis": {}, "user_symbols": ["AAPL"]}
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(report_store, "_local", type(report_store._local)())
+
+
+def test_finished_jobs_keep_only_the_stored_filename():
+    jobs = report_jobs.ReportJobs(workers=1, generate=lambda data: b"%PDF job")
+    first = jobs.submit(dict(REPORT)).future.result()
+    second = jobs.submit(dict(REPORT)).future.result()
+    assert first.pdf is None and second.pdf is None
+    assert first.to_dict()["size"] == 8
+    assert (second.cached, second.filename) == (True, first.filename)
+
+
+def test_job_pdf_is_served_from_the_store(monkeypatch):
+    jobs = report_jobs.ReportJobs(workers=1, generate=lambda data: b"%PDF job")
+    monkeypatch.setattr(reports, "get_jobs", lambda: jobs)
+    app = FastAPI()
+    app.include_router(reports.router, prefix="/reports")
+    client = TestClient(app)
+
+    job = jobs.submit(dict(REPORT)).future.result()
+    response = client.get(f"/reports/jobs/{job.id}/pdf")
+    assert response.status_code == 200 and response.content == b"%PDF job"
+    assert job.filename in response.headers["content-disposition"]
+
+    report_store.evict(max_age=-1)
+    assert client.get(f"/reports/jobs/{job.id}/pdf").status_code == 404
@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.utils.report_generation import report_store
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(report_store, "_local", type(report_store._local)())
+
+
+def test_same_key_keeps_the_first_filename():
+    first = report_store.put("k" * 64, b"%PDF first", filename="first.pdf")
+    second = report_store.put("k" * 64, b"%PDF second", filename="second.pdf")
+    assert first == second == "first.pdf"
+    assert report_store.lookup("first.pdf") is not None
+    assert report_store.get("k" * 64) == ("first.pdf", b"%PDF first")
+
+
+def test_concurrent_puts_hand_out_one_downloadable_filename():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        names = list(pool.map(lambda i: report_store.put("c" * 64, b"%PDF", filename=f"r{i}.pdf"), range(8)))
+    assert len(set(names)) == 1
+    assert os.path.exists(report_store.lookup(names[0]))
+
+
+def test_eviction_by_age_and_size():
+    for i in range(3):
+        report_store.put(str(i) * 64, b"x" * 100, filename=f"{i}.pdf")
+    assert report_store.evict(max_bytes=250) == 1
+    assert report_store.lookup("0.pdf") is None
+    assert report_store.evict(max_age=-1) == 2
+    assert report_store.stats() == {"reports": 0, "bytes": 0}
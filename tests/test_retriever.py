@@ -0,0 +1,46 @@
+import pandas as pd
+
+from backend.utils import history_db, market_store, retriever
+from backend.utils.retriever import structured_line
+
+STATS = {
+    "start_date": "2024-01-02", "end_date": "2024-03-28", "days": 61,
+    "first_close": 100.0, "last_close": 110.0, "return_percent": 10.0,
+    "low": 98.0, "high": 112.0, "volatility_percent": 18.5,
+    "max_drawdown_percent": -4.2, "avg_volume": 1234567.0,
+}
+
+
+def test_structured_line_has_every_figure():
+    line = structured_line("AAPL", STATS)
+    assert "(+10.0%)" in line
+    assert "annualized volatility 18.5%" in line
+    assert "max drawdown -4.2%" in line
+    assert "avg volume 1,234,567" in line
+
+
+def test_structured_line_skips_missing_figures():
+    stats = dict(STATS, first_close=0.0, return_percent=None, volatility_percent=None,
+                 max_drawdown_percent=None, avg_volume=float("nan"))
+    line = structured_line("AAPL", stats)
+    assert line.startswith("[AAPL] 2024-01-02..2024-03-28 (61 trading days): close 0.0 -> 110.0")
+    assert "%)" not in line and "volatility" not in line
+    assert "drawdown" not in line and "volume" not in line
+
+
+def test_range_stats_reads_without_refreshing(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_store, "STORE_DIR", str(tmp_path / "store"))
+    csv_path, db_path = tmp_path / "cleaned.csv", str(tmp_path / "stock_data.db")
+    rows = [{"date": f"{day:%Y-%m-%d}", "open": 100.0 + i, "high": 101.0 + i, "low": 99.0 + i,
+             "close": 100.0 + i, "volume": 1000.0, "ticker": "AAPL"}
+            for i, day in enumerate(pd.bdate_range("2024-01-02", periods=30))]
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    history_db.refresh(str(csv_path), db_path)
+
+    def no_refresh(*args, **kwargs):
+        raise AssertionError("the history_db stage already refreshed the table")
+
+    monkeypatch.setattr(history_db, "refresh", no_refresh)
+    stats = retriever.range_stats(["aapl"], path=db_path)
+    assert stats["AAPL"]["days"] == 30 and stats["AAPL"]["last_close"] == 129.0
+    assert retriever.range_stats(["AAPL"], path=str(tmp_path / "missing.db")) == {}
@@ -0,0 +1,15 @@
+import os
+
+from backend.utils import tracing
+
+
+def test_export_keeps_only_the_newest_traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "MAX_TRACES", 3)
+    for i in range(5):
+        run = tracing.TraceRun(f"report{i}")
+        path = tracing.export(run)
+        os.utime(path, (1000 + i, 1000 + i))
+    kept = sorted(os.listdir(tmp_path))
+    assert len(kept) == 3
+    assert all(name.split("_")[1] in ("report2", "report3", "report4") for name in kept)